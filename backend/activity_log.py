@@ -0,0 +1,176 @@
+"""
+Background writer for activity logs.
+
+Request handlers enqueue ActivityLog rows in memory; a daemon thread flushes them
+with bulk INSERTs when ACTIVITY_LOG_BATCH_SIZE entries are pending or every
+ACTIVITY_LOG_FLUSH_INTERVAL seconds. The queue is bounded: when it is full,
+producers wait up to ACTIVITY_LOG_ENQUEUE_TIMEOUT seconds before giving up
+(the caller then writes the entry synchronously). Once stop() has run, entries
+are written synchronously too, instead of restarting the thread.
+
+A failed batch INSERT is retried ACTIVITY_LOG_WRITE_RETRIES times with
+exponential backoff, then written row by row so one bad entry cannot lose the
+others; rows that still fail are counted in ``dropped`` (exported as the
+activity_log_dropped_entries metric).
+"""
+
+import os
+import queue
+import threading
+import time
+from typing import Callable, List, Optional
+
+from sqlalchemy import insert
+from sqlalchemy.orm import Session
+
+import models
+from database import SessionLocal
+
+ACTIVITY_LOG_BATCH_SIZE = int(os.getenv("ACTIVITY_LOG_BATCH_SIZE", "200"))
+ACTIVITY_LOG_FLUSH_INTERVAL = float(os.getenv("ACTIVITY_LOG_FLUSH_INTERVAL", "1.0"))
+ACTIVITY_LOG_QUEUE_SIZE = int(os.getenv("ACTIVITY_LOG_QUEUE_SIZE", "10000"))
+ACTIVITY_LOG_ENQUEUE_TIMEOUT = float(os.getenv("ACTIVITY_LOG_ENQUEUE_TIMEOUT", "0.05"))
+ACTIVITY_LOG_WRITE_RETRIES = int(os.getenv("ACTIVITY_LOG_WRITE_RETRIES", "3"))
+ACTIVITY_LOG_RETRY_DELAY = float(os.getenv("ACTIVITY_LOG_RETRY_DELAY", "0.5"))
+ACTIVITY_LOG_RETRY_MAX_DELAY = 5.0
+
+_STOP = object()
+
+
+class ActivityLogWriter:
+    def __init__(
+        self,
+        session_factory: Callable[[], Session],
+        batch_size: int,
+        flush_interval: float,
+        max_queue_size: int,
+        enqueue_timeout: float,
+        retries: int = ACTIVITY_LOG_WRITE_RETRIES,
+        retry_delay: float = ACTIVITY_LOG_RETRY_DELAY,
+    ):
+        self.session_factory = session_factory
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.enqueue_timeout = enqueue_timeout
+        self.retries = retries
+        self.retry_delay = retry_delay
+        self.dropped = 0
+        self._queue: queue.Queue = queue.Queue(maxsize=max_queue_size)
+        self._thread: Optional[threading.Thread] = None
+        self._closed = False
+        self._lock = threading.Lock()
+
+    def start(self) -> None:
+        """Starts the flusher thread (idempotent); reopens a stopped writer"""
+        with self._lock:
+            self._closed = False
+            self._ensure_thread()
+
+    def _ensure_thread(self) -> None:
+        if self._thread is None or not self._thread.is_alive():
+            self._thread = threading.Thread(target=self._run, name="activity-log-writer", daemon=True)
+            self._thread.start()
+
+    def enqueue(self, entry: dict) -> bool:
+        """Queues an ActivityLog row; returns False if the writer is stopped or the queue stayed full"""
+        with self._lock:
+            if self._closed:
+                return False
+            self._ensure_thread()
+        try:
+            self._queue.put(entry, timeout=self.enqueue_timeout)
+            return True
+        except queue.Full:
+            return False
+
+    def flush(self) -> None:
+        """Blocks until every queued entry has been written"""
+        if self._thread is not None and self._thread.is_alive():
+            self._queue.join()
+
+    def stop(self) -> None:
+        """Flushes pending entries and stops the thread (graceful shutdown)"""
+        with self._lock:
+            self._closed = True
+            thread = self._thread
+            self._thread = None
+        if thread is not None and thread.is_alive():
+            self._queue.put(_STOP)
+            thread.join()
+        self._drain()
+
+    def _drain(self) -> None:
+        """Writes entries that were enqueued while stop() was running"""
+        batch = []
+        while True:
+            try:
+                entry = self._queue.get_nowait()
+            except queue.Empty:
+                break
+            self._queue.task_done()
+            if entry is not _STOP:
+                batch.append(entry)
+        if batch:
+            self._write(batch)
+
+    @property
+    def pending(self) -> int:
+        return self._queue.qsize()
+
+    def _run(self) -> None:
+        batch: List[dict] = []
+        deadline = time.monotonic() + self.flush_interval
+        while True:
+            try:
+                entry = self._queue.get(timeout=max(deadline - time.monotonic(), 0))
+            except queue.Empty:
+                entry = None
+
+            stopping = entry is _STOP
+            if entry is not None and not stopping:
+                batch.append(entry)
+
+            if batch and (stopping or len(batch) >= self.batch_size or time.monotonic() >= deadline):
+                self._write(batch)
+                for _ in batch:
+                    self._queue.task_done()
+                batch = []
+            if time.monotonic() >= deadline:
+                deadline = time.monotonic() + self.flush_interval
+            if stopping:
+                self._queue.task_done()
+                return
+
+    def _write(self, batch: List[dict]) -> None:
+        for attempt in range(self.retries + 1):
+            if self._insert(batch):
+                return
+            if attempt < self.retries:
+                time.sleep(min(self.retry_delay * 2 ** attempt, ACTIVITY_LOG_RETRY_MAX_DELAY))
+        # still failing: row by row, so one bad entry does not take the batch with it
+        failed = sum(not self._insert([entry]) for entry in batch)
+        if failed:
+            self.dropped += failed
+            print(f"{failed} logs de atividade descartados após {self.retries} tentativas")
+
+    def _insert(self, rows: List[dict]) -> bool:
+        db = self.session_factory()
+        try:
+            db.execute(insert(models.ActivityLog), rows)
+            db.commit()
+            return True
+        except Exception as e:
+            print(f"Erro ao registrar {len(rows)} logs: {e}")
+            db.rollback()
+            return False
+        finally:
+            db.close()
+
+
+writer = ActivityLogWriter(
+    session_factory=SessionLocal,
+    batch_size=ACTIVITY_LOG_BATCH_SIZE,
+    flush_interval=ACTIVITY_LOG_FLUSH_INTERVAL,
+    max_queue_size=ACTIVITY_LOG_QUEUE_SIZE,
+    enqueue_timeout=ACTIVITY_LOG_ENQUEUE_TIMEOUT,
+)
@@ -1,19 +1,21 @@
-from datetime import datetime, timedelta
-from typing import Optional
+from datetime import datetime, timedelta, timezone
+from typing import Dict, Optional, Tuple
 from jose import JWTError, jwt
-import bcrypt
 from fastapi import Depends, HTTPException, status
 from fastapi.security import OAuth2PasswordBearer
 from sqlalchemy.orm import Session
 import os
-from dotenv import load_dotenv
+import time
 
+import config  # noqa: F401  (loads .env)
+import activity_log
+import cache
 import models
+import password_hashing
 import schemas
+from cache import TTLCache
 from database import get_db
 
-load_dotenv()
-
 # JWT Configuration
 SECRET_KEY = os.getenv("SECRET_KEY")
 if not SECRET_KEY:
@@ -26,23 +28,104 @@ if not SECRET_KEY:
 ALGORITHM = "HS256"
 ACCESS_TOKEN_EXPIRE_MINUTES = 60 * 24  # 24 hours
 
-# Bcrypt limit is 72 bytes; we truncate to avoid ValueError
-BCRYPT_MAX_PASSWORD_BYTES = 72
+# Retry-After sent when the password hashing pool is saturated
+HASHING_RETRY_AFTER_SECONDS = 1
 
 # OAuth2 scheme
 oauth2_scheme = OAuth2PasswordBearer(tokenUrl="auth/login")
 
+# Principal cache: avoids re-reading the user row on every authenticated request.
+# Entries are keyed by token subject and hold only what authorization needs
+# (never the password hash). The cache lives in each worker process: explicit
+# invalidation only reaches the worker that handled the change, so the others
+# may accept a deactivated user or an old role until the TTL runs out. With
+# several workers (WEB_CONCURRENCY > 1) the TTL is capped like the memory
+# catalog cache; set it to 0 to disable the cache.
+PRINCIPAL_CACHE_TTL_SECONDS = float(os.getenv("PRINCIPAL_CACHE_TTL_SECONDS", "30"))
+PRINCIPAL_CACHE_MAX_SIZE = int(os.getenv("PRINCIPAL_CACHE_MAX_SIZE", "1024"))
+if cache.WEB_CONCURRENCY > 1:
+    PRINCIPAL_CACHE_TTL_SECONDS = min(PRINCIPAL_CACHE_TTL_SECONDS, cache.MEMORY_CACHE_MULTI_WORKER_MAX_TTL)
+
+_PRINCIPAL_FIELDS = ("id", "username", "role", "is_active")
+
+principal_cache = TTLCache(max_size=PRINCIPAL_CACHE_MAX_SIZE, ttl_seconds=PRINCIPAL_CACHE_TTL_SECONDS)
+
+# Stateless tokens (opt-in): login returns a short-lived access token carrying
+# uid/role/active, so authenticated requests need no user lookup, plus a
+# refresh token. /auth/refresh is the only endpoint that reads the user row;
+# deactivations, role and password changes revoke the user's earlier tokens by
+# setting users.tokens_valid_after, which /auth/refresh checks on every worker.
+# The revocation list below also rejects access tokens without a lookup, but
+# unless it is in Redis only on the worker that handled the change; other
+# workers accept those access tokens until they expire
+# (STATELESS_ACCESS_TOKEN_EXPIRE_MINUTES).
+AUTH_STATELESS_TOKENS = os.getenv("AUTH_STATELESS_TOKENS", "false").lower() in ("1", "true", "yes")
+STATELESS_ACCESS_TOKEN_EXPIRE_MINUTES = int(os.getenv("STATELESS_ACCESS_TOKEN_EXPIRE_MINUTES", "15"))
+REFRESH_TOKEN_EXPIRE_DAYS = int(os.getenv("REFRESH_TOKEN_EXPIRE_DAYS", "7"))
+
+
+class RevocationList:
+    """
+    user id -> time before which that user's tokens are rejected.
+
+    An entry only has to outlive the tokens issued before it, so it expires
+    after the refresh token lifetime. Stored in Redis when CACHE_BACKEND=redis
+    (shared by every worker), otherwise per process.
+    """
+
+    def __init__(self, client, ttl_seconds: float):
+        self.client = client
+        self.ttl_seconds = ttl_seconds
+        self._local: Dict[int, Tuple[float, float]] = {}  # user id -> (revoked at, entry expiry)
+
+    def revoke(self, user_id: int) -> None:
+        now = time.time()
+        if self.client is not None:
+            self.client.set(f"revoked:{user_id}", repr(now).encode("ascii"), ex=int(self.ttl_seconds))
+            return
+        for key, (_, expires) in list(self._local.items()):
+            if expires < now:
+                self._local.pop(key, None)
+        self._local[user_id] = (now, now + self.ttl_seconds)
+
+    def is_revoked(self, user_id: int, issued_at: float) -> bool:
+        if self.client is not None:
+            value = self.client.get(f"revoked:{user_id}")
+            cutoff = float(value) if value is not None else None
+        else:
+            revoked_at, expires = self._local.get(user_id, (None, 0.0))
+            cutoff = revoked_at if expires >= time.time() else None
+        return cutoff is not None and issued_at <= cutoff
+
+    def clear(self) -> None:
+        self._local.clear()
+
+
+revocations = RevocationList(
+    cache.create_backend("redis") if cache.CACHE_BACKEND == "redis" else None,
+    ttl_seconds=REFRESH_TOKEN_EXPIRE_DAYS * 86400,
+)
+
+
+def _hashing(operation, *args):
+    try:
+        return operation(*args)
+    except password_hashing.HashingBusy:
+        raise HTTPException(
+            status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+            detail="Authentication is busy, try again shortly",
+            headers={"Retry-After": str(HASHING_RETRY_AFTER_SECONDS)},
+        )
+
 
 def verify_password(plain_password: str, hashed_password: str) -> bool:
-    """Verifies if password matches the hash"""
-    pwd_bytes = plain_password.encode("utf-8")[:BCRYPT_MAX_PASSWORD_BYTES]
-    return bcrypt.checkpw(pwd_bytes, hashed_password.encode("utf-8"))
+    """Verifies if password matches the hash (on the bcrypt worker pool)"""
+    return _hashing(password_hashing.hasher.verify, plain_password, hashed_password)
 
 
 def get_password_hash(password: str) -> str:
-    """Generates password hash using bcrypt"""
-    pwd_bytes = password.encode("utf-8")[:BCRYPT_MAX_PASSWORD_BYTES]
-    return bcrypt.hashpw(pwd_bytes, bcrypt.gensalt()).decode("utf-8")
+    """Generates password hash using bcrypt (on the bcrypt worker pool)"""
+    return _hashing(password_hashing.hasher.hash, password)
 
 def create_access_token(data: dict, expires_delta: Optional[timedelta] = None) -> str:
     """Creates a JWT token"""
@@ -56,6 +139,62 @@ def create_access_token(data: dict, expires_delta: Optional[timedelta] = None) -
     encoded_jwt = jwt.encode(to_encode, SECRET_KEY, algorithm=ALGORITHM)
     return encoded_jwt
 
+def _encode_token(claims: dict, lifetime: timedelta) -> str:
+    now = time.time()
+    # float iat so a revocation issued in the same second still applies
+    return jwt.encode(
+        {**claims, "iat": now, "exp": int(now + lifetime.total_seconds())}, SECRET_KEY, algorithm=ALGORITHM
+    )
+
+
+def create_token_pair(user: models.User) -> dict:
+    """Access + refresh tokens for stateless mode (schemas.Token shape)"""
+    access_token = _encode_token(
+        {
+            "sub": user.username,
+            "uid": user.id,
+            "role": user.role.value,
+            "active": user.is_active,
+            "type": "access",
+        },
+        timedelta(minutes=STATELESS_ACCESS_TOKEN_EXPIRE_MINUTES),
+    )
+    refresh_token = _encode_token(
+        {"sub": user.username, "uid": user.id, "type": "refresh"},
+        timedelta(days=REFRESH_TOKEN_EXPIRE_DAYS),
+    )
+    return {"access_token": access_token, "refresh_token": refresh_token, "token_type": "bearer"}
+
+
+def decode_refresh_token(token: str) -> dict:
+    """Validated refresh token claims; 401 if invalid, expired or revoked"""
+    credentials_exception = HTTPException(
+        status_code=status.HTTP_401_UNAUTHORIZED,
+        detail="Invalid refresh token",
+        headers={"WWW-Authenticate": "Bearer"},
+    )
+    try:
+        payload = jwt.decode(token, SECRET_KEY, algorithms=[ALGORITHM])
+    except JWTError:
+        raise credentials_exception
+    if payload.get("type") != "refresh" or payload.get("uid") is None:
+        raise credentials_exception
+    if revocations.is_revoked(payload["uid"], payload.get("iat", 0)):
+        raise credentials_exception
+    return payload
+
+
+def revoke_tokens(user: models.User) -> None:
+    """Rejects every stateless token issued to the user so far (commit the user afterwards)"""
+    user.tokens_valid_after = time.time()
+    revocations.revoke(user.id)
+
+
+def tokens_revoked(user: models.User, payload: dict) -> bool:
+    """True if the token was issued at or before the user's last revocation"""
+    return user.tokens_valid_after is not None and payload.get("iat", 0) <= user.tokens_valid_after
+
+
 def authenticate_user(db: Session, username: str, password: str) -> Optional[models.User]:
     """Authenticates a user"""
     user = db.query(models.User).filter(models.User.username == username).first()
@@ -63,13 +202,31 @@ def authenticate_user(db: Session, username: str, password: str) -> Optional[mod
         return None
     if not verify_password(password, user.hashed_password):
         return None
+    if password_hashing.hasher.needs_rehash(user.hashed_password):
+        # BCRYPT_ROUNDS changed since this hash was made: upgrade it transparently
+        try:
+            user.hashed_password = password_hashing.hasher.hash(password)
+        except password_hashing.HashingBusy:
+            return user  # the login already succeeded; upgrade on a later one
+        db.commit()
+        invalidate_principal(user.username)
     return user
 
-async def get_current_user(
+def get_current_user(
     token: str = Depends(oauth2_scheme),
     db: Session = Depends(get_db)
 ) -> models.User:
-    """Gets the current user from JWT token"""
+    """
+    Gets the current user from JWT token.
+
+    Declared as a plain ``def`` on purpose: the user lookup is a blocking
+    SQLAlchemy query, so FastAPI must run it in its threadpool instead of
+    on the event loop.
+
+    Stateless access tokens are answered from their claims alone (plus the
+    revocation list); the returned principal only has id, username, role and
+    is_active set.
+    """
     credentials_exception = HTTPException(
         status_code=status.HTTP_401_UNAUTHORIZED,
         detail="Could not validate credentials",
@@ -79,18 +236,42 @@ async def get_current_user(
     try:
         payload = jwt.decode(token, SECRET_KEY, algorithms=[ALGORITHM])
         username: str = payload.get("sub")
-        if username is None:
+        if username is None or payload.get("type") == "refresh":
             raise credentials_exception
         token_data = schemas.TokenData(username=username, role=payload.get("role"))
     except JWTError:
         raise credentials_exception
+
+    if payload.get("type") == "access":
+        uid = payload.get("uid")
+        if uid is None or token_data.role not in models.UserRole.__members__:
+            raise credentials_exception
+        if revocations.is_revoked(uid, payload.get("iat", 0)):
+            raise credentials_exception
+        return models.User(
+            id=uid,
+            username=token_data.username,
+            role=models.UserRole(token_data.role),
+            is_active=bool(payload.get("active")),
+        )
+    
+    cached = principal_cache.get(token_data.username)
+    if cached is not None:
+        # Detached copy with only the principal fields: handlers that need the
+        # rest of the user, or to persist changes to it, must load the row.
+        return models.User(**cached)
     
     user = db.query(models.User).filter(models.User.username == token_data.username).first()
     if user is None:
         raise credentials_exception
     
+    principal_cache.set(user.username, {field: getattr(user, field) for field in _PRINCIPAL_FIELDS})
     return user
 
+def invalidate_principal(username: str) -> None:
+    """Drops a cached principal after the user's role, status or password changes"""
+    principal_cache.delete(username)
+
 async def get_current_active_user(
     current_user: models.User = Depends(get_current_user)
 ) -> models.User:
@@ -100,6 +281,7 @@ async def get_current_active_user(
     return current_user
 
 # Role-based authorization dependencies
+# These only inspect the already-loaded user (no I/O), so they can stay async.
 async def require_admin(
     current_user: models.User = Depends(get_current_active_user)
 ) -> models.User:
@@ -143,8 +325,12 @@ def log_activity(
     """
     Logs an activity in the system.
 
+    The entry is handed to the background writer (see activity_log.py) so the
+    request does not wait on the audit INSERT. If the writer's queue is full,
+    the entry is written synchronously on ``db`` instead.
+
     Args:
-        db: Database session
+        db: Database session (used only as a fallback)
         user_id: User ID (None for unauthenticated actions)
         username: User's username
         action: Type of action (LOGIN, LOGOUT, CREATE, UPDATE, DELETE, etc.)
@@ -153,17 +339,21 @@ def log_activity(
         details: Additional details in string/JSON format
         ip_address: User's IP address
     """
+    entry = {
+        "user_id": user_id,
+        "username": username,
+        "action": action,
+        "resource": resource,
+        "resource_id": resource_id,
+        "details": details,
+        "ip_address": ip_address,
+        "timestamp": datetime.now(timezone.utc),
+    }
+    if activity_log.writer.enqueue(entry):
+        return
+
     try:
-        log = models.ActivityLog(
-            user_id=user_id,
-            username=username,
-            action=action,
-            resource=resource,
-            resource_id=resource_id,
-            details=details,
-            ip_address=ip_address
-        )
-        db.add(log)
+        db.add(models.ActivityLog(**entry))
         db.commit()
     except Exception as e:
         print(f"Erro ao registrar log: {e}")
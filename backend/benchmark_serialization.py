@@ -0,0 +1,126 @@
+"""
+Compares the two ways listing endpoints build their JSON body:
+
+- pydantic: ORM objects validated and serialized through the response model
+  (what FastAPI does with response_model=List[...]);
+- fast: column tuples encoded by fast_json (FAST_JSON_RESPONSES=true).
+
+Runs against a throwaway in-memory SQLite database, so it never touches the
+configured one. Times include the query, as in a request.
+
+    python benchmark_serialization.py [--sizes 100 1000 10000] [--repeat 5]
+"""
+
+import argparse
+import time
+from datetime import datetime, timedelta, timezone
+from typing import Callable, List
+
+from pydantic import TypeAdapter
+from sqlalchemy import create_engine, select
+from sqlalchemy.orm import Session, selectinload
+from sqlalchemy.pool import StaticPool
+
+import fast_json
+import models
+import schemas
+from database import Base
+from routers import auth as auth_router
+from routers import orders as orders_router
+
+ITEMS_PER_ORDER = 3
+
+
+def _seed(session: Session, rows: int) -> None:
+    base = datetime(2026, 1, 1, tzinfo=timezone.utc)
+    user = models.User(username="bench", email="bench@example.com", hashed_password="-")
+    session.add(user)
+    session.flush()
+    session.add_all(
+        models.ActivityLog(
+            user_id=user.id,
+            username=user.username,
+            action="UPDATE",
+            resource="PRODUCT",
+            resource_id=i,
+            details=f'{{"field": "price", "value": {i}}}',
+            ip_address="10.0.0.1",
+            timestamp=base + timedelta(seconds=i),
+        )
+        for i in range(rows)
+    )
+    for i in range(rows):
+        order = models.Order(
+            user_id=user.id,
+            total_amount=30.0,
+            payment_method=models.PaymentMethod.PIX,
+            delivery_type=models.DeliveryType.PICKUP,
+            created_at=base + timedelta(seconds=i),
+        )
+        order.items = [
+            models.OrderItem(product_id=item + 1, quantity=1, unit_price=10.0, product_title=f"Livro {item}")
+            for item in range(ITEMS_PER_ORDER)
+        ]
+        session.add(order)
+    session.commit()
+
+
+def _logs_pydantic(session: Session) -> bytes:
+    logs = session.query(models.ActivityLog).order_by(models.ActivityLog.id).all()
+    adapter = TypeAdapter(List[schemas.ActivityLog])
+    return adapter.dump_json(adapter.validate_python(logs, from_attributes=True))
+
+
+def _logs_fast(session: Session) -> bytes:
+    rows = session.execute(select(*auth_router._LOG_COLUMNS).order_by(models.ActivityLog.id)).all()
+    return fast_json.encode_rows(rows, auth_router._LOG_FIELDS)
+
+
+def _orders_pydantic(session: Session) -> bytes:
+    orders = session.query(models.Order).options(selectinload(models.Order.items)).order_by(models.Order.id).all()
+    adapter = TypeAdapter(List[schemas.OrderDetail])
+    return adapter.dump_json([orders_router._order_to_detail(order) for order in orders])
+
+
+def _orders_fast(session: Session) -> bytes:
+    rows = session.execute(select(*orders_router._ORDER_COLUMNS).order_by(models.Order.id)).all()
+    return fast_json.dumps(orders_router._order_rows_to_details(session, rows))
+
+
+def _best_of(engine, build: Callable[[Session], bytes], repeat: int) -> float:
+    best = float("inf")
+    for _ in range(repeat):
+        with Session(engine) as session:  # fresh identity map: every run hydrates from scratch
+            start = time.perf_counter()
+            build(session)
+            best = min(best, time.perf_counter() - start)
+    return best
+
+
+def run(sizes: List[int], repeat: int) -> None:
+    print(f"encoder: {fast_json.ENCODER}; best of {repeat} runs, query included")
+    print(f"{'listing':<22}{'rows':>8}{'pydantic ms':>14}{'fast ms':>10}{'speedup':>10}")
+    for size in sizes:
+        engine = create_engine("sqlite://", connect_args={"check_same_thread": False}, poolclass=StaticPool)
+        Base.metadata.create_all(engine)  # throwaway database, no migrations needed
+        with Session(engine) as session:
+            _seed(session, size)
+        for name, slow, fast in (
+            ("ActivityLog", _logs_pydantic, _logs_fast),
+            (f"OrderDetail ({ITEMS_PER_ORDER} items)", _orders_pydantic, _orders_fast),
+        ):
+            slow_seconds = _best_of(engine, slow, repeat)
+            fast_seconds = _best_of(engine, fast, repeat)
+            print(
+                f"{name:<22}{size:>8}{slow_seconds * 1000:>14.1f}{fast_seconds * 1000:>10.1f}"
+                f"{slow_seconds / fast_seconds:>9.1f}x"
+            )
+        engine.dispose()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--sizes", type=int, nargs="+", default=[100, 1000, 10000])
+    parser.add_argument("--repeat", type=int, default=5)
+    args = parser.parse_args()
+    run(args.sizes, args.repeat)
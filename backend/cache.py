@@ -0,0 +1,217 @@
+"""
+In-process and Redis-backed caches.
+
+TTLCache is a plain LRU+TTL map used for small per-worker caches (e.g. the
+principal cache in auth.py). ResponseCache stores pre-serialized JSON responses
+for the public catalog endpoints on top of any backend that speaks the small
+Redis subset used here (get / set with ``ex`` / delete / incr), so a Redis
+client, InMemoryCacheBackend or a test stand-in can be plugged in.
+"""
+
+import json
+import os
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Dict, Hashable, Optional, Tuple
+from urllib.parse import urlencode
+
+from fastapi import Response
+
+CACHE_BACKEND = os.getenv("CACHE_BACKEND", "memory")  # memory | redis | none
+REDIS_URL = os.getenv("REDIS_URL", "redis://localhost:6379/0")
+CATALOG_CACHE_TTL_SECONDS = int(os.getenv("CATALOG_CACHE_TTL_SECONDS", "60"))
+CATALOG_CACHE_MAX_ENTRIES = int(os.getenv("CATALOG_CACHE_MAX_ENTRIES", "1024"))
+# worker processes (uvicorn/gunicorn read the same variable). The memory backend
+# only sees invalidations made by its own worker, so with several workers its
+# TTL is capped: other workers serve stale catalog data for at most that long.
+WEB_CONCURRENCY = int(os.getenv("WEB_CONCURRENCY", "1"))
+MEMORY_CACHE_MULTI_WORKER_MAX_TTL = int(os.getenv("MEMORY_CACHE_MULTI_WORKER_MAX_TTL", "5"))
+
+
+class TTLCache:
+    """
+    Small thread-safe in-process cache with a size bound and per-entry TTL.
+
+    Entries are evicted in least-recently-used order once ``max_size`` is
+    reached, and are treated as missing once they are older than
+    ``ttl_seconds``. A ``ttl_seconds`` or ``max_size`` of 0 disables caching.
+    """
+
+    def __init__(self, max_size: int, ttl_seconds: float):
+        self.max_size = max_size
+        self.ttl_seconds = ttl_seconds
+        self._data: "OrderedDict[Hashable, tuple]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    @property
+    def enabled(self) -> bool:
+        return self.max_size > 0 and self.ttl_seconds > 0
+
+    def get(self, key: Hashable) -> Optional[Any]:
+        """Returns the cached value or None if missing/expired"""
+        if not self.enabled:
+            return None
+        with self._lock:
+            entry = self._data.get(key)
+            if entry is None:
+                return None
+            expires_at, value = entry
+            if expires_at < time.monotonic():
+                del self._data[key]
+                return None
+            self._data.move_to_end(key)
+            return value
+
+    def set(self, key: Hashable, value: Any, ttl: Optional[float] = None) -> None:
+        """Stores a value, evicting the least recently used entry if full"""
+        if not self.enabled:
+            return
+        ttl = self.ttl_seconds if ttl is None else ttl
+        with self._lock:
+            self._data[key] = (time.monotonic() + ttl, value)
+            self._data.move_to_end(key)
+            while len(self._data) > self.max_size:
+                self._data.popitem(last=False)
+
+    def delete(self, key: Hashable) -> None:
+        with self._lock:
+            self._data.pop(key, None)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._data.clear()
+
+    def __len__(self) -> int:
+        return len(self._data)
+
+
+class InMemoryCacheBackend:
+    """
+    Per-worker backend with the same method signatures as redis.Redis.
+    Counters created with incr() are kept apart from the LRU so they are never
+    evicted (losing one would resurrect entries of an old namespace version).
+    """
+
+    def __init__(self, max_entries: int, default_ttl: float):
+        self._entries = TTLCache(max_size=max_entries, ttl_seconds=default_ttl)
+        self._counters: Dict[str, int] = {}
+        self._lock = threading.Lock()
+
+    def get(self, name: str) -> Optional[bytes]:
+        if name in self._counters:
+            return str(self._counters[name]).encode("ascii")
+        return self._entries.get(name)
+
+    def set(self, name: str, value: bytes, ex: Optional[int] = None) -> bool:
+        self._entries.set(name, value, ttl=ex)
+        return True
+
+    def delete(self, *names: str) -> int:
+        for name in names:
+            self._entries.delete(name)
+            with self._lock:
+                self._counters.pop(name, None)
+        return len(names)
+
+    def incr(self, name: str, amount: int = 1) -> int:
+        with self._lock:
+            self._counters[name] = self._counters.get(name, 0) + amount
+            return self._counters[name]
+
+
+class ResponseCache:
+    """
+    Read-through cache of serialized JSON responses, grouped in namespaces.
+
+    Keys embed a per-namespace version, so invalidating a namespace is a single
+    INCR: every key built before it simply stops being looked up and ages out.
+    """
+
+    def __init__(self, backend: Optional[Any], ttl_seconds: int):
+        self.backend = backend
+        self.ttl_seconds = ttl_seconds
+
+    @property
+    def enabled(self) -> bool:
+        return self.backend is not None and self.ttl_seconds > 0
+
+    def key(self, namespace: str, **params: Any) -> Optional[str]:
+        """
+        Versioned key for a response. Build it once, before reading the database,
+        and pass it to both get() and set(): a response computed while a write
+        invalidates the namespace is then stored under the old version and never
+        served.
+        """
+        if not self.enabled:
+            return None
+        try:
+            version = self.backend.get(f"cache:{namespace}:version")
+        except Exception as e:
+            print(f"Erro ao ler cache: {e}")
+            return None
+        version = int(version) if version is not None else 0
+        query = urlencode(sorted((k, "" if v is None else v) for k, v in params.items()))
+        return f"cache:{namespace}:v{version}:{query}"
+
+    def get(self, key: Optional[str]) -> Optional[Tuple[bytes, Dict[str, str]]]:
+        """Returns (body, headers) for a cached response, or None"""
+        if key is None:
+            return None
+        try:
+            raw = self.backend.get(key)
+        except Exception as e:
+            print(f"Erro ao ler cache: {e}")
+            return None
+        if raw is None:
+            return None
+        headers, _, body = raw.partition(b"\n")
+        return body, json.loads(headers)
+
+    def set(self, key: Optional[str], body: bytes, headers: Optional[Dict[str, str]] = None) -> None:
+        if key is None:
+            return
+        raw = json.dumps(headers or {}).encode("utf-8") + b"\n" + body
+        try:
+            self.backend.set(key, raw, ex=self.ttl_seconds)
+        except Exception as e:
+            print(f"Erro ao gravar cache: {e}")
+
+    def invalidate(self, *namespaces: str) -> None:
+        """Drops every cached response of the given namespaces"""
+        if self.backend is None:
+            return
+        for namespace in namespaces:
+            try:
+                self.backend.incr(f"cache:{namespace}:version")
+            except Exception as e:
+                print(f"Erro ao invalidar cache: {e}")
+
+
+def json_response(body: bytes, headers: Optional[Dict[str, str]] = None) -> Response:
+    """Wraps an already-serialized JSON body"""
+    return Response(content=body, media_type="application/json", headers=headers)
+
+
+def create_backend(kind: str = CACHE_BACKEND):
+    if kind == "redis":
+        import redis  # optional dependency, only needed for CACHE_BACKEND=redis
+
+        return redis.Redis.from_url(REDIS_URL)
+    if kind == "memory":
+        return InMemoryCacheBackend(max_entries=CATALOG_CACHE_MAX_ENTRIES, default_ttl=CATALOG_CACHE_TTL_SECONDS)
+    return None
+
+
+def effective_ttl(kind: str = CACHE_BACKEND, ttl: int = CATALOG_CACHE_TTL_SECONDS, workers: int = WEB_CONCURRENCY) -> int:
+    """Catalog TTL, capped for the per-worker memory backend when several workers run"""
+    if kind == "memory" and workers > 1 and ttl > MEMORY_CACHE_MULTI_WORKER_MAX_TTL:
+        print(
+            f"CACHE_BACKEND=memory com {workers} workers: TTL do cache do catálogo limitado a "
+            f"{MEMORY_CACHE_MULTI_WORKER_MAX_TTL}s (use CACHE_BACKEND=redis para invalidação entre workers)"
+        )
+        return MEMORY_CACHE_MULTI_WORKER_MAX_TTL
+    return ttl
+
+
+catalog_cache = ResponseCache(create_backend(), ttl_seconds=effective_ttl())
@@ -0,0 +1,155 @@
+"""
+Precomputed catalog read model (table catalog_projection).
+
+Each product has a row with its category id, its version (updated_at or
+created_at, used for ETags) and its schemas.Product JSON, category included.
+The catalog listing and detail endpoints read only this table and splice the
+stored JSON into the response, so the hot path does no join and no ORM or
+Pydantic work.
+
+Rows are refreshed incrementally inside the transaction that changes the
+product, right before it commits:
+- ORM inserts/updates/deletes of products and updates of categories are
+  picked up by mapper events;
+- Core statements bypass those events, so their callers mark the affected
+  products explicitly with mark() (checkout stock updates, bulk import).
+
+rebuild() recomputes the whole table: ``python catalog_projection.py
+--if-empty`` fills it after migration 0005 creates it, and a plain
+``python catalog_projection.py`` resyncs it after writes made outside the app.
+"""
+
+import argparse
+from typing import Iterable, List, Optional
+
+from sqlalchemy import delete, event, insert
+from sqlalchemy.orm import Session, joinedload
+
+import models
+import schemas
+
+REBUILD_BATCH_SIZE = 1000
+
+_PENDING_PRODUCTS = "catalog_pending_products"
+_PENDING_CATEGORIES = "catalog_pending_categories"
+
+
+def mark(session: Session, product_ids: Iterable[int] = (), category_ids: Iterable[int] = ()) -> None:
+    """Schedules a refresh of these products (and every product of these categories) at commit"""
+    session.info.setdefault(_PENDING_PRODUCTS, set()).update(product_ids)
+    session.info.setdefault(_PENDING_CATEGORIES, set()).update(category_ids)
+
+
+def entry(product: models.Product) -> dict:
+    """Projection row for a product loaded with its category"""
+    return {
+        "product_id": product.id,
+        "category_id": product.category_id,
+        "version": product.updated_at or product.created_at,
+        "payload": schemas.Product.model_validate(product).model_dump_json(),
+    }
+
+
+def refresh(session: Session, product_ids: Iterable[int] = (), category_ids: Iterable[int] = ()) -> None:
+    """Recomputes the rows of the given products / categories (deleted products lose their row)"""
+    product_ids, category_ids = sorted(set(product_ids)), sorted(set(category_ids))
+    if not product_ids and not category_ids:
+        return
+    query = session.query(models.Product).options(joinedload(models.Product.category))
+    stale = delete(models.CatalogEntry)
+    if product_ids and category_ids:
+        query = query.filter(
+            models.Product.id.in_(product_ids) | models.Product.category_id.in_(category_ids)
+        )
+        stale = stale.where(
+            models.CatalogEntry.product_id.in_(product_ids) | models.CatalogEntry.category_id.in_(category_ids)
+        )
+    elif product_ids:
+        query = query.filter(models.Product.id.in_(product_ids))
+        stale = stale.where(models.CatalogEntry.product_id.in_(product_ids))
+    else:
+        query = query.filter(models.Product.category_id.in_(category_ids))
+        stale = stale.where(models.CatalogEntry.category_id.in_(category_ids))
+
+    rows = [entry(product) for product in query.populate_existing()]
+    session.execute(stale)
+    if rows:
+        session.execute(insert(models.CatalogEntry), rows)
+
+
+def rebuild(session: Session) -> int:
+    """Recomputes the whole projection; returns the number of rows"""
+    session.execute(delete(models.CatalogEntry))
+    count = 0
+    last_id = 0
+    while True:
+        batch: List[models.Product] = (
+            session.query(models.Product)
+            .options(joinedload(models.Product.category))
+            .filter(models.Product.id > last_id)
+            .order_by(models.Product.id)
+            .limit(REBUILD_BATCH_SIZE)
+            .all()
+        )
+        if not batch:
+            return count
+        session.execute(insert(models.CatalogEntry), [entry(product) for product in batch])
+        count += len(batch)
+        last_id = batch[-1].id
+        session.expunge_all()
+
+
+# ORM writes: queue the affected rows; refreshed in before_commit below.
+
+@event.listens_for(models.Product, "after_insert")
+@event.listens_for(models.Product, "after_update")
+@event.listens_for(models.Product, "after_delete")
+def _queue_product(mapper, connection, target):
+    session = Session.object_session(target)
+    if session is not None:
+        mark(session, product_ids=[target.id])
+
+
+@event.listens_for(models.Category, "after_update")
+def _queue_category(mapper, connection, target):
+    session = Session.object_session(target)
+    if session is not None:
+        mark(session, category_ids=[target.id])
+
+
+@event.listens_for(Session, "before_commit")
+def _refresh_pending(session):
+    session.flush()  # runs the mapper events for still-pending changes
+    product_ids: Optional[set] = session.info.pop(_PENDING_PRODUCTS, None)
+    category_ids: Optional[set] = session.info.pop(_PENDING_CATEGORIES, None)
+    if product_ids or category_ids:
+        refresh(session, product_ids or (), category_ids or ())
+
+
+@event.listens_for(Session, "after_rollback")
+def _discard_pending(session):
+    session.info.pop(_PENDING_PRODUCTS, None)
+    session.info.pop(_PENDING_CATEGORIES, None)
+
+
+def is_empty(session: Session) -> bool:
+    return session.query(models.CatalogEntry.product_id).first() is None
+
+
+if __name__ == "__main__":
+    from database import SessionLocal
+
+    parser = argparse.ArgumentParser(description="Rebuild the catalog_projection table from products")
+    parser.add_argument("--if-empty", action="store_true", help="only when the table has no rows (after migration 0005)")
+    args = parser.parse_args()
+
+    db = SessionLocal()
+    try:
+        if args.if_empty and not is_empty(db):
+            print("Projeção do catálogo já preenchida")
+        else:
+            total = rebuild(db)
+            db.commit()
+            print(f"Projeção do catálogo reconstruída: {total} produtos")
+    finally:
+        db.close()
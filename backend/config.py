@@ -0,0 +1,11 @@
+"""
+Loads backend/.env into the process environment.
+
+Imported before anything that reads settings with os.getenv, so the file is
+parsed exactly once per process (variables already set in the environment
+take precedence).
+"""
+
+from dotenv import load_dotenv
+
+load_dotenv()
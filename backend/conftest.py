@@ -0,0 +1,125 @@
+"""
+Shared pytest fixtures.
+
+Tests run against a throwaway SQLite database by default. Set TEST_DATABASE_URL
+to run them against PostgreSQL instead (recommended for the concurrency tests).
+"""
+
+import os
+import tempfile
+from contextlib import contextmanager
+
+os.environ.setdefault("SECRET_KEY", "test-secret-key")
+# cheap, inline hashing; test_password_hashing.py covers the worker pool
+os.environ.setdefault("BCRYPT_ROUNDS", "4")
+os.environ.setdefault("BCRYPT_WORKERS", "0")
+# tests run the reservation sweep explicitly (reservations.run_sweep)
+os.environ.setdefault("RESERVATION_SWEEP_INTERVAL", "0")
+os.environ["DATABASE_URL"] = os.getenv(
+    "TEST_DATABASE_URL",
+    f"sqlite:///{os.path.join(tempfile.gettempdir(), 'compia_test.db')}",
+)
+
+import bcrypt
+import pytest
+from fastapi.testclient import TestClient
+from sqlalchemy import event
+
+import activity_log
+import auth
+import cache
+import models
+import rate_limit
+import search
+from database import Base, SessionLocal, engine
+
+
+@pytest.fixture()
+def db():
+    """Fresh schema for each test"""
+    activity_log.writer.flush()
+    Base.metadata.drop_all(bind=engine)
+    Base.metadata.create_all(bind=engine)
+    auth.principal_cache.clear()
+    auth.revocations.clear()
+    cache.catalog_cache.invalidate("products", "categories")
+    search.local_index.reset()
+    rate_limit.login_limiter.reset()
+    session = SessionLocal()
+    try:
+        yield session
+    finally:
+        session.close()
+
+
+@pytest.fixture()
+def client(db):
+    from main import app
+
+    with TestClient(app) as test_client:
+        yield test_client
+
+
+# cheap hash shared by test users (default bcrypt cost makes user-heavy tests slow)
+_TEST_PASSWORD_HASH = bcrypt.hashpw(b"secret", bcrypt.gensalt(rounds=4)).decode("utf-8")
+
+
+def create_user(db, username: str, role: models.UserRole = models.UserRole.CLIENTE) -> models.User:
+    """Creates a user whose password is 'secret'"""
+    user = models.User(
+        username=username,
+        email=f"{username}@compia.com.br",
+        hashed_password=_TEST_PASSWORD_HASH,
+        role=role,
+        is_active=True,
+    )
+    db.add(user)
+    db.commit()
+    db.refresh(user)
+    return user
+
+
+def create_category(db, name: str = "IA") -> models.Category:
+    """Creates a product category"""
+    category = models.Category(name=name)
+    db.add(category)
+    db.commit()
+    db.refresh(category)
+    return category
+
+
+def create_product(db, category: models.Category, title: str, price: float = 10.0, **fields) -> models.Product:
+    """Creates a product in ``category``; other columns (stock_quantity, ...) as keyword arguments"""
+    fields.setdefault("description", "-")
+    product = models.Product(title=title, price=price, category_id=category.id, **fields)
+    db.add(product)
+    db.commit()
+    db.refresh(product)
+    return product
+
+
+def auth_headers(user: models.User) -> dict:
+    token = auth.create_access_token({"sub": user.username, "role": user.role.value})
+    return {"Authorization": f"Bearer {token}"}
+
+
+@contextmanager
+def max_queries(budget: int):
+    """
+    Fails the test if the wrapped block runs more than ``budget`` SQL statements.
+    Wrap a single client call to enforce a per-request query budget.
+    """
+    executed = []
+    activity_log.writer.flush()  # keep pending audit inserts out of the count
+
+    def count(conn, cursor, statement, parameters, context, executemany):
+        executed.append(statement)
+
+    event.listen(engine, "after_cursor_execute", count)
+    try:
+        yield executed
+    finally:
+        event.remove(engine, "after_cursor_execute", count)
+    assert len(executed) <= budget, (
+        f"{len(executed)} queries exceeded the budget of {budget}:\n" + "\n".join(executed)
+    )
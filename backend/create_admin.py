@@ -1,22 +1,20 @@
 """
 Script to create the first administrator user in the system.
-Run this script after starting the database.
+Run this script after applying the migrations.
 
 Usage:
+    alembic upgrade head
     python create_admin.py
 """
 
 from sqlalchemy.orm import Session
-from database import SessionLocal, engine, Base
+from database import SessionLocal
 from models import User, UserRole
 from auth import get_password_hash
 
 def create_admin_user():
     """Creates the first administrator user"""
     
-    # Create tables if they don't exist
-    Base.metadata.create_all(bind=engine)
-    
     db = SessionLocal()
     
     try:
@@ -0,0 +1,68 @@
+"""
+Opt-in fast path for JSON listing responses (FAST_JSON_RESPONSES=true).
+
+The default path loads ORM objects and lets FastAPI validate and serialize
+every row through the endpoint's Pydantic response_model. With the fast path
+the endpoints select only the response's columns and encode those rows
+directly, with orjson when it is installed (``pip install orjson``) and the
+standard json module otherwise. The body is the same JSON the Pydantic path
+produces (datetimes in ISO 8601 with "Z" for UTC, enums by value) and the
+response_model stays declared, so the OpenAPI schema does not change.
+
+Rows are not validated on the way out: only use it for data that was
+validated when written. Compare both paths with
+``python benchmark_serialization.py``.
+"""
+
+import json
+import os
+from datetime import date, datetime, timedelta
+from enum import Enum
+from typing import Any, Dict, Iterable, List, Sequence
+
+try:
+    import orjson
+except ImportError:  # optional dependency
+    orjson = None
+
+FAST_JSON_RESPONSES = os.getenv("FAST_JSON_RESPONSES", "false").lower() == "true"
+
+ENCODER = "orjson" if orjson is not None else "json"
+
+
+def _isoformat(value: datetime) -> str:
+    text = value.isoformat()
+    if value.utcoffset() == timedelta(0):
+        text = text[:-6] + "Z"  # same as Pydantic: "+00:00" becomes "Z"
+    return text
+
+
+def _default(value: Any):
+    if isinstance(value, datetime):
+        return _isoformat(value)
+    if isinstance(value, date):
+        return value.isoformat()
+    if isinstance(value, Enum):
+        return value.value
+    raise TypeError(f"Object of type {type(value).__name__} is not JSON serializable")
+
+
+def dumps(value: Any) -> bytes:
+    """Compact UTF-8 JSON"""
+    if orjson is not None:
+        return orjson.dumps(value, option=orjson.OPT_UTC_Z)
+    return json.dumps(value, default=_default, ensure_ascii=False, separators=(",", ":")).encode("utf-8")
+
+
+def loads(data):
+    return orjson.loads(data) if orjson is not None else json.loads(data)
+
+
+def as_dicts(rows: Iterable[Sequence], fields: Sequence[str]) -> List[Dict[str, Any]]:
+    """Column tuples (in ``fields`` order) as response objects"""
+    return [dict(zip(fields, row)) for row in rows]
+
+
+def encode_rows(rows: Iterable[Sequence], fields: Sequence[str]) -> bytes:
+    """JSON array of objects built from column tuples"""
+    return dumps(as_dicts(rows, fields))
@@ -0,0 +1,72 @@
+"""
+HTTP validators (ETag / Last-Modified) and conditional GET handling.
+
+Catalog responses carry a weak ETag derived from the (id, version) pairs of the
+rows they contain, where a product's version is updated_at (or created_at if it
+was never updated). Single-resource responses also carry Last-Modified from that
+version. Listings do not: the newest version among the returned rows does not
+move when a row is deleted, so If-Modified-Since would answer a stale 304; their
+ETag covers the set of ids and does change. Clients that send a matching
+If-None-Match / If-Modified-Since get a bodyless 304.
+"""
+
+import hashlib
+from datetime import datetime, timezone
+from email.utils import format_datetime, parsedate_to_datetime
+from typing import Dict, Iterable, Optional, Tuple
+
+from fastapi import Request, Response
+
+CACHE_CONTROL = "no-cache"  # browsers may store catalog responses but must revalidate
+
+
+def _utc(value: datetime) -> datetime:
+    # SQLite returns naive datetimes; the database stores UTC
+    return value.replace(tzinfo=timezone.utc) if value.tzinfo is None else value.astimezone(timezone.utc)
+
+
+def validators(
+    versions: Iterable[Tuple[int, Optional[datetime]]], *extra, last_modified: bool = True
+) -> Dict[str, str]:
+    """
+    Builds ETag / Last-Modified / Cache-Control headers for rows given as
+    (id, version) pairs. ``extra`` values (e.g. the page parameters) are mixed
+    into the ETag. Pass ``last_modified=False`` for collections (see above).
+    """
+    digest = hashlib.sha1(repr(extra).encode("utf-8"))
+    newest = None
+    for row_id, version in versions:
+        stamp = _utc(version) if version is not None else None
+        digest.update(f"{row_id}:{stamp.isoformat() if stamp else ''};".encode("utf-8"))
+        if stamp is not None and (newest is None or stamp > newest):
+            newest = stamp
+    headers = {"ETag": f'W/"{digest.hexdigest()[:32]}"', "Cache-Control": CACHE_CONTROL}
+    if last_modified and newest is not None:
+        headers["Last-Modified"] = format_datetime(newest, usegmt=True)
+    return headers
+
+
+def is_not_modified(request: Request, headers: Dict[str, str]) -> bool:
+    """Evaluates If-None-Match (preferred) or If-Modified-Since against ``headers``"""
+    if_none_match = request.headers.get("if-none-match")
+    etag = headers.get("ETag")
+    if if_none_match is not None:
+        if etag is None:
+            return False
+        candidates = [tag.strip() for tag in if_none_match.split(",")]
+        # weak comparison: W/"x" matches "x"
+        return "*" in candidates or etag.removeprefix("W/") in {tag.removeprefix("W/") for tag in candidates}
+
+    if_modified_since = request.headers.get("if-modified-since")
+    last_modified = headers.get("Last-Modified")
+    if if_modified_since and last_modified:
+        try:
+            since = parsedate_to_datetime(if_modified_since)
+        except (TypeError, ValueError):
+            return False
+        return parsedate_to_datetime(last_modified) <= _utc(since)
+    return False
+
+
+def not_modified(headers: Dict[str, str]) -> Response:
+    return Response(status_code=304, headers=headers)
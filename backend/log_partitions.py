@@ -0,0 +1,271 @@
+"""
+Monthly partitions and retention for activity_logs (PostgreSQL only).
+
+Migration 0004 turns activity_logs into a table partitioned by RANGE
+(timestamp) with one partition per month (activity_logs_y2026m10, ...) plus a
+DEFAULT partition that catches rows outside the created months. Maintenance
+(run at startup, every ACTIVITY_LOG_MAINTENANCE_INTERVAL seconds and via
+``python log_partitions.py``):
+
+- creates the partitions for the current month and the next
+  ACTIVITY_LOG_PARTITIONS_AHEAD months, moving any matching rows out of the
+  DEFAULT partition first;
+- when ACTIVITY_LOG_RETENTION_MONTHS > 0, detaches and drops the partitions
+  older than that. With ACTIVITY_LOG_ARCHIVE_DIR set, each partition is first
+  exported to <dir>/<partition>.csv.gz and only dropped if the export
+  succeeded. Dropping a partition is a metadata operation, so retention does
+  not generate per-row DELETE WAL or leave bloat behind for vacuum. Rows older
+  than the window that sit in the DEFAULT partition (no monthly partition was
+  ever created for them) are deleted by timestamp instead, after the same
+  optional export to <dir>/activity_logs_default_before_<YYYYMM>.csv.gz.
+
+An advisory lock makes concurrent runs (several workers) a no-op. On other
+databases (SQLite in tests/dev) activity_logs is a plain table and
+maintenance does nothing.
+"""
+
+import argparse
+import gzip
+import os
+import re
+import threading
+from datetime import date, datetime, timezone
+from typing import List, Optional
+
+from sqlalchemy import text
+from sqlalchemy.engine import Connection, Engine
+
+from database import engine as default_engine
+
+ACTIVITY_LOG_PARTITIONS_AHEAD = int(os.getenv("ACTIVITY_LOG_PARTITIONS_AHEAD", "3"))
+ACTIVITY_LOG_RETENTION_MONTHS = int(os.getenv("ACTIVITY_LOG_RETENTION_MONTHS", "0"))  # 0 = keep forever
+ACTIVITY_LOG_ARCHIVE_DIR = os.getenv("ACTIVITY_LOG_ARCHIVE_DIR", "")  # empty = drop without archiving
+ACTIVITY_LOG_MAINTENANCE_INTERVAL = float(os.getenv("ACTIVITY_LOG_MAINTENANCE_INTERVAL", "21600"))  # 0 = disabled
+
+PARENT_TABLE = "activity_logs"
+DEFAULT_PARTITION = "activity_logs_default"
+MAINTENANCE_LOCK_ID = 0x6C6F6773  # pg advisory lock key ("logs")
+
+_PARTITION_NAME = re.compile(r"^activity_logs_y(\d{4})m(\d{2})$")
+
+
+def month_floor(value) -> date:
+    return date(value.year, value.month, 1)
+
+
+def add_months(month: date, count: int) -> date:
+    index = month.year * 12 + month.month - 1 + count
+    return date(index // 12, index % 12 + 1, 1)
+
+
+def partition_name(month: date) -> str:
+    return f"activity_logs_y{month.year:04d}m{month.month:02d}"
+
+
+def partition_month(name: str) -> Optional[date]:
+    """Month covered by a partition, or None for names that are not monthly partitions"""
+    match = _PARTITION_NAME.match(name)
+    return date(int(match.group(1)), int(match.group(2)), 1) if match else None
+
+
+def _bound(month: date) -> str:
+    return f"'{month.isoformat()} 00:00:00+00'"
+
+
+def create_partition_sql(month: date) -> List[str]:
+    """
+    Statements that create the partition for ``month``. Rows already sitting in
+    the DEFAULT partition for that range are moved before ATTACH, which would
+    otherwise fail.
+    """
+    name, start, end = partition_name(month), _bound(month), _bound(add_months(month, 1))
+    return [
+        f"CREATE TABLE IF NOT EXISTS {name} (LIKE {PARENT_TABLE} INCLUDING DEFAULTS INCLUDING CONSTRAINTS)",
+        f"WITH moved AS (DELETE FROM {DEFAULT_PARTITION} WHERE timestamp >= {start} AND timestamp < {end} "
+        f"RETURNING *) INSERT INTO {name} SELECT * FROM moved",
+        f"ALTER TABLE {PARENT_TABLE} ATTACH PARTITION {name} FOR VALUES FROM ({start}) TO ({end})",
+    ]
+
+
+def expired_months(months: List[date], today: date, retention_months: int) -> List[date]:
+    """Months entirely older than the retention window"""
+    if retention_months <= 0:
+        return []
+    cutoff = add_months(month_floor(today), -retention_months)
+    return sorted(month for month in months if month < cutoff)
+
+
+def existing_partitions(conn: Connection) -> List[str]:
+    rows = conn.execute(
+        text(
+            "SELECT child.relname FROM pg_inherits "
+            "JOIN pg_class parent ON parent.oid = pg_inherits.inhparent "
+            "JOIN pg_class child ON child.oid = pg_inherits.inhrelid "
+            "WHERE parent.relname = :parent"
+        ),
+        {"parent": PARENT_TABLE},
+    )
+    return [row[0] for row in rows]
+
+
+def is_partitioned(conn: Connection) -> bool:
+    if conn.dialect.name != "postgresql":
+        return False
+    return bool(
+        conn.execute(
+            text("SELECT 1 FROM pg_partitioned_table JOIN pg_class ON pg_class.oid = partrelid WHERE relname = :name"),
+            {"name": PARENT_TABLE},
+        ).scalar()
+    )
+
+
+def ensure_partitions(conn: Connection, today: date, months_ahead: int) -> List[str]:
+    """Creates missing partitions from the current month up to ``months_ahead``; returns the new ones"""
+    existing = set(existing_partitions(conn))
+    created = []
+    for offset in range(months_ahead + 1):
+        month = add_months(month_floor(today), offset)
+        name = partition_name(month)
+        if name in existing:
+            continue
+        with conn.begin_nested():
+            for statement in create_partition_sql(month):
+                conn.execute(text(statement))
+        created.append(name)
+    return created
+
+
+def archive_partition(conn: Connection, name: str, archive_dir: str, where: str = "", file_name: str = "") -> str:
+    """
+    Exports a partition (optionally only the rows matching ``where``) as
+    gzip-compressed CSV with header; returns the file path
+    """
+    os.makedirs(archive_dir, exist_ok=True)
+    path = os.path.join(archive_dir, f"{file_name or name}.csv.gz")
+    partial = f"{path}.partial"
+    condition = f" WHERE {where}" if where else ""
+    copy_sql = f"COPY (SELECT * FROM {name}{condition} ORDER BY timestamp, id) TO STDOUT WITH (FORMAT csv, HEADER)"
+    cursor = conn.connection.dbapi_connection.cursor()
+    try:
+        with gzip.open(partial, "wb") as out:
+            if hasattr(cursor, "copy_expert"):  # psycopg2
+                cursor.copy_expert(copy_sql, out)
+            else:  # psycopg 3
+                with cursor.copy(copy_sql) as copy:
+                    for chunk in copy:
+                        out.write(chunk)
+    finally:
+        cursor.close()
+    os.replace(partial, path)  # only complete archives get the final name
+    return path
+
+
+def drop_expired_partitions(conn: Connection, today: date, retention_months: int, archive_dir: str) -> List[str]:
+    """Archives (optionally) and drops partitions older than the retention window; returns the dropped ones"""
+    months = {partition_month(name): name for name in existing_partitions(conn)}
+    months.pop(None, None)
+    dropped = []
+    for month in expired_months(list(months), today, retention_months):
+        name = months[month]
+        if archive_dir:
+            archive_partition(conn, name, archive_dir)
+        with conn.begin_nested():
+            conn.execute(text(f"ALTER TABLE {PARENT_TABLE} DETACH PARTITION {name}"))
+            conn.execute(text(f"DROP TABLE {name}"))
+        dropped.append(name)
+    return dropped
+
+
+def purge_expired_default_rows(conn: Connection, today: date, retention_months: int, archive_dir: str) -> int:
+    """Archives (optionally) and deletes DEFAULT partition rows older than the retention window; returns how many"""
+    if retention_months <= 0:
+        return 0
+    cutoff = add_months(month_floor(today), -retention_months)
+    where = f"timestamp < {_bound(cutoff)}"
+    if not conn.execute(text(f"SELECT 1 FROM {DEFAULT_PARTITION} WHERE {where} LIMIT 1")).scalar():
+        return 0
+    if archive_dir:
+        file_name = f"{DEFAULT_PARTITION}_before_{cutoff.year:04d}{cutoff.month:02d}"
+        archive_partition(conn, DEFAULT_PARTITION, archive_dir, where=where, file_name=file_name)
+    with conn.begin_nested():
+        return conn.execute(text(f"DELETE FROM {DEFAULT_PARTITION} WHERE {where}")).rowcount
+
+
+def run_maintenance(
+    bind: Optional[Engine] = None,
+    today: Optional[date] = None,
+    months_ahead: int = ACTIVITY_LOG_PARTITIONS_AHEAD,
+    retention_months: int = ACTIVITY_LOG_RETENTION_MONTHS,
+    archive_dir: str = ACTIVITY_LOG_ARCHIVE_DIR,
+) -> dict:
+    """Creates upcoming partitions and applies retention; returns what was done"""
+    bind = bind if bind is not None else default_engine
+    today = today or datetime.now(timezone.utc).date()
+    result = {"created": [], "dropped": [], "purged": 0}
+    with bind.connect() as conn:
+        if not is_partitioned(conn):
+            conn.rollback()
+            return result
+        if not conn.execute(text("SELECT pg_try_advisory_lock(:key)"), {"key": MAINTENANCE_LOCK_ID}).scalar():
+            conn.rollback()
+            return result  # another process is running maintenance
+        try:
+            result["created"] = ensure_partitions(conn, today, months_ahead)
+            conn.commit()
+            result["dropped"] = drop_expired_partitions(conn, today, retention_months, archive_dir)
+            conn.commit()
+            result["purged"] = purge_expired_default_rows(conn, today, retention_months, archive_dir)
+            conn.commit()
+        finally:
+            conn.rollback()
+            conn.execute(text("SELECT pg_advisory_unlock(:key)"), {"key": MAINTENANCE_LOCK_ID})
+            conn.commit()
+    return result
+
+
+class MaintenanceScheduler:
+    """Daemon thread running run_maintenance() every ``interval`` seconds"""
+
+    def __init__(self, interval: float):
+        self.interval = interval
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+    def start(self) -> None:
+        if self.interval <= 0 or (self._thread is not None and self._thread.is_alive()):
+            return
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._run, name="activity-log-partitions", daemon=True)
+        self._thread.start()
+
+    def stop(self) -> None:
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join()
+            self._thread = None
+
+    def _run(self) -> None:
+        while True:
+            try:
+                run_maintenance()
+            except Exception as e:
+                print(f"Erro na manutenção das partições de activity_logs: {e}")
+            if self._stop.wait(self.interval):
+                return
+
+
+scheduler = MaintenanceScheduler(ACTIVITY_LOG_MAINTENANCE_INTERVAL)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Create upcoming activity_logs partitions and apply retention")
+    parser.add_argument("--months-ahead", type=int, default=ACTIVITY_LOG_PARTITIONS_AHEAD)
+    parser.add_argument("--retention-months", type=int, default=ACTIVITY_LOG_RETENTION_MONTHS)
+    parser.add_argument("--archive-dir", default=ACTIVITY_LOG_ARCHIVE_DIR)
+    args = parser.parse_args()
+    summary = run_maintenance(
+        months_ahead=args.months_ahead, retention_months=args.retention_months, archive_dir=args.archive_dir
+    )
+    print(f"Partições criadas: {summary['created'] or '-'}")
+    print(f"Partições removidas: {summary['dropped'] or '-'}")
+    print(f"Linhas antigas removidas da partição DEFAULT: {summary['purged']}")
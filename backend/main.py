@@ -1,13 +1,44 @@
+import time
+
+_import_started = time.perf_counter()
+
+from contextlib import asynccontextmanager
 from fastapi import FastAPI
+from fastapi.concurrency import run_in_threadpool
+from fastapi.responses import JSONResponse, Response
 from fastapi.middleware.cors import CORSMiddleware
 import os
-from database import engine, Base
+import config  # noqa: F401  (loads .env once, before any settings are read)
+import activity_log
+import log_partitions
+import metrics
+import password_hashing
+import reservations
+import startup
+from sqlalchemy import text
+from database import engine, pool_stats
+from pagination import NEXT_CURSOR_HEADER
 from routers import products, categories, orders, auth
 
-# Create tables on startup
-Base.metadata.create_all(bind=engine)
+startup.report.record("imports", time.perf_counter() - _import_started)
+
+# The schema is managed by migrations (alembic upgrade head), not at import time.
+# Anything slow (schema build, DB connect) belongs in the lifespan warm-up below.
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    activity_log.writer.start()
+    log_partitions.scheduler.start()
+    reservations.sweeper.start()
+    await run_in_threadpool(startup.warm_up, app, engine)
+    yield
+    # flush queued activity logs before the worker exits
+    await run_in_threadpool(activity_log.writer.stop)
+    await run_in_threadpool(log_partitions.scheduler.stop)
+    await run_in_threadpool(reservations.sweeper.stop)
+    await run_in_threadpool(password_hashing.hasher.shutdown)
 
-app = FastAPI(title="COMPIA Editora API", version="0.1.0")
+app = FastAPI(title="COMPIA Editora API", version="0.1.0", lifespan=lifespan)
 
 origins = os.getenv("CORS_ORIGINS", "http://localhost:5173").split(",")
 
@@ -17,12 +48,33 @@ app.add_middleware(
     allow_credentials=True,
     allow_methods=["*"],
     allow_headers=["*"],
+    expose_headers=[NEXT_CURSOR_HEADER],
+)
+# outermost, so CORS preflights and errors are measured too
+app.add_middleware(metrics.MetricsMiddleware)
+
+metrics.register_gauge(
+    "activity_log_queue_depth", "Activity log entries waiting for the background writer",
+    lambda: activity_log.writer.pending,
+)
+metrics.register_gauge(
+    "activity_log_dropped_entries", "Activity log entries lost after every write retry failed (since start)",
+    lambda: activity_log.writer.dropped,
+)
+metrics.register_gauge(
+    "bcrypt_active", "Password hashing calls running or queued on the worker pool",
+    lambda: password_hashing.hasher.stats()["active"],
+)
+metrics.register_gauge(
+    "bcrypt_rejected", "Password hashing calls rejected because every slot was busy (since start)",
+    lambda: password_hashing.hasher.stats()["rejected"],
 )
 
-app.include_router(auth.router)
-app.include_router(products.router)
-app.include_router(categories.router)
-app.include_router(orders.router)
+with startup.report.phase("router_registration"):
+    app.include_router(auth.router)
+    app.include_router(products.router)
+    app.include_router(categories.router)
+    app.include_router(orders.router)
 
 @app.get("/")
 def read_root():
@@ -31,3 +83,35 @@ def read_root():
 @app.get("/health")
 def health_check():
     return {"status": "ok"}
+
+@app.get("/health/ready")
+def health_ready():
+    """Readiness: 200 only if the pool can hand out a working connection"""
+    try:
+        with engine.connect() as connection:
+            connection.execute(text("SELECT 1"))
+    except Exception as e:
+        # details stay in the server log: this endpoint is unauthenticated
+        print(f"Readiness: banco de dados indisponível: {e}")
+        return JSONResponse(status_code=503, content={"status": "unavailable", "detail": "database unavailable"})
+    return {"status": "ok", "pool": pool_stats()}
+
+@app.get("/metrics", include_in_schema=False)
+def prometheus_metrics():
+    """Prometheus text exposition of request, database and pool metrics"""
+    return Response(content=metrics.render(), media_type=metrics.CONTENT_TYPE)
+
+@app.get("/health/pool")
+def health_pool():
+    """Connection pool saturation and checkout wait metrics"""
+    return pool_stats()
+
+@app.get("/health/hashing")
+def health_hashing():
+    """bcrypt worker pool concurrency and queue depth"""
+    return password_hashing.hasher.stats()
+
+@app.get("/health/startup")
+def health_startup():
+    """Time spent in each startup phase of this worker"""
+    return startup.report.as_dict()
@@ -0,0 +1,183 @@
+"""
+Request and database metrics in Prometheus text format (served at /metrics).
+
+MetricsMiddleware records, per route template (e.g. /products/{product_id}),
+request counts by status, latency histograms and the number of database
+queries / seconds each request spent in the database (from the
+RequestDBStats that get_db attaches to request.state). The same query timer
+in database.py also feeds db_query_duration_seconds with every query,
+including the ones made outside requests (background writer, maintenance). Pool occupancy is read from database.pool_stats() at
+scrape time.
+
+Metrics are per process: with several workers, scrape each one (or sum them
+on the Prometheus side).
+"""
+
+import threading
+import time
+from typing import Callable, Dict, List, Sequence, Tuple
+
+from database import pool_stats, query_observers
+
+CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+QUERY_COUNT_BUCKETS = (0, 1, 2, 3, 5, 10, 20, 50, 100)
+
+UNMATCHED_ROUTE = "unmatched"  # 404s etc.: raw paths would explode label cardinality
+
+
+def _escape(value: str) -> str:
+    return str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def _labels(names: Sequence[str], values: Sequence[str]) -> str:
+    if not names:
+        return ""
+    return "{" + ",".join(f'{name}="{_escape(value)}"' for name, value in zip(names, values)) + "}"
+
+
+def _number(value: float) -> str:
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+class Counter:
+    def __init__(self, name: str, documentation: str, label_names: Sequence[str] = ()):
+        self.name = name
+        self.documentation = documentation
+        self.label_names = tuple(label_names)
+        self._values: Dict[Tuple[str, ...], float] = {}
+        self._lock = threading.Lock()
+
+    def inc(self, *labels: str, amount: float = 1) -> None:
+        with self._lock:
+            self._values[labels] = self._values.get(labels, 0) + amount
+
+    def render(self, kind: str = "counter") -> List[str]:
+        lines = [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} {kind}"]
+        with self._lock:
+            for labels, value in sorted(self._values.items()):
+                lines.append(f"{self.name}{_labels(self.label_names, labels)} {_number(value)}")
+        return lines
+
+
+class Gauge(Counter):
+    def dec(self, *labels: str, amount: float = 1) -> None:
+        self.inc(*labels, amount=-amount)
+
+    def render(self, kind: str = "gauge") -> List[str]:
+        return super().render(kind)
+
+
+class Histogram:
+    def __init__(self, name: str, documentation: str, buckets: Sequence[float], label_names: Sequence[str] = ()):
+        self.name = name
+        self.documentation = documentation
+        self.buckets = tuple(buckets)
+        self.label_names = tuple(label_names)
+        self._series: Dict[Tuple[str, ...], List[float]] = {}  # bucket counts..., sum, count
+        self._lock = threading.Lock()
+
+    def observe(self, value: float, *labels: str) -> None:
+        with self._lock:
+            series = self._series.get(labels)
+            if series is None:
+                series = self._series[labels] = [0] * len(self.buckets) + [0.0, 0]
+            for index, bound in enumerate(self.buckets):
+                if value <= bound:
+                    series[index] += 1
+            series[-2] += value
+            series[-1] += 1
+
+    def render(self) -> List[str]:
+        lines = [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} histogram"]
+        names = self.label_names + ("le",)
+        with self._lock:
+            for labels, series in sorted(self._series.items()):
+                for bound, count in zip(self.buckets, series):
+                    lines.append(f"{self.name}_bucket{_labels(names, labels + (_number(bound),))} {count}")
+                lines.append(f"{self.name}_bucket{_labels(names, labels + ('+Inf',))} {series[-1]}")
+                lines.append(f"{self.name}_sum{_labels(self.label_names, labels)} {_number(series[-2])}")
+                lines.append(f"{self.name}_count{_labels(self.label_names, labels)} {series[-1]}")
+        return lines
+
+
+http_requests = Counter("http_requests_total", "HTTP requests by route and status", ("method", "route", "status"))
+http_latency = Histogram(
+    "http_request_duration_seconds", "HTTP request latency", LATENCY_BUCKETS, ("method", "route")
+)
+http_in_flight = Gauge("http_requests_in_flight", "HTTP requests being served")
+request_db_queries = Histogram(
+    "http_request_db_queries", "Database queries per HTTP request", QUERY_COUNT_BUCKETS, ("method", "route")
+)
+request_db_time = Histogram(
+    "http_request_db_seconds", "Time per HTTP request spent in database queries", LATENCY_BUCKETS, ("method", "route")
+)
+db_query_time = Histogram("db_query_duration_seconds", "Database query latency (all queries)", LATENCY_BUCKETS)
+query_observers.append(db_query_time.observe)
+
+# extra gauges read at scrape time: name -> (help, getter)
+_collectors: Dict[str, Tuple[str, Callable[[], float]]] = {}
+
+
+def register_gauge(name: str, documentation: str, getter: Callable[[], float]) -> None:
+    _collectors[name] = (documentation, getter)
+
+
+def _pool_lines() -> List[str]:
+    lines = []
+    for key, value in pool_stats().items():
+        name = f"db_pool_{key}"
+        kind = "counter" if key in ("checkouts", "checkout_timeouts", "checkout_wait_seconds_total") else "gauge"
+        if kind == "counter" and not name.endswith("_total"):
+            name += "_total"
+        lines += [f"# TYPE {name} {kind}", f"{name} {_number(value)}"]
+    return lines
+
+
+def render() -> str:
+    """Every metric in Prometheus text exposition format"""
+    lines: List[str] = []
+    for metric in (http_requests, http_latency, http_in_flight, request_db_queries, request_db_time, db_query_time):
+        lines += metric.render()
+    lines += _pool_lines()
+    for name, (documentation, getter) in sorted(_collectors.items()):
+        lines += [f"# HELP {name} {documentation}", f"# TYPE {name} gauge", f"{name} {_number(getter())}"]
+    return "\n".join(lines) + "\n"
+
+
+class MetricsMiddleware:
+    """ASGI middleware timing each HTTP request until its last body chunk is sent"""
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        status_code = 500  # if the app raises before starting a response
+        started = time.perf_counter()
+
+        async def send_wrapper(message):
+            nonlocal status_code
+            if message["type"] == "http.response.start":
+                status_code = message["status"]
+            await send(message)
+
+        http_in_flight.inc()
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            http_in_flight.dec()
+            elapsed = time.perf_counter() - started
+            route = scope.get("route")
+            path = getattr(route, "path", UNMATCHED_ROUTE)
+            method = scope["method"]
+            http_requests.inc(method, path, str(status_code))
+            http_latency.observe(elapsed, method, path)
+            stats = scope.get("state", {}).get("db_stats")
+            if stats is not None:
+                request_db_queries.observe(stats.query_count, method, path)
+                request_db_time.observe(stats.db_time, method, path)
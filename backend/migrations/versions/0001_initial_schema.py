@@ -0,0 +1,119 @@
+"""initial schema
+
+Baseline matching the tables that main.py used to create with
+Base.metadata.create_all(). Tables that already exist (databases created
+before migrations were introduced) are left untouched, so this revision
+can be applied to both empty and existing databases.
+
+Revision ID: 0001
+Revises:
+Create Date: 2026-10-17
+"""
+from alembic import op
+import sqlalchemy as sa
+
+revision = "0001"
+down_revision = None
+branch_labels = None
+depends_on = None
+
+
+def _create_table(name, *columns):
+    offline = op.get_context().as_sql  # alembic upgrade --sql: no database to inspect
+    if offline or not sa.inspect(op.get_bind()).has_table(name):
+        op.create_table(name, *columns)
+        return True
+    return False
+
+
+def upgrade() -> None:
+    if _create_table(
+        "users",
+        sa.Column("id", sa.Integer(), primary_key=True),
+        sa.Column("username", sa.String(), nullable=False),
+        sa.Column("email", sa.String(), nullable=False),
+        sa.Column("hashed_password", sa.String(), nullable=False),
+        sa.Column("role", sa.Enum("ADMIN", "VENDEDOR", "CLIENTE", name="userrole"), nullable=False),
+        sa.Column("is_active", sa.Boolean(), nullable=False),
+        sa.Column("created_at", sa.DateTime(timezone=True), server_default=sa.func.now()),
+    ):
+        op.create_index("ix_users_id", "users", ["id"])
+        op.create_index("ix_users_username", "users", ["username"], unique=True)
+        op.create_index("ix_users_email", "users", ["email"], unique=True)
+
+    if _create_table(
+        "categories",
+        sa.Column("id", sa.Integer(), primary_key=True),
+        sa.Column("name", sa.String(), nullable=False),
+        sa.Column("image_url", sa.String(), nullable=True),
+        sa.Column("description", sa.Text(), nullable=True),
+    ):
+        op.create_index("ix_categories_id", "categories", ["id"])
+        op.create_index("ix_categories_name", "categories", ["name"], unique=True)
+
+    if _create_table(
+        "products",
+        sa.Column("id", sa.Integer(), primary_key=True),
+        sa.Column("title", sa.String(), nullable=False),
+        sa.Column("description", sa.Text(), nullable=False),
+        sa.Column("price", sa.Float(), nullable=False),
+        sa.Column("stock_quantity", sa.Integer(), nullable=True),
+        sa.Column("image_url", sa.String(), nullable=True),
+        sa.Column("product_type", sa.Enum("PHYSICAL", "DIGITAL", "KIT", name="producttype"), nullable=False),
+        sa.Column("download_url", sa.String(), nullable=True),
+        sa.Column("category_id", sa.Integer(), sa.ForeignKey("categories.id"), nullable=True),
+        sa.Column("created_at", sa.DateTime(timezone=True), server_default=sa.func.now()),
+        sa.Column("updated_at", sa.DateTime(timezone=True), nullable=True),
+    ):
+        op.create_index("ix_products_id", "products", ["id"])
+        op.create_index("ix_products_title", "products", ["title"])
+
+    if _create_table(
+        "orders",
+        sa.Column("id", sa.Integer(), primary_key=True),
+        sa.Column("user_id", sa.Integer(), sa.ForeignKey("users.id"), nullable=False),
+        sa.Column("status", sa.Enum("PAID", name="orderstatus"), nullable=False),
+        sa.Column("total_amount", sa.Float(), nullable=False),
+        sa.Column("payment_method", sa.Enum("CARD", "PIX", name="paymentmethod"), nullable=False),
+        sa.Column("delivery_type", sa.Enum("SHIPPING", "PICKUP", "DIGITAL", name="deliverytype"), nullable=False),
+        sa.Column("shipping_address", sa.Text(), nullable=True),
+        sa.Column("created_at", sa.DateTime(timezone=True), server_default=sa.func.now()),
+    ):
+        op.create_index("ix_orders_id", "orders", ["id"])
+
+    if _create_table(
+        "order_items",
+        sa.Column("id", sa.Integer(), primary_key=True),
+        sa.Column("order_id", sa.Integer(), sa.ForeignKey("orders.id"), nullable=False),
+        sa.Column("product_id", sa.Integer(), sa.ForeignKey("products.id"), nullable=False),
+        sa.Column("quantity", sa.Integer(), nullable=False),
+        sa.Column("unit_price", sa.Float(), nullable=False),
+        sa.Column("product_title", sa.String(), nullable=True),
+        sa.Column("download_url", sa.String(), nullable=True),
+    ):
+        op.create_index("ix_order_items_id", "order_items", ["id"])
+
+    if _create_table(
+        "activity_logs",
+        sa.Column("id", sa.Integer(), primary_key=True),
+        sa.Column("user_id", sa.Integer(), sa.ForeignKey("users.id"), nullable=True),
+        sa.Column("username", sa.String(), nullable=True),
+        sa.Column("action", sa.String(), nullable=False),
+        sa.Column("resource", sa.String(), nullable=True),
+        sa.Column("resource_id", sa.Integer(), nullable=True),
+        sa.Column("details", sa.Text(), nullable=True),
+        sa.Column("ip_address", sa.String(), nullable=True),
+        sa.Column("timestamp", sa.DateTime(timezone=True), server_default=sa.func.now()),
+    ):
+        op.create_index("ix_activity_logs_id", "activity_logs", ["id"])
+        op.create_index("ix_activity_logs_action", "activity_logs", ["action"])
+        op.create_index("ix_activity_logs_resource", "activity_logs", ["resource"])
+        op.create_index("ix_activity_logs_timestamp", "activity_logs", ["timestamp"])
+
+
+def downgrade() -> None:
+    for table in ("activity_logs", "order_items", "orders", "products", "categories", "users"):
+        op.drop_table(table)
+    if op.get_bind().dialect.name == "postgresql":
+        for enum in ("deliverytype", "paymentmethod", "orderstatus", "producttype", "userrole"):
+            op.execute(f"DROP TYPE IF EXISTS {enum}")
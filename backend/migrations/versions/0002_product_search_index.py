@@ -0,0 +1,51 @@
+"""product full-text search index
+
+PostgreSQL only: unaccent extension, the pt_unaccent text search
+configuration and the GIN expression index used by search.py. The indexed
+expression must stay identical to search.SEARCH_DOCUMENT_SQL.
+
+Revision ID: 0002
+Revises: 0001
+Create Date: 2026-10-17
+"""
+from alembic import op
+
+revision = "0002"
+down_revision = "0001"
+branch_labels = None
+depends_on = None
+
+SEARCH_DOCUMENT_SQL = (
+    "setweight(to_tsvector('pt_unaccent'::regconfig, coalesce(products.title, '')), 'A') || "
+    "setweight(to_tsvector('pt_unaccent'::regconfig, coalesce(products.description, '')), 'B')"
+)
+
+
+def upgrade() -> None:
+    if op.get_bind().dialect.name != "postgresql":
+        return
+    op.execute("CREATE EXTENSION IF NOT EXISTS unaccent")
+    op.execute(
+        """
+        DO $$
+        BEGIN
+            IF NOT EXISTS (SELECT 1 FROM pg_ts_config WHERE cfgname = 'pt_unaccent') THEN
+                CREATE TEXT SEARCH CONFIGURATION pt_unaccent (COPY = portuguese);
+                ALTER TEXT SEARCH CONFIGURATION pt_unaccent
+                    ALTER MAPPING FOR hword, hword_part, word WITH unaccent, portuguese_stem;
+            END IF;
+        END
+        $$
+        """
+    )
+    with op.get_context().autocommit_block():
+        op.execute(
+            f"CREATE INDEX CONCURRENTLY IF NOT EXISTS ix_products_search ON products USING GIN (({SEARCH_DOCUMENT_SQL}))"
+        )
+
+
+def downgrade() -> None:
+    if op.get_bind().dialect.name != "postgresql":
+        return
+    op.execute("DROP INDEX IF EXISTS ix_products_search")
+    op.execute("DROP TEXT SEARCH CONFIGURATION IF EXISTS pt_unaccent")
@@ -0,0 +1,55 @@
+"""activity log filter indexes
+
+Composite indexes for the common admin filters (action + time range and
+resource + resource_id + time range). On PostgreSQL also trigram GIN indexes
+so ILIKE '%term%' on username/details avoids sequential scans.
+Indexes are built CONCURRENTLY so writes to activity_logs are not blocked.
+
+Revision ID: 0003
+Revises: 0002
+Create Date: 2026-10-17
+"""
+from alembic import op
+
+revision = "0003"
+down_revision = "0002"
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    if op.get_bind().dialect.name != "postgresql":
+        op.create_index(
+            "ix_activity_logs_action_timestamp", "activity_logs", ["action", "timestamp"], if_not_exists=True
+        )
+        op.create_index(
+            "ix_activity_logs_resource_timestamp",
+            "activity_logs",
+            ["resource", "resource_id", "timestamp"],
+            if_not_exists=True,
+        )
+        return
+
+    op.execute("CREATE EXTENSION IF NOT EXISTS pg_trgm")
+    with op.get_context().autocommit_block():
+        for statement in (
+            "CREATE INDEX CONCURRENTLY IF NOT EXISTS ix_activity_logs_action_timestamp "
+            "ON activity_logs (action, timestamp)",
+            "CREATE INDEX CONCURRENTLY IF NOT EXISTS ix_activity_logs_resource_timestamp "
+            "ON activity_logs (resource, resource_id, timestamp)",
+            "CREATE INDEX CONCURRENTLY IF NOT EXISTS ix_activity_logs_username_trgm "
+            "ON activity_logs USING GIN (username gin_trgm_ops)",
+            "CREATE INDEX CONCURRENTLY IF NOT EXISTS ix_activity_logs_details_trgm "
+            "ON activity_logs USING GIN (details gin_trgm_ops)",
+        ):
+            op.execute(statement)
+
+
+def downgrade() -> None:
+    for name in (
+        "ix_activity_logs_details_trgm",
+        "ix_activity_logs_username_trgm",
+        "ix_activity_logs_resource_timestamp",
+        "ix_activity_logs_action_timestamp",
+    ):
+        op.execute(f"DROP INDEX IF EXISTS {name}")
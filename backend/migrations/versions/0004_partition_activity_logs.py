@@ -0,0 +1,149 @@
+"""partition activity_logs by month
+
+PostgreSQL only. Recreates activity_logs as a table partitioned by RANGE
+(timestamp): monthly partitions from the oldest existing row up to
+PARTITIONS_AHEAD months ahead, plus a DEFAULT partition. The primary key
+becomes (id, timestamp) because a partitioned table's unique constraints must
+include the partition key; ids still come from the same sequence. Existing
+rows are copied over, so on a large table run this in a maintenance window.
+Later partitions are created by log_partitions.py, whose retention also purges
+old rows left in the DEFAULT partition (e.g. by an offline --sql upgrade, which
+cannot look up the oldest row).
+
+The DDL is spelled out here rather than imported from log_partitions.py so the
+migration keeps doing the same thing when that module changes.
+
+Revision ID: 0004
+Revises: 0003
+Create Date: 2026-10-17
+"""
+from datetime import date, datetime, timezone
+
+from alembic import op
+import sqlalchemy as sa
+
+revision = "0004"
+down_revision = "0003"
+branch_labels = None
+depends_on = None
+
+COLUMNS = "id, user_id, username, action, resource, resource_id, details, ip_address, timestamp"
+DEFAULT_PARTITION = "activity_logs_default"
+PARTITIONS_AHEAD = 3
+
+INDEXES = (
+    "CREATE INDEX ix_activity_logs_id ON activity_logs (id)",
+    "CREATE INDEX ix_activity_logs_action ON activity_logs (action)",
+    "CREATE INDEX ix_activity_logs_resource ON activity_logs (resource)",
+    "CREATE INDEX ix_activity_logs_timestamp ON activity_logs (timestamp)",
+    "CREATE INDEX ix_activity_logs_action_timestamp ON activity_logs (action, timestamp)",
+    "CREATE INDEX ix_activity_logs_resource_timestamp ON activity_logs (resource, resource_id, timestamp)",
+    "CREATE INDEX ix_activity_logs_username_trgm ON activity_logs USING GIN (username gin_trgm_ops)",
+    "CREATE INDEX ix_activity_logs_details_trgm ON activity_logs USING GIN (details gin_trgm_ops)",
+)
+
+
+def _month_floor(value) -> date:
+    return date(value.year, value.month, 1)
+
+
+def _add_months(month: date, count: int) -> date:
+    index = month.year * 12 + month.month - 1 + count
+    return date(index // 12, index % 12 + 1, 1)
+
+
+def _create_partition(month: date) -> None:
+    name = f"activity_logs_y{month.year:04d}m{month.month:02d}"
+    start, end = month.isoformat(), _add_months(month, 1).isoformat()
+    op.execute(
+        f"CREATE TABLE {name} PARTITION OF activity_logs "
+        f"FOR VALUES FROM ('{start} 00:00:00+00') TO ('{end} 00:00:00+00')"
+    )
+
+
+def _rename_legacy_indexes() -> None:
+    # index names are schema-wide; free them for the new table
+    for statement in INDEXES:
+        name = statement.split()[2]
+        op.execute(f"ALTER INDEX IF EXISTS {name} RENAME TO {name}_legacy")
+
+
+def upgrade() -> None:
+    if op.get_bind().dialect.name != "postgresql":
+        return
+
+    today = datetime.now(timezone.utc).date()
+    first = _month_floor(today)
+    if not op.get_context().as_sql:
+        oldest = op.get_bind().execute(sa.text("SELECT min(timestamp) FROM activity_logs")).scalar()
+        if oldest is not None:
+            first = min(first, _month_floor(oldest.astimezone(timezone.utc)))
+
+    op.execute("ALTER TABLE activity_logs RENAME TO activity_logs_legacy")
+    op.execute("ALTER TABLE activity_logs_legacy RENAME CONSTRAINT activity_logs_pkey TO activity_logs_legacy_pkey")
+    _rename_legacy_indexes()
+    op.execute("ALTER SEQUENCE activity_logs_id_seq OWNED BY NONE")
+
+    op.execute(
+        """
+        CREATE TABLE activity_logs (
+            id INTEGER NOT NULL DEFAULT nextval('activity_logs_id_seq'),
+            user_id INTEGER REFERENCES users (id),
+            username VARCHAR,
+            action VARCHAR NOT NULL,
+            resource VARCHAR,
+            resource_id INTEGER,
+            details TEXT,
+            ip_address VARCHAR,
+            timestamp TIMESTAMP WITH TIME ZONE NOT NULL DEFAULT now(),
+            PRIMARY KEY (id, timestamp)
+        ) PARTITION BY RANGE (timestamp)
+        """
+    )
+    op.execute(f"CREATE TABLE {DEFAULT_PARTITION} PARTITION OF activity_logs DEFAULT")
+    for statement in INDEXES:
+        op.execute(statement)
+
+    month = first
+    while month <= _add_months(today, PARTITIONS_AHEAD):
+        _create_partition(month)
+        month = _add_months(month, 1)
+
+    op.execute(
+        f"INSERT INTO activity_logs ({COLUMNS}) "
+        f"SELECT id, user_id, username, action, resource, resource_id, details, ip_address, "
+        f"coalesce(timestamp, now()) FROM activity_logs_legacy"
+    )
+    op.execute("ALTER SEQUENCE activity_logs_id_seq OWNED BY activity_logs.id")
+    op.execute("DROP TABLE activity_logs_legacy")
+
+
+def downgrade() -> None:
+    if op.get_bind().dialect.name != "postgresql":
+        return
+
+    op.execute("ALTER TABLE activity_logs RENAME TO activity_logs_partitioned")
+    op.execute("ALTER SEQUENCE activity_logs_id_seq OWNED BY NONE")
+    for statement in INDEXES:
+        name = statement.split()[2]
+        op.execute(f"ALTER INDEX IF EXISTS {name} RENAME TO {name}_partitioned")
+    op.execute(
+        """
+        CREATE TABLE activity_logs (
+            id INTEGER NOT NULL DEFAULT nextval('activity_logs_id_seq') PRIMARY KEY,
+            user_id INTEGER REFERENCES users (id),
+            username VARCHAR,
+            action VARCHAR NOT NULL,
+            resource VARCHAR,
+            resource_id INTEGER,
+            details TEXT,
+            ip_address VARCHAR,
+            timestamp TIMESTAMP WITH TIME ZONE DEFAULT now()
+        )
+        """
+    )
+    op.execute(f"INSERT INTO activity_logs ({COLUMNS}) SELECT {COLUMNS} FROM activity_logs_partitioned")
+    op.execute("ALTER SEQUENCE activity_logs_id_seq OWNED BY activity_logs.id")
+    op.execute("DROP TABLE activity_logs_partitioned")
+    for statement in INDEXES:
+        op.execute(statement)
@@ -0,0 +1,36 @@
+"""catalog projection table
+
+Precomputed catalog read model served by the product listing/detail
+endpoints (see catalog_projection.py). The table is created empty: its rows
+are the schemas.Product JSON of the application version that serves them, so
+they are built by ``python catalog_projection.py --if-empty`` after the
+upgrade (the docker-compose migrate service runs it) rather than by this
+migration, which must not import modules that keep changing.
+
+Revision ID: 0005
+Revises: 0004
+Create Date: 2026-10-17
+"""
+import sqlalchemy as sa
+from alembic import op
+
+revision = "0005"
+down_revision = "0004"
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    op.create_table(
+        "catalog_projection",
+        sa.Column("product_id", sa.Integer(), primary_key=True),
+        sa.Column("category_id", sa.Integer(), nullable=True),
+        sa.Column("version", sa.DateTime(timezone=True), nullable=True),
+        sa.Column("payload", sa.Text(), nullable=False),
+    )
+    op.create_index("ix_catalog_projection_category_id", "catalog_projection", ["category_id"])
+
+
+def downgrade() -> None:
+    op.drop_index("ix_catalog_projection_category_id", table_name="catalog_projection")
+    op.drop_table("catalog_projection")
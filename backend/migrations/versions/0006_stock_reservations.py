@@ -0,0 +1,53 @@
+"""stock reservations and striped stock counters
+
+Tables used by reservations.py: stock_reservations (soft holds placed by
+POST /orders/reservations) and stock_shards (stock of high-demand products
+split across rows).
+
+Revision ID: 0006
+Revises: 0005
+Create Date: 2026-10-17
+"""
+import sqlalchemy as sa
+from alembic import op
+
+revision = "0006"
+down_revision = "0005"
+branch_labels = None
+depends_on = None
+
+reservation_status = sa.Enum("HELD", "CONVERTED", "RELEASED", "EXPIRED", name="reservationstatus")
+
+
+def upgrade() -> None:
+    op.create_table(
+        "stock_reservations",
+        sa.Column("id", sa.Integer(), primary_key=True),
+        sa.Column("hold_id", sa.String(32), nullable=False),
+        sa.Column("user_id", sa.Integer(), sa.ForeignKey("users.id"), nullable=False),
+        sa.Column("product_id", sa.Integer(), sa.ForeignKey("products.id", ondelete="CASCADE"), nullable=False),
+        sa.Column("quantity", sa.Integer(), nullable=False),
+        sa.Column("status", reservation_status, nullable=False),
+        sa.Column("order_id", sa.Integer(), sa.ForeignKey("orders.id"), nullable=True),
+        sa.Column("created_at", sa.DateTime(timezone=True), server_default=sa.func.now()),
+        sa.Column("expires_at", sa.DateTime(timezone=True), nullable=False),
+    )
+    op.create_index("ix_stock_reservations_id", "stock_reservations", ["id"])
+    op.create_index("ix_stock_reservations_hold_id", "stock_reservations", ["hold_id"])
+    op.create_index("ix_stock_reservations_status_expires_at", "stock_reservations", ["status", "expires_at"])
+
+    op.create_table(
+        "stock_shards",
+        sa.Column("product_id", sa.Integer(), sa.ForeignKey("products.id", ondelete="CASCADE"), primary_key=True),
+        sa.Column("shard", sa.Integer(), primary_key=True),
+        sa.Column("quantity", sa.Integer(), nullable=False),
+    )
+
+
+def downgrade() -> None:
+    op.drop_table("stock_shards")
+    op.drop_index("ix_stock_reservations_status_expires_at", table_name="stock_reservations")
+    op.drop_index("ix_stock_reservations_hold_id", table_name="stock_reservations")
+    op.drop_index("ix_stock_reservations_id", table_name="stock_reservations")
+    op.drop_table("stock_reservations")
+    reservation_status.drop(op.get_bind(), checkfirst=True)
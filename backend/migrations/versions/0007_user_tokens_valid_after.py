@@ -0,0 +1,25 @@
+"""users.tokens_valid_after
+
+Epoch seconds before which the user's stateless tokens are rejected. Set on
+deactivation, role and password changes and checked by /auth/refresh, so a
+revocation reaches every worker, not only the one that handled it.
+
+Revision ID: 0007
+Revises: 0006
+Create Date: 2026-10-17
+"""
+import sqlalchemy as sa
+from alembic import op
+
+revision = "0007"
+down_revision = "0006"
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    op.add_column("users", sa.Column("tokens_valid_after", sa.Float(), nullable=True))
+
+
+def downgrade() -> None:
+    op.drop_column("users", "tokens_valid_after")
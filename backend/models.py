@@ -1,4 +1,4 @@
-from sqlalchemy import Column, Integer, String, Float, ForeignKey, Text, DateTime, Enum, Boolean
+from sqlalchemy import Column, Integer, String, Float, ForeignKey, Text, DateTime, Enum, Boolean, Index
 from sqlalchemy.orm import relationship
 from sqlalchemy.sql import func
 import enum
@@ -24,6 +24,8 @@ class User(Base):
     role = Column(Enum(UserRole), default=UserRole.CLIENTE, nullable=False)
     is_active = Column(Boolean, default=True, nullable=False)
     created_at = Column(DateTime(timezone=True), server_default=func.now())
+    # epoch seconds; stateless tokens issued at or before it are rejected by /auth/refresh
+    tokens_valid_after = Column(Float, nullable=True)
 
 class Category(Base):
     __tablename__ = "categories"
@@ -54,6 +56,20 @@ class Product(Base):
     updated_at = Column(DateTime(timezone=True), onupdate=func.now())
 
 
+class CatalogEntry(Base):
+    """
+    Read model of the catalog: one row per product with its category flattened
+    in and the schemas.Product JSON already serialized. Kept in sync by
+    catalog_projection.py in the same transaction as the product writes.
+    """
+    __tablename__ = "catalog_projection"
+
+    product_id = Column(Integer, primary_key=True)
+    category_id = Column(Integer, nullable=True, index=True)
+    version = Column(DateTime(timezone=True), nullable=True)  # product updated_at or created_at
+    payload = Column(Text, nullable=False)
+
+
 class PaymentMethod(str, enum.Enum):
     CARD = "CARD"
     PIX = "PIX"
@@ -98,6 +114,42 @@ class OrderItem(Base):
     order = relationship("Order", back_populates="items")
 
 
+class ReservationStatus(str, enum.Enum):
+    HELD = "HELD"            # estoque separado, aguardando pagamento
+    CONVERTED = "CONVERTED"  # virou pedido
+    RELEASED = "RELEASED"    # cancelada pelo cliente
+    EXPIRED = "EXPIRED"      # liberada pelo sweeper
+
+
+class StockReservation(Base):
+    """One cart line held by a reservation (see reservations.py); lines of the same cart share hold_id"""
+    __tablename__ = "stock_reservations"
+
+    id = Column(Integer, primary_key=True, index=True)
+    hold_id = Column(String(32), nullable=False, index=True)
+    user_id = Column(Integer, ForeignKey("users.id"), nullable=False)
+    product_id = Column(Integer, ForeignKey("products.id", ondelete="CASCADE"), nullable=False)
+    quantity = Column(Integer, nullable=False)
+    status = Column(Enum(ReservationStatus), default=ReservationStatus.HELD, nullable=False)
+    order_id = Column(Integer, ForeignKey("orders.id"), nullable=True)
+    created_at = Column(DateTime(timezone=True), server_default=func.now())
+    expires_at = Column(DateTime(timezone=True), nullable=False)
+
+    __table_args__ = (
+        # sweeper: oldest HELD holds past their expiry
+        Index("ix_stock_reservations_status_expires_at", "status", "expires_at"),
+    )
+
+
+class StockShard(Base):
+    """Slice of a high-demand product's available stock (striped counter, see reservations.py)"""
+    __tablename__ = "stock_shards"
+
+    product_id = Column(Integer, ForeignKey("products.id", ondelete="CASCADE"), primary_key=True)
+    shard = Column(Integer, primary_key=True)
+    quantity = Column(Integer, nullable=False, default=0)
+
+
 class ActivityLog(Base):
     __tablename__ = "activity_logs"
 
@@ -110,3 +162,10 @@ class ActivityLog(Base):
     details = Column(Text, nullable=True)  # JSON com detalhes adicionais
     ip_address = Column(String, nullable=True)
     timestamp = Column(DateTime(timezone=True), server_default=func.now(), index=True)
+
+    # On Postgres the table is partitioned by month on timestamp (migration 0004,
+    # primary key (id, timestamp)); trigram indexes come from migration 0003
+    __table_args__ = (
+        Index("ix_activity_logs_action_timestamp", "action", "timestamp"),
+        Index("ix_activity_logs_resource_timestamp", "resource", "resource_id", "timestamp"),
+    )
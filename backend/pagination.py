@@ -0,0 +1,66 @@
+"""
+Keyset (cursor) pagination helpers.
+
+Listing endpoints return a stable order and, when a page is full, an opaque
+cursor for the next page in the ``X-Next-Cursor`` response header. Passing it
+back as ``?cursor=...`` continues right after the last row seen, so the cost of
+a page does not depend on how deep it is. ``skip``/``limit`` keep working for
+older clients.
+"""
+
+import base64
+import binascii
+import json
+from datetime import datetime
+from typing import Any, Callable, Dict, Optional, Sequence, Tuple
+
+from fastapi import HTTPException, Response
+from sqlalchemy import tuple_
+
+NEXT_CURSOR_HEADER = "X-Next-Cursor"
+
+
+def encode_cursor(*values: Any) -> str:
+    """Encodes the sort key of the last row of a page"""
+    payload = [value.isoformat() if isinstance(value, datetime) else value for value in values]
+    raw = json.dumps(payload, separators=(",", ":")).encode("utf-8")
+    return base64.urlsafe_b64encode(raw).decode("ascii").rstrip("=")
+
+
+def decode_cursor(cursor: str, *types: type) -> Tuple[Any, ...]:
+    """Decodes a cursor produced by encode_cursor, converting each value to ``types``"""
+    try:
+        raw = base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4))
+        values = json.loads(raw)
+        if not isinstance(values, list) or len(values) != len(types):
+            raise ValueError("unexpected cursor shape")
+        return tuple(
+            datetime.fromisoformat(value) if kind is datetime else kind(value)
+            for kind, value in zip(types, values)
+        )
+    except (ValueError, TypeError, binascii.Error):
+        raise HTTPException(status_code=400, detail="Invalid cursor")
+
+
+def after_key(query, columns: Sequence, cursor: Optional[str], types: Sequence[type], descending: bool = False):
+    """Filters ``query`` to the rows that come after ``cursor`` in (columns) order"""
+    if not cursor:
+        return query
+    values = decode_cursor(cursor, *types)
+    if len(columns) == 1:
+        column, value = columns[0], values[0]
+        return query.filter(column < value if descending else column > value)
+    key, bound = tuple_(*columns), tuple_(*values)
+    return query.filter(key < bound if descending else key > bound)
+
+
+def next_cursor_headers(rows: Sequence, limit: Optional[int], key: Callable[[Any], tuple]) -> Dict[str, str]:
+    """Next-page cursor header for a page, if the page came back full"""
+    if limit and rows and len(rows) >= limit:
+        return {NEXT_CURSOR_HEADER: encode_cursor(*key(rows[-1]))}
+    return {}
+
+
+def set_next_cursor(response: Response, rows: Sequence, limit: Optional[int], key: Callable[[Any], tuple]) -> None:
+    """Adds the next-page cursor header when the page came back full"""
+    response.headers.update(next_cursor_headers(rows, limit, key))
@@ -0,0 +1,141 @@
+"""
+bcrypt hashing isolated from the request threads.
+
+Hashes and checks run on a dedicated process pool (BCRYPT_WORKERS processes;
+0 runs them inline in the calling thread). At most BCRYPT_MAX_CONCURRENCY
+calls may be running or queued on the pool; further callers get HashingBusy
+right away instead of waiting for a slot, so a login burst is shed (503)
+without parking API threadpool workers on the hashing pool.
+
+The work factor is BCRYPT_ROUNDS. Hashes made with a different cost are
+reported by needs_rehash() so they can be upgraded on the next login.
+"""
+
+import multiprocessing
+import os
+import threading
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from typing import Optional
+
+import bcrypt
+
+BCRYPT_ROUNDS = int(os.getenv("BCRYPT_ROUNDS", "12"))
+BCRYPT_WORKERS = int(os.getenv("BCRYPT_WORKERS", "2"))
+BCRYPT_MAX_CONCURRENCY = int(os.getenv("BCRYPT_MAX_CONCURRENCY", str(max(BCRYPT_WORKERS, 1) * 4)))
+
+# Bcrypt limit is 72 bytes; we truncate to avoid ValueError
+BCRYPT_MAX_PASSWORD_BYTES = 72
+
+
+class HashingBusy(Exception):
+    """Every hashing slot was busy"""
+
+
+def _encode(password: str) -> bytes:
+    return password.encode("utf-8")[:BCRYPT_MAX_PASSWORD_BYTES]
+
+
+# Executed in the worker processes: keep them top-level and dependency free.
+
+def _hashpw(password: bytes, rounds: int) -> str:
+    return bcrypt.hashpw(password, bcrypt.gensalt(rounds=rounds)).decode("utf-8")
+
+
+def _checkpw(password: bytes, hashed: bytes) -> bool:
+    return bcrypt.checkpw(password, hashed)
+
+
+def hash_rounds(hashed: str) -> Optional[int]:
+    """Cost factor stored in a bcrypt hash ("$2b$12$..." -> 12)"""
+    try:
+        return int(hashed.split("$")[2])
+    except (IndexError, ValueError):
+        return None
+
+
+class PasswordHasher:
+    def __init__(self, rounds: int, workers: int, max_concurrency: int):
+        self.rounds = rounds
+        self.workers = workers
+        self.max_concurrency = max_concurrency
+        self._slots = threading.BoundedSemaphore(max_concurrency)
+        self._executor: Optional[ProcessPoolExecutor] = None
+        self._lock = threading.Lock()
+        self._active = 0
+        self._completed = 0
+        self._rejected = 0
+
+    def hash(self, password: str) -> str:
+        return self._run(_hashpw, _encode(password), self.rounds)
+
+    def verify(self, password: str, hashed: str) -> bool:
+        return self._run(_checkpw, _encode(password), hashed.encode("utf-8"))
+
+    def needs_rehash(self, hashed: str) -> bool:
+        return hash_rounds(hashed) != self.rounds
+
+    def stats(self) -> dict:
+        """Concurrency and queue depth of the hashing pool"""
+        with self._lock:
+            return {
+                "workers": self.workers,
+                "rounds": self.rounds,
+                "max_concurrency": self.max_concurrency,
+                "active": self._active,
+                # submitted but waiting for a free worker process
+                "queued": max(self._active - self.workers, 0) if self.workers > 0 else 0,
+                "completed": self._completed,
+                "rejected": self._rejected,
+            }
+
+    def shutdown(self) -> None:
+        with self._lock:
+            executor, self._executor = self._executor, None
+        if executor is not None:
+            executor.shutdown(wait=True)
+
+    def _pool(self) -> ProcessPoolExecutor:
+        with self._lock:
+            if self._executor is None:
+                # spawn: forking a process that runs threads (the API) is unsafe
+                self._executor = ProcessPoolExecutor(
+                    max_workers=self.workers, mp_context=multiprocessing.get_context("spawn")
+                )
+            return self._executor
+
+    def _run(self, fn, *args):
+        # non-blocking: callers run in the API threadpool, which must not queue up behind bcrypt
+        acquired = self._slots.acquire(blocking=False)
+        with self._lock:
+            if acquired:
+                self._active += 1
+            else:
+                self._rejected += 1
+        if not acquired:
+            raise HashingBusy("password hashing pool is saturated")
+
+        try:
+            if self.workers <= 0:
+                return fn(*args)
+            executor = self._pool()
+            try:
+                return executor.submit(fn, *args).result()
+            except BrokenProcessPool:
+                # a worker died; start a fresh pool on the next call
+                with self._lock:
+                    if self._executor is executor:
+                        self._executor = None
+                raise
+        finally:
+            with self._lock:
+                self._active -= 1
+                self._completed += 1
+            self._slots.release()
+
+
+hasher = PasswordHasher(
+    rounds=BCRYPT_ROUNDS,
+    workers=BCRYPT_WORKERS,
+    max_concurrency=BCRYPT_MAX_CONCURRENCY,
+)
@@ -0,0 +1,171 @@
+"""
+Sliding-window rate limiting for login attempts.
+
+Every attempt is counted per username and per client IP; once either key has
+LOGIN_RATE_LIMIT_PER_USERNAME / LOGIN_RATE_LIMIT_PER_IP attempts inside the
+last LOGIN_RATE_LIMIT_WINDOW_SECONDS, further attempts are rejected with 429
+before the user is looked up or a password is hashed.
+
+Backends (RATE_LIMIT_BACKEND):
+- memory (default): per-process deques of attempt times in an LRU capped at
+  RATE_LIMIT_MAX_KEYS keys, updated under a short lock. With several workers
+  each one counts separately.
+- redis: one sorted set per key in REDIS_URL, shared by every worker.
+- none: disabled.
+
+Behind a reverse proxy (nginx in docker-compose) every request arrives from
+the proxy's address. When the peer is in TRUSTED_PROXIES (comma-separated IPs
+or CIDRs), client_ip() takes the client from X-Forwarded-For instead: the
+right-most hop that is not itself a trusted proxy. The header is ignored for
+any other peer, so clients cannot pick their own rate limit key.
+"""
+
+import ipaddress
+import os
+import threading
+import time
+import uuid
+from collections import OrderedDict, deque
+from typing import Deque, List, Optional
+
+from cache import REDIS_URL
+
+RATE_LIMIT_BACKEND = os.getenv("RATE_LIMIT_BACKEND", "memory")
+LOGIN_RATE_LIMIT_PER_USERNAME = int(os.getenv("LOGIN_RATE_LIMIT_PER_USERNAME", "5"))
+LOGIN_RATE_LIMIT_PER_IP = int(os.getenv("LOGIN_RATE_LIMIT_PER_IP", "20"))
+LOGIN_RATE_LIMIT_WINDOW_SECONDS = float(os.getenv("LOGIN_RATE_LIMIT_WINDOW_SECONDS", "60"))
+RATE_LIMIT_MAX_KEYS = int(os.getenv("RATE_LIMIT_MAX_KEYS", "100000"))
+TRUSTED_PROXIES = os.getenv("TRUSTED_PROXIES", "")  # e.g. 172.16.0.0/12 for the docker-compose network
+
+
+def parse_networks(value: str) -> List[ipaddress._BaseNetwork]:
+    return [ipaddress.ip_network(item.strip(), strict=False) for item in value.split(",") if item.strip()]
+
+
+trusted_proxies = parse_networks(TRUSTED_PROXIES)
+
+
+def _is_trusted(address: str, networks: List[ipaddress._BaseNetwork]) -> bool:
+    try:
+        ip = ipaddress.ip_address(address)
+    except ValueError:
+        return False
+    return any(ip in network for network in networks)
+
+
+def client_ip(peer: Optional[str], forwarded_for: Optional[str], networks: Optional[List] = None) -> Optional[str]:
+    """Address to rate limit: the peer, or the X-Forwarded-For client when the peer is a trusted proxy"""
+    networks = trusted_proxies if networks is None else networks
+    if peer is None or not forwarded_for or not _is_trusted(peer, networks):
+        return peer
+    hops = [hop.strip() for hop in forwarded_for.split(",") if hop.strip()]
+    for hop in reversed(hops):
+        if not _is_trusted(hop, networks):
+            return hop
+    return hops[0] if hops else peer
+
+
+class InMemorySlidingWindow:
+    """
+    Attempt times per key, in an LRU bounded by ``max_keys``: a burst of
+    distinct usernames/IPs evicts the keys attempted longest ago instead of
+    growing the map (an evicted key starts counting again from zero).
+    """
+
+    def __init__(self, max_keys: int = RATE_LIMIT_MAX_KEYS):
+        self.max_keys = max_keys
+        self._events: "OrderedDict[str, Deque[float]]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def hit(self, key: str, limit: int, window: float) -> float:
+        """Records an attempt; returns 0 if allowed, else seconds until one is allowed"""
+        now = time.monotonic()
+        with self._lock:
+            events = self._events.get(key)
+            if events is None:
+                events = self._events[key] = deque()
+                while len(self._events) > self.max_keys:
+                    self._events.popitem(last=False)
+            else:
+                self._events.move_to_end(key)
+            while events and events[0] <= now - window:
+                events.popleft()
+            if len(events) >= limit:
+                return max(events[0] + window - now, 0.001)
+            events.append(now)
+            return 0.0
+
+    def reset(self) -> None:
+        with self._lock:
+            self._events.clear()
+
+    def __len__(self) -> int:
+        return len(self._events)
+
+
+class RedisSlidingWindow:
+    def __init__(self, client, prefix: str = "ratelimit:"):
+        self.client = client
+        self.prefix = prefix
+
+    def hit(self, key: str, limit: int, window: float) -> float:
+        name = f"{self.prefix}{key}"
+        now = time.time()
+        member = f"{now}:{uuid.uuid4().hex}"
+        pipe = self.client.pipeline(transaction=True)
+        pipe.zremrangebyscore(name, 0, now - window)
+        pipe.zadd(name, {member: now})
+        pipe.zcard(name)
+        pipe.zrange(name, 0, 0, withscores=True)
+        pipe.pexpire(name, int(window * 1000) + 1000)
+        _, _, count, oldest, _ = pipe.execute()
+        if count <= limit:
+            return 0.0
+        self.client.zrem(name, member)  # rejected attempts do not extend the lockout
+        return max(oldest[0][1] + window - now, 0.001) if oldest else window
+
+    def reset(self) -> None:
+        for name in self.client.scan_iter(f"{self.prefix}*"):
+            self.client.delete(name)
+
+
+def create_limiter(kind: str = RATE_LIMIT_BACKEND):
+    if kind == "redis":
+        import redis  # optional dependency, only needed for RATE_LIMIT_BACKEND=redis
+
+        return RedisSlidingWindow(redis.Redis.from_url(REDIS_URL))
+    if kind == "memory":
+        return InMemorySlidingWindow()
+    return None
+
+
+class LoginRateLimiter:
+    def __init__(self, backend, per_username: int, per_ip: int, window: float):
+        self.backend = backend
+        self.per_username = per_username
+        self.per_ip = per_ip
+        self.window = window
+
+    def check(self, username: str, ip_address: Optional[str]) -> float:
+        """Counts a login attempt; returns 0 if allowed, else the Retry-After delay in seconds"""
+        if self.backend is None:
+            return 0.0
+        if ip_address and self.per_ip > 0:
+            retry_after = self.backend.hit(f"login:ip:{ip_address}", self.per_ip, self.window)
+            if retry_after:
+                return retry_after
+        if self.per_username > 0:
+            return self.backend.hit(f"login:user:{username.strip().lower()}", self.per_username, self.window)
+        return 0.0
+
+    def reset(self) -> None:
+        if self.backend is not None:
+            self.backend.reset()
+
+
+login_limiter = LoginRateLimiter(
+    create_limiter(),
+    per_username=LOGIN_RATE_LIMIT_PER_USERNAME,
+    per_ip=LOGIN_RATE_LIMIT_PER_IP,
+    window=LOGIN_RATE_LIMIT_WINDOW_SECONDS,
+)
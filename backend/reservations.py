@@ -0,0 +1,423 @@
+"""
+Stock reservations (soft holds) and striped stock counters.
+
+POST /orders/reservations places a hold on a cart: its quantities are taken
+from the available stock right away, with one short conditional UPDATE, and
+recorded as HELD stock_reservations rows that expire after
+RESERVATION_TTL_SECONDS. Checkout with that reservation_id converts the hold
+into the order while locking only the reservation rows, never the products
+rows, so buyers paying for the same title no longer queue on one row lock.
+Holds released by the buyer, or expired and picked up by the background
+sweeper, give their quantities back.
+
+Striped counters: the available stock of a high-demand product can be split
+across N stock_shards rows (``python reservations.py stripe <product_id>``).
+Holds for it take from a random shard that covers the quantity, so concurrent
+holds for the same title usually update different rows; when the shards read
+were already drained by another hold, they are re-read and the rest is taken
+from whatever is left (up to STOCK_SHARD_TAKE_ATTEMPTS reads). For striped products
+products.stock_quantity is only the displayed stock: the sweeper refreshes it
+from the shards every RESERVATION_SWEEP_INTERVAL seconds. That value may be
+stale, so admin writes to stock_quantity (PUT /products/{id}, import) are
+applied to the shards as a change: apply_stock_changes() adds the difference
+between the submitted and the displayed value to the live shard total, and
+leaves the shards alone when the admin did not change the number.
+"""
+
+import argparse
+import os
+import random
+import threading
+import uuid
+from collections import defaultdict
+from datetime import datetime, timedelta, timezone
+from typing import Dict, Iterable, List, Optional, Tuple
+
+from sqlalchemy import case, delete, func, insert, select, update
+from sqlalchemy.orm import Session
+
+import catalog_projection
+import models
+from cache import catalog_cache
+from database import SessionLocal
+
+RESERVATION_TTL_SECONDS = int(os.getenv("RESERVATION_TTL_SECONDS", "600"))
+RESERVATION_SWEEP_INTERVAL = float(os.getenv("RESERVATION_SWEEP_INTERVAL", "30"))
+RESERVATION_SWEEP_BATCH = int(os.getenv("RESERVATION_SWEEP_BATCH", "500"))
+STOCK_SHARDS = int(os.getenv("STOCK_SHARDS", "8"))
+STOCK_SHARD_TAKE_ATTEMPTS = int(os.getenv("STOCK_SHARD_TAKE_ATTEMPTS", "3"))
+
+
+class InsufficientStock(Exception):
+    def __init__(self, product_id: int):
+        super().__init__(f"Insufficient stock for product {product_id}")
+        self.product_id = product_id
+
+
+class ReservationNotFound(Exception):
+    """No HELD, unexpired lines for this hold and user"""
+
+
+def utcnow() -> datetime:
+    return datetime.now(timezone.utc)
+
+
+def shard_numbers(db: Session, product_ids: Iterable[int]) -> Dict[int, List[int]]:
+    """Shard numbers of each striped product among ``product_ids``, in order"""
+    product_ids = list(product_ids)
+    numbers: Dict[int, List[int]] = defaultdict(list)
+    if product_ids:
+        for product_id, shard in db.execute(
+            select(models.StockShard.product_id, models.StockShard.shard)
+            .where(models.StockShard.product_id.in_(product_ids))
+            .order_by(models.StockShard.product_id, models.StockShard.shard)
+        ):
+            numbers[product_id].append(shard)
+    return dict(numbers)
+
+
+def shard_counts(db: Session, product_ids: Iterable[int]) -> Dict[int, int]:
+    """Number of shards of each striped product among ``product_ids``"""
+    product_ids = list(product_ids)
+    if not product_ids:
+        return {}
+    return dict(db.execute(
+        select(models.StockShard.product_id, func.count())
+        .where(models.StockShard.product_id.in_(product_ids))
+        .group_by(models.StockShard.product_id)
+    ).all())
+
+
+def available(db: Session, product_ids: Iterable[int]) -> Dict[int, int]:
+    """Available stock per product (sum of the shards for striped ones)"""
+    product_ids = list(product_ids)
+    stock = dict(db.execute(
+        select(models.Product.id, models.Product.stock_quantity).where(models.Product.id.in_(product_ids))
+    ).all())
+    stock.update(db.execute(
+        select(models.StockShard.product_id, func.sum(models.StockShard.quantity))
+        .where(models.StockShard.product_id.in_(product_ids))
+        .group_by(models.StockShard.product_id)
+    ).all())
+    return stock
+
+
+def take_stock(db: Session, quantities: Dict[int, int], striped: Optional[Dict[int, int]] = None) -> None:
+    """
+    Decrements the available stock of every product or raises InsufficientStock
+    (the caller rolls back whatever was already taken). ``striped`` is
+    shard_counts() for these products, if the caller already has it.
+    """
+    if striped is None:
+        striped = shard_counts(db, quantities)
+    plain = {product_id: qty for product_id, qty in quantities.items() if product_id not in striped}
+    if plain:
+        qty_by_id = case(plain, value=models.Product.id)
+        taken = set(db.scalars(
+            update(models.Product)
+            .where(models.Product.id.in_(plain), models.Product.stock_quantity >= qty_by_id)
+            .values(stock_quantity=models.Product.stock_quantity - qty_by_id)
+            .returning(models.Product.id)
+            .execution_options(synchronize_session=False)
+        ))
+        missing = sorted(set(plain) - taken)
+        if missing:
+            raise InsufficientStock(missing[0])
+        catalog_projection.mark(db, product_ids=plain)
+    for product_id in sorted(striped):
+        _take_from_shards(db, product_id, quantities[product_id])
+
+
+def _take_from_shards(db: Session, product_id: int, qty: int, attempts: int = STOCK_SHARD_TAKE_ATTEMPTS) -> None:
+    needed = qty
+    for _ in range(max(attempts, 1)):
+        shards = db.execute(
+            select(models.StockShard.shard, models.StockShard.quantity).where(models.StockShard.product_id == product_id)
+        ).all()
+        if sum(quantity for _, quantity in shards) < needed:
+            break
+        random.shuffle(shards)  # spread concurrent holds over the rows...
+        shards.sort(key=lambda s: s.quantity < needed)  # ...preferring one that covers the whole quantity
+        for shard, quantity in shards:
+            take = min(needed, quantity)
+            if take <= 0:
+                continue
+            result = db.execute(
+                update(models.StockShard)
+                .where(
+                    models.StockShard.product_id == product_id,
+                    models.StockShard.shard == shard,
+                    models.StockShard.quantity >= take,  # the snapshot above may be stale
+                )
+                .values(quantity=models.StockShard.quantity - take)
+            )
+            if result.rowcount:
+                needed -= take
+                if not needed:
+                    return
+        # some shards were drained since the read: re-read and take the rest elsewhere
+    raise InsufficientStock(product_id)
+
+
+def give_back(db: Session, quantities: Dict[int, int]) -> None:
+    """Returns released/expired quantities to the available stock"""
+    striped = shard_numbers(db, quantities)
+    plain = {product_id: qty for product_id, qty in quantities.items() if product_id not in striped}
+    if plain:
+        qty_by_id = case(plain, value=models.Product.id)
+        db.execute(
+            update(models.Product)
+            .where(models.Product.id.in_(plain))
+            .values(stock_quantity=models.Product.stock_quantity + qty_by_id)
+            .execution_options(synchronize_session=False)
+        )
+        catalog_projection.mark(db, product_ids=plain)
+    for product_id, shards in striped.items():
+        db.execute(
+            update(models.StockShard)
+            .where(models.StockShard.product_id == product_id, models.StockShard.shard == random.choice(shards))
+            .values(quantity=models.StockShard.quantity + quantities[product_id])
+        )
+
+
+def hold(db: Session, user_id: int, lines: List[Tuple[int, int]], ttl: int = RESERVATION_TTL_SECONDS) -> Tuple[str, datetime]:
+    """Takes the cart's stock and records the hold; returns (hold_id, expires_at). The caller commits."""
+    take_stock(db, dict(lines))
+    hold_id = uuid.uuid4().hex
+    expires_at = utcnow() + timedelta(seconds=ttl)
+    db.execute(insert(models.StockReservation), [
+        {
+            "hold_id": hold_id,
+            "user_id": user_id,
+            "product_id": product_id,
+            "quantity": qty,
+            "status": models.ReservationStatus.HELD,
+            "expires_at": expires_at,
+        }
+        for product_id, qty in lines
+    ])
+    return hold_id, expires_at
+
+
+def claim(db: Session, hold_id: str, user_id: int) -> List[Tuple[int, int]]:
+    """Locks the hold's lines for conversion; returns (product_id, quantity) sorted by product"""
+    lines = db.execute(
+        select(models.StockReservation.product_id, models.StockReservation.quantity)
+        .where(
+            models.StockReservation.hold_id == hold_id,
+            models.StockReservation.user_id == user_id,
+            models.StockReservation.status == models.ReservationStatus.HELD,
+            models.StockReservation.expires_at > utcnow(),
+        )
+        .order_by(models.StockReservation.product_id)
+        .with_for_update()
+    ).all()
+    if not lines:
+        raise ReservationNotFound(hold_id)
+    return [(product_id, qty) for product_id, qty in lines]
+
+
+def convert(db: Session, hold_id: str, order_id: int) -> None:
+    """Marks claimed lines as sold; their stock was already taken by hold()"""
+    db.execute(
+        update(models.StockReservation)
+        .where(
+            models.StockReservation.hold_id == hold_id,
+            models.StockReservation.status == models.ReservationStatus.HELD,
+        )
+        .values(status=models.ReservationStatus.CONVERTED, order_id=order_id)
+    )
+
+
+def release(db: Session, hold_id: str, user_id: int) -> None:
+    """Cancels a hold and gives its stock back. The caller commits."""
+    lines = claim(db, hold_id, user_id)
+    db.execute(
+        update(models.StockReservation)
+        .where(
+            models.StockReservation.hold_id == hold_id,
+            models.StockReservation.status == models.ReservationStatus.HELD,
+        )
+        .values(status=models.ReservationStatus.RELEASED)
+    )
+    give_back(db, dict(lines))
+
+
+def expire_due(db: Session, batch: int = RESERVATION_SWEEP_BATCH) -> int:
+    """Expires up to ``batch`` overdue holds and gives their stock back; returns how many lines"""
+    rows = db.execute(
+        select(models.StockReservation.id, models.StockReservation.product_id, models.StockReservation.quantity)
+        .where(
+            models.StockReservation.status == models.ReservationStatus.HELD,
+            models.StockReservation.expires_at <= utcnow(),
+        )
+        .order_by(models.StockReservation.expires_at)
+        .limit(batch)
+        .with_for_update(skip_locked=True)  # lines being converted right now are skipped
+    ).all()
+    if not rows:
+        return 0
+    db.execute(
+        update(models.StockReservation)
+        .where(models.StockReservation.id.in_([row.id for row in rows]))
+        .values(status=models.ReservationStatus.EXPIRED)
+    )
+    quantities: Dict[int, int] = defaultdict(int)
+    for row in rows:
+        quantities[row.product_id] += row.quantity
+    give_back(db, quantities)
+    return len(rows)
+
+
+def _spread(total: int, shards: int) -> List[int]:
+    return [total // shards + (1 if index < total % shards else 0) for index in range(shards)]
+
+
+def _locked_total(db: Session, product_id: int) -> int:
+    """Locks the product row and its shards; returns its available stock"""
+    if db.execute(select(models.Product.id).where(models.Product.id == product_id).with_for_update()).first() is None:
+        raise ValueError(f"Product {product_id} not found")
+    db.execute(select(models.StockShard.shard).where(models.StockShard.product_id == product_id).with_for_update()).all()
+    return available(db, [product_id])[product_id]
+
+
+def stripe(db: Session, product_id: int, shards: int = STOCK_SHARDS) -> None:
+    """Splits a product's available stock into ``shards`` counters (or re-splits a striped one)"""
+    if shards < 1:
+        raise ValueError("shards must be at least 1")
+    total = _locked_total(db, product_id)
+    db.execute(delete(models.StockShard).where(models.StockShard.product_id == product_id))
+    db.execute(insert(models.StockShard), [
+        {"product_id": product_id, "shard": index, "quantity": quantity}
+        for index, quantity in enumerate(_spread(total, shards))
+    ])
+    _set_displayed_stock(db, product_id, total)
+
+
+def unstripe(db: Session, product_id: int) -> None:
+    """Moves the shards' stock back into products.stock_quantity"""
+    total = _locked_total(db, product_id)
+    db.execute(delete(models.StockShard).where(models.StockShard.product_id == product_id))
+    _set_displayed_stock(db, product_id, total)
+
+
+def apply_stock_changes(db: Session, changes: Dict[int, int]) -> None:
+    """
+    After an admin wrote products.stock_quantity, applies ``changes`` (product id
+    -> submitted value minus the displayed value it replaced) to the shards of
+    striped products, and puts the live total back as the displayed stock.
+    Non-striped products in ``changes`` are ignored: their write was final.
+    """
+    for product_id, shards in shard_numbers(db, changes).items():
+        total = _locked_total(db, product_id)
+        if changes[product_id]:
+            total = max(total + changes[product_id], 0)
+            for shard, quantity in zip(shards, _spread(total, len(shards))):
+                db.execute(
+                    update(models.StockShard)
+                    .where(models.StockShard.product_id == product_id, models.StockShard.shard == shard)
+                    .values(quantity=quantity)
+                )
+        _set_displayed_stock(db, product_id, total)
+
+
+def _set_displayed_stock(db: Session, product_id: int, total: int) -> bool:
+    result = db.execute(
+        update(models.Product)
+        .where(models.Product.id == product_id, models.Product.stock_quantity != total)
+        .values(stock_quantity=total)
+        .execution_options(synchronize_session=False)
+    )
+    if result.rowcount:
+        catalog_projection.mark(db, product_ids=[product_id])
+    return bool(result.rowcount)
+
+
+def sync_striped_stock(db: Session) -> int:
+    """Copies the shards' totals into products.stock_quantity; returns how many products changed"""
+    totals = db.execute(
+        select(models.StockShard.product_id, func.sum(models.StockShard.quantity))
+        .group_by(models.StockShard.product_id)
+    ).all()
+    return sum(_set_displayed_stock(db, product_id, total) for product_id, total in totals)
+
+
+def run_sweep(batch: int = RESERVATION_SWEEP_BATCH) -> dict:
+    """Expires every overdue hold (in batches) and refreshes striped products' displayed stock"""
+    result = {"expired": 0, "synced": 0}
+    db = SessionLocal()
+    try:
+        while True:
+            expired = expire_due(db, batch)
+            db.commit()
+            result["expired"] += expired
+            if expired < batch:
+                break
+        result["synced"] = sync_striped_stock(db)
+        db.commit()
+    finally:
+        db.close()
+    if result["expired"] or result["synced"]:
+        catalog_cache.invalidate("products")  # stock_quantity changed
+    return result
+
+
+class Sweeper:
+    """Daemon thread running run_sweep() every ``interval`` seconds"""
+
+    def __init__(self, interval: float):
+        self.interval = interval
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+    def start(self) -> None:
+        if self.interval <= 0 or (self._thread is not None and self._thread.is_alive()):
+            return
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._run, name="reservation-sweeper", daemon=True)
+        self._thread.start()
+
+    def stop(self) -> None:
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join()
+            self._thread = None
+
+    def _run(self) -> None:
+        while True:
+            try:
+                run_sweep()
+            except Exception as e:
+                print(f"Erro ao liberar reservas expiradas: {e}")
+            if self._stop.wait(self.interval):
+                return
+
+
+sweeper = Sweeper(RESERVATION_SWEEP_INTERVAL)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Stock reservations maintenance and striped counters")
+    commands = parser.add_subparsers(dest="command", required=True)
+    commands.add_parser("sweep", help="expire overdue holds now")
+    stripe_parser = commands.add_parser("stripe", help="split a product's stock into shards")
+    stripe_parser.add_argument("product_id", type=int)
+    stripe_parser.add_argument("--shards", type=int, default=STOCK_SHARDS)
+    unstripe_parser = commands.add_parser("unstripe", help="merge a product's shards back")
+    unstripe_parser.add_argument("product_id", type=int)
+    args = parser.parse_args()
+
+    if args.command == "sweep":
+        summary = run_sweep()
+        print(f"Reservas expiradas: {summary['expired']}; estoques sincronizados: {summary['synced']}")
+    else:
+        session = SessionLocal()
+        try:
+            if args.command == "stripe":
+                stripe(session, args.product_id, args.shards)
+            else:
+                unstripe(session, args.product_id)
+            session.commit()
+        finally:
+            session.close()
+        print(f"Produto {args.product_id}: {args.command} concluído")
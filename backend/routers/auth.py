@@ -1,14 +1,21 @@
-from fastapi import APIRouter, Depends, HTTPException, status, Request
+from fastapi import APIRouter, Depends, HTTPException, Query, status, Request, Response
 from fastapi.security import OAuth2PasswordRequestForm
+from sqlalchemy import select
 from sqlalchemy.orm import Session
-from datetime import timedelta
-from typing import List
+from datetime import datetime, timedelta
+from typing import List, Optional
 import json
+import math
 
 import models
 import schemas
 import auth
+import fast_json
+import streaming
+from cache import json_response
 from database import get_db
+from pagination import after_key, next_cursor_headers, set_next_cursor
+from rate_limit import client_ip, login_limiter
 
 router = APIRouter(prefix="/auth", tags=["authentication"])
 
@@ -64,13 +71,24 @@ def register(user_data: schemas.UserCreate, db: Session = Depends(get_db)):
 
 @router.post("/login", response_model=schemas.Token)
 def login(
+    request: Request,
     form_data: OAuth2PasswordRequestForm = Depends(),
     db: Session = Depends(get_db)
 ):
     """
     Authenticates a user and returns a JWT token.
     Use username and password to login.
+    Attempts are rate limited per username and per IP (429 + Retry-After).
     """
+    ip_address = client_ip(request.client.host if request.client else None, request.headers.get("x-forwarded-for"))
+    retry_after = login_limiter.check(form_data.username, ip_address)
+    if retry_after:
+        raise HTTPException(
+            status_code=status.HTTP_429_TOO_MANY_REQUESTS,
+            detail="Too many login attempts, try again later",
+            headers={"Retry-After": str(math.ceil(retry_after))},
+        )
+
     user = auth.authenticate_user(db, form_data.username, form_data.password)
     if not user:
         raise HTTPException(
@@ -85,12 +103,16 @@ def login(
             detail="Inactive user"
         )
     
-    # Create JWT token
-    access_token_expires = timedelta(minutes=auth.ACCESS_TOKEN_EXPIRE_MINUTES)
-    access_token = auth.create_access_token(
-        data={"sub": user.username, "role": user.role.value},
-        expires_delta=access_token_expires
-    )
+    if auth.AUTH_STATELESS_TOKENS:
+        tokens = auth.create_token_pair(user)
+    else:
+        # Create JWT token
+        access_token_expires = timedelta(minutes=auth.ACCESS_TOKEN_EXPIRE_MINUTES)
+        access_token = auth.create_access_token(
+            data={"sub": user.username, "role": user.role.value},
+            expires_delta=access_token_expires
+        )
+        tokens = {"access_token": access_token, "token_type": "bearer"}
     
     # login log
     auth.log_activity(
@@ -102,24 +124,73 @@ def login(
         resource_id=user.id
     )
     
-    return {"access_token": access_token, "token_type": "bearer"}
+    return tokens
+
+@router.post("/refresh", response_model=schemas.Token)
+def refresh(data: schemas.RefreshRequest, db: Session = Depends(get_db)):
+    """
+    Exchanges a refresh token for a new token pair (AUTH_STATELESS_TOKENS only).
+    Reads the user row, so role and active status changes are picked up here.
+    """
+    if not auth.AUTH_STATELESS_TOKENS:
+        raise HTTPException(status_code=404, detail="Refresh tokens are disabled")
+    payload = auth.decode_refresh_token(data.refresh_token)
+    user = db.query(models.User).filter(models.User.id == payload["uid"]).first()
+    if user is None or not user.is_active or auth.tokens_revoked(user, payload):
+        raise HTTPException(
+            status_code=status.HTTP_401_UNAUTHORIZED,
+            detail="Invalid refresh token",
+            headers={"WWW-Authenticate": "Bearer"},
+        )
+    return auth.create_token_pair(user)
 
 @router.get("/me", response_model=schemas.User)
-async def get_me(current_user: models.User = Depends(auth.get_current_active_user)):
+def get_me(
+    current_user: models.User = Depends(auth.get_current_active_user),
+    db: Session = Depends(get_db)
+):
     """Returns the authenticated user data"""
-    return current_user
+    if current_user.email is not None:
+        return current_user
+    # cached and stateless principals only carry id, username, role and is_active
+    user = db.query(models.User).filter(models.User.id == current_user.id).first()
+    if user is None:
+        raise HTTPException(status_code=404, detail="User not found")
+    return user
 
-@router.get("/users", response_model=List[schemas.User])
-async def list_users(
+@router.get("/users", response_model=List[schemas.User], responses=streaming.STREAM_RESPONSES)
+def list_users(
+    response: Response,
+    limit: Optional[int] = None,
+    cursor: Optional[str] = None,
+    format: Optional[str] = Query(None, description="ndjson ou csv: resposta em streaming"),
     db: Session = Depends(get_db),
     current_user: models.User = Depends(auth.require_admin)
 ):
-    """Lists all users (admin only)"""
-    users = db.query(models.User).all()
+    """
+    Lists users ordered by id (admin only); all of them unless limit is given.
+    With format=ndjson|csv rows are streamed from a server-side cursor.
+    """
+    fmt = streaming.detect_format(format) if format else None
+    plain = fmt or fast_json.FAST_JSON_RESPONSES  # schema columns instead of ORM objects
+    query = select(*_USER_COLUMNS) if plain else db.query(models.User)
+    query = after_key(query, [models.User.id], cursor, [int]).order_by(models.User.id)
+    if limit:
+        query = query.limit(limit)
+    if fmt:
+        return streaming.stream_rows(streaming.iter_rows(query), fmt, _USER_FIELDS, "users")
+    if plain:
+        rows = db.execute(query).all()
+        return json_response(
+            fast_json.encode_rows(rows, _USER_FIELDS), next_cursor_headers(rows, limit, lambda u: (u.id,))
+        )
+
+    users = query.all()
+    set_next_cursor(response, users, limit, lambda u: (u.id,))
     return users
 
 @router.put("/users/{user_id}/role", response_model=schemas.User)
-async def update_user_role(
+def update_user_role(
     user_id: int,
     role: schemas.UserRole,
     db: Session = Depends(get_db),
@@ -139,8 +210,10 @@ async def update_user_role(
     
     old_role = user.role
     user.role = role
+    auth.revoke_tokens(user)
     db.commit()
     db.refresh(user)
+    auth.invalidate_principal(user.username)
     
     # changing role log
     auth.log_activity(
@@ -156,7 +229,7 @@ async def update_user_role(
     return user
 
 @router.put("/users/{user_id}/deactivate", response_model=schemas.User)
-async def deactivate_user(
+def deactivate_user(
     user_id: int,
     db: Session = Depends(get_db),
     current_user: models.User = Depends(auth.require_admin)
@@ -173,8 +246,10 @@ async def deactivate_user(
         )
     
     user.is_active = False
+    auth.revoke_tokens(user)
     db.commit()
     db.refresh(user)
+    auth.invalidate_principal(user.username)
     
     # deactivate log
     auth.log_activity(
@@ -190,7 +265,7 @@ async def deactivate_user(
     return user
 
 @router.put("/users/{user_id}/activate", response_model=schemas.User)
-async def activate_user(
+def activate_user(
     user_id: int,
     db: Session = Depends(get_db),
     current_user: models.User = Depends(auth.require_admin)
@@ -203,6 +278,7 @@ async def activate_user(
     user.is_active = True
     db.commit()
     db.refresh(user)
+    auth.invalidate_principal(user.username)
     
     # activate log
     auth.log_activity(
@@ -218,45 +294,118 @@ async def activate_user(
     return user
 
 @router.put("/me/password", response_model=dict)
-async def change_password(
+def change_password(
     password_data: schemas.PasswordChange,
     db: Session = Depends(get_db),
     current_user: models.User = Depends(auth.get_current_active_user)
 ):
     """Changes the current user's password"""
+    # current_user may be a cached, detached principal; load the row to update it
+    user = db.query(models.User).filter(models.User.id == current_user.id).first()
+    if not user:
+        raise HTTPException(status_code=404, detail="User not found")
+    
     # Verify current password
-    if not auth.verify_password(password_data.current_password, current_user.hashed_password):
+    if not auth.verify_password(password_data.current_password, user.hashed_password):
         raise HTTPException(
             status_code=status.HTTP_400_BAD_REQUEST,
             detail="Incorrect current password"
         )
     
     # Update to new password
-    current_user.hashed_password = auth.get_password_hash(password_data.new_password)
+    user.hashed_password = auth.get_password_hash(password_data.new_password)
+    auth.revoke_tokens(user)
     db.commit()
+    auth.invalidate_principal(user.username)
     
     return {"message": "Password changed successfully"}
 
 
-@router.get("/logs", response_model=List[schemas.ActivityLog])
-async def list_activity_logs(
+@router.get("/logs", response_model=List[schemas.ActivityLog], responses=streaming.STREAM_RESPONSES)
+def list_activity_logs(
+    response: Response,
     skip: int = 0,
-    limit: int = 100,
+    limit: Optional[int] = Query(None, description="padrão 100; sem limite no modo streaming"),
     action: str = None,
     resource: str = None,
     username: str = None,
+    resource_id: Optional[int] = None,
+    details: Optional[str] = None,
+    since: Optional[datetime] = None,
+    until: Optional[datetime] = None,
+    cursor: Optional[str] = None,
+    format: Optional[str] = Query(None, description="ndjson ou csv: resposta em streaming"),
     db: Session = Depends(get_db),
     current_user: models.User = Depends(auth.require_admin)
 ):
-    """List activity logs in the system (admin only)"""
-    query = db.query(models.ActivityLog)
+    """
+    List activity logs in the system, newest first (admin only).
+    since/until filter on timestamp ([since, until)); username and details
+    match substrings, served by the trigram indexes from migration 0003.
+    With format=ndjson|csv every matching row is streamed from a server-side
+    cursor (limit only applies if given).
+    """
+    fmt = streaming.detect_format(format) if format else None
+    plain = fmt or fast_json.FAST_JSON_RESPONSES  # schema columns instead of ORM objects
+    query = select(*_LOG_COLUMNS) if plain else db.query(models.ActivityLog)
     
     if action:
         query = query.filter(models.ActivityLog.action == action)
     if resource:
         query = query.filter(models.ActivityLog.resource == resource)
+    if resource_id is not None:
+        query = query.filter(models.ActivityLog.resource_id == resource_id)
     if username:
-        query = query.filter(models.ActivityLog.username.ilike(f"%{username}%"))
+        query = query.filter(_username_matches(username))
+    if details:
+        query = query.filter(_contains(models.ActivityLog.details, details))
+    if since:
+        query = query.filter(models.ActivityLog.timestamp >= since)
+    if until:
+        query = query.filter(models.ActivityLog.timestamp < until)
     
-    logs = query.order_by(models.ActivityLog.timestamp.desc()).offset(skip).limit(limit).all()
+    query = after_key(
+        query,
+        [models.ActivityLog.timestamp, models.ActivityLog.id],
+        cursor,
+        [datetime, int],
+        descending=True,
+    )
+    query = query.order_by(models.ActivityLog.timestamp.desc(), models.ActivityLog.id.desc()).offset(skip)
+    if fmt:
+        if limit:
+            query = query.limit(limit)
+        return streaming.stream_rows(streaming.iter_rows(query), fmt, _LOG_FIELDS, "activity_logs")
+
+    limit = limit or 100
+    if plain:
+        rows = db.execute(query.limit(limit)).all()
+        return json_response(
+            fast_json.encode_rows(rows, _LOG_FIELDS),
+            next_cursor_headers(rows, limit, lambda log: (log.timestamp, log.id)),
+        )
+    logs = query.limit(limit).all()
+    set_next_cursor(response, logs, limit, lambda log: (log.timestamp, log.id))
     return logs
+
+
+# Streaming and fast JSON modes select plain columns (the response schema's fields) instead of ORM objects
+_USER_FIELDS = list(schemas.User.model_fields)
+_USER_COLUMNS = [getattr(models.User, field) for field in _USER_FIELDS]
+_LOG_FIELDS = list(schemas.ActivityLog.model_fields)
+_LOG_COLUMNS = [getattr(models.ActivityLog, field) for field in _LOG_FIELDS]
+
+
+def _escape_like(term: str) -> str:
+    return term.replace("\\", "\\\\").replace("%", "\\%").replace("_", "\\_")
+
+
+def _contains(column, term: str):
+    """Case-insensitive substring filter (trigram index friendly)"""
+    return column.ilike(f"%{_escape_like(term)}%", escape="\\")
+
+
+def _username_matches(term: str):
+    # substring match for every length; terms under 3 characters are too short
+    # for the trigram index and scan the rows left by the other filters
+    return _contains(models.ActivityLog.username, term)
@@ -1,19 +1,18 @@
 from fastapi import APIRouter, Depends, HTTPException
+from pydantic import TypeAdapter
+from sqlalchemy import func
 from sqlalchemy.orm import Session
-from typing import List
-import database
+from typing import List, Optional
+from cache import catalog_cache, json_response
+from database import get_db
+from pagination import after_key, next_cursor_headers
 import models
 import schemas
 import auth
 
 router = APIRouter(prefix="/categories", tags=["categories"])
 
-def get_db():
-    db = database.SessionLocal()
-    try:
-        yield db
-    finally:
-        db.close()
+_category_list = TypeAdapter(List[schemas.Category])
 
 @router.post("/", response_model=schemas.Category)
 def create_category(
@@ -25,6 +24,7 @@ def create_category(
     db.add(db_category)
     db.commit()
     db.refresh(db_category)
+    catalog_cache.invalidate("categories")
     
     # Creation log
     auth.log_activity(
@@ -40,9 +40,25 @@ def create_category(
     return db_category
 
 @router.get("/", response_model=List[schemas.Category])
-def read_categories(skip: int = 0, limit: int = 100, db: Session = Depends(get_db)):
-    categories = db.query(models.Category).offset(skip).limit(limit).all()
-    return categories
+def read_categories(
+    skip: int = 0,
+    limit: int = 100,
+    cursor: Optional[str] = None,
+    db: Session = Depends(get_db)
+):
+    params = {"skip": skip, "limit": limit, "cursor": cursor}
+    cache_key = catalog_cache.key("categories", **params)
+    cached = catalog_cache.get(cache_key)
+    if cached is not None:
+        return json_response(*cached)
+
+    query = after_key(db.query(models.Category), [models.Category.id], cursor, [int])
+    categories = query.order_by(models.Category.id).offset(skip).limit(limit).all()
+
+    body = _category_list.dump_json(_category_list.validate_python(categories, from_attributes=True))
+    headers = next_cursor_headers(categories, limit, lambda c: (c.id,))
+    catalog_cache.set(cache_key, body, headers)
+    return json_response(body, headers)
 
 @router.put("/{category_id}", response_model=schemas.Category)
 def update_category(
@@ -57,9 +73,15 @@ def update_category(
     
     for key, value in category.dict().items():
         setattr(db_category, key, value)
+    # products embed their category: bump their version so ETags change too
+    db.query(models.Product).filter(models.Product.category_id == category_id).update(
+        {models.Product.updated_at: func.now()}, synchronize_session=False
+    )
     
     db.commit()
     db.refresh(db_category)
+    # products embed their category, so both listings go stale
+    catalog_cache.invalidate("categories", "products")
     
     # update log
     auth.log_activity(
@@ -84,8 +106,11 @@ def delete_category(
     if db_category is None:
         raise HTTPException(status_code=404, detail="Category not found")
     
-    # Check if there are products in this category
-    if db_category.products:
+    # Check if there are products in this category (without loading them all)
+    has_products = (
+        db.query(models.Product.id).filter(models.Product.category_id == category_id).first()
+    )
+    if has_products:
         raise HTTPException(
             status_code=400, 
             detail="Cannot delete category with associated products. Please delete or reassign products first."
@@ -94,6 +119,8 @@ def delete_category(
     category_name = db_category.name
     db.delete(db_category)
     db.commit()
+    # products embed their category, so both listings go stale
+    catalog_cache.invalidate("categories", "products")
     
     # deletion log
     auth.log_activity(
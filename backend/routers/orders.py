@@ -1,21 +1,32 @@
-from fastapi import APIRouter, Depends, HTTPException
-from sqlalchemy.orm import Session
-from typing import List, Optional
+from fastapi import APIRouter, Depends, HTTPException, Response
+from sqlalchemy import insert, select
+from sqlalchemy.exc import DBAPIError
+from sqlalchemy.orm import Session, selectinload
+from typing import Callable, Dict, List, Optional, Tuple, TypeVar
+from datetime import datetime
 import json
-import database
+import os
+import random
+import sqlite3
+import time
+from cache import catalog_cache, json_response
+from database import get_db
+from pagination import after_key, next_cursor_headers, set_next_cursor
+import fast_json
 import models
+import reservations
 import schemas
 import auth
 
 router = APIRouter(prefix="/orders", tags=["orders"])
 
+T = TypeVar("T")
 
-def get_db():
-    db = database.SessionLocal()
-    try:
-        yield db
-    finally:
-        db.close()
+# Retry de checkouts que colidem com outros (deadlock / serialization failure)
+CHECKOUT_MAX_ATTEMPTS = int(os.getenv("CHECKOUT_MAX_ATTEMPTS", "4"))
+CHECKOUT_RETRY_BASE_DELAY = float(os.getenv("CHECKOUT_RETRY_BASE_DELAY", "0.05"))
+CHECKOUT_RETRY_MAX_DELAY = float(os.getenv("CHECKOUT_RETRY_MAX_DELAY", "0.5"))
+RETRYABLE_SQLSTATES = {"40001", "40P01"}  # serialization_failure, deadlock_detected
 
 
 @router.post("/checkout", response_model=schemas.OrderResponse)
@@ -27,94 +38,309 @@ def checkout(
     """
     Checkout mockado: valida estoque, cria pedido (Order + itens + entrega), baixa estoque.
     delivery_type: SHIPPING (envio), PICKUP (retirada), DIGITAL (e-book).
+    Com reservation_id o pedido é feito com os itens da reserva (POST /orders/reservations),
+    cujo estoque já foi separado: nenhuma linha de products é bloqueada.
+    Conflitos de concorrência (deadlock/serialização) são repetidos automaticamente.
     """
-    total_amount = 0.0
-    items_with_product = []
-
     if order.delivery_type == schemas.DeliveryType.SHIPPING and not order.shipping_address:
         raise HTTPException(status_code=400, detail="Endereço de entrega obrigatório para envio.")
 
-    try:
-        for item in order.items:
-            product = db.query(models.Product).with_for_update().filter(models.Product.id == item.product_id).first()
-            if not product:
-                raise HTTPException(status_code=404, detail=f"Produto {item.product_id} não encontrado")
-            if product.stock_quantity < item.quantity:
+    if order.reservation_id:
+        db_order = _with_retries(db, lambda: _place_reserved_order(db, order, current_user))
+    else:
+        lines = _normalize_lines(order.items)
+        db_order = _with_retries(db, lambda: _place_order(db, order, lines, current_user))
+
+    # checkout log
+    auth.log_activity(
+        db=db,
+        user_id=current_user.id,
+        username=current_user.username,
+        action="CHECKOUT",
+        resource="ORDER",
+        resource_id=db_order.id,
+        details=f"Order total: R$ {db_order.total_amount:.2f}, Payment: {order.payment_method.value}, Delivery: {order.delivery_type.value}"
+    )
+
+    return schemas.OrderResponse(
+        order_id=db_order.id,
+        message="Pedido realizado com sucesso (pagamento mockado).",
+        total_amount=db_order.total_amount,
+    )
+
+
+@router.post("/reservations", response_model=schemas.ReservationResponse, status_code=201)
+def create_reservation(
+    reservation: schemas.ReservationCreate,
+    db: Session = Depends(get_db),
+    current_user: models.User = Depends(auth.require_any_role),
+):
+    """
+    Separa o estoque do carrinho por RESERVATION_TTL_SECONDS; o pagamento é feito em
+    POST /orders/checkout com o reservation_id. Reservas não pagas expiram sozinhas.
+    """
+    lines = _normalize_lines(reservation.items)
+    if not lines:
+        raise HTTPException(status_code=400, detail="Carrinho vazio.")
+    hold_id, expires_at = _with_retries(db, lambda: _hold(db, lines, current_user))
+
+    auth.log_activity(
+        db=db,
+        user_id=current_user.id,
+        username=current_user.username,
+        action="RESERVE",
+        resource="ORDER",
+        details=json.dumps({"reservation_id": hold_id, "items": dict(lines)}),
+    )
+    return schemas.ReservationResponse(
+        reservation_id=hold_id,
+        expires_at=expires_at,
+        items=[schemas.OrderItemInput(product_id=product_id, quantity=qty) for product_id, qty in lines],
+    )
+
+
+@router.delete("/reservations/{reservation_id}", status_code=204)
+def cancel_reservation(
+    reservation_id: str,
+    db: Session = Depends(get_db),
+    current_user: models.User = Depends(auth.require_any_role),
+):
+    """Cancela uma reserva ativa e devolve o estoque."""
+    def attempt():
+        try:
+            reservations.release(db, reservation_id, current_user.id)
+        except reservations.ReservationNotFound:
+            raise HTTPException(status_code=404, detail="Reserva não encontrada ou expirada")
+        db.commit()
+
+    _with_retries(db, attempt)
+    catalog_cache.invalidate("products")  # stock_quantity changed
+    return None
+
+
+def _normalize_lines(items: List[schemas.OrderItemInput]) -> List[Tuple[int, int]]:
+    """
+    Junta linhas repetidas do carrinho e ordena por product_id.
+    A ordem determinística dos locks evita deadlock entre checkouts concorrentes.
+    """
+    merged: Dict[int, int] = {}
+    for item in items:
+        if item.quantity <= 0:
+            raise HTTPException(status_code=400, detail=f"Quantidade inválida para o produto {item.product_id}")
+        merged[item.product_id] = merged.get(item.product_id, 0) + item.quantity
+    return sorted(merged.items())
+
+
+def _with_retries(db: Session, attempt: Callable[[], T]) -> T:
+    """Executa ``attempt`` (que faz commit) repetindo conflitos de concorrência com backoff."""
+    for number in range(1, CHECKOUT_MAX_ATTEMPTS + 1):
+        try:
+            return attempt()
+        except HTTPException:
+            db.rollback()
+            raise
+        except DBAPIError as e:
+            db.rollback()
+            if not _is_retryable(e):
+                raise HTTPException(status_code=500, detail=str(e))
+            if number == CHECKOUT_MAX_ATTEMPTS:
                 raise HTTPException(
-                    status_code=400,
-                    detail=f"Estoque insuficiente para '{product.title}'. Pedido: {item.quantity}, Disponível: {product.stock_quantity}",
+                    status_code=503,
+                    detail="Muitos pedidos simultâneos para estes produtos. Tente novamente.",
+                    headers={"Retry-After": "1"},
                 )
-            total_amount += product.price * item.quantity
-            items_with_product.append((product, item.quantity))
-
-        shipping_address_json: Optional[str] = None
-        if order.shipping_address:
-            shipping_address_json = order.shipping_address.model_dump_json()
-
-        db_order = models.Order(
-            user_id=current_user.id,
-            status=models.OrderStatus.PAID,
-            total_amount=total_amount,
-            payment_method=models.PaymentMethod(order.payment_method.value),
-            delivery_type=models.DeliveryType(order.delivery_type.value),
-            shipping_address=shipping_address_json,
-        )
-        db.add(db_order)
-        db.flush()
-
-        for product, qty in items_with_product:
-            item_download_url = None
-            if product.product_type == models.ProductType.DIGITAL and getattr(product, "download_url", None):
-                item_download_url = product.download_url
-            db.add(models.OrderItem(
-                order_id=db_order.id,
-                product_id=product.id,
-                quantity=qty,
-                unit_price=product.price,
-                product_title=product.title,
-                download_url=item_download_url,
-            ))
-            product.stock_quantity -= qty
+            time.sleep(_retry_delay(number))
+        except Exception as e:
+            db.rollback()
+            raise HTTPException(status_code=500, detail=str(e))
 
-        db.commit()
-        db.refresh(db_order)
-        
-        # checkout log
-        auth.log_activity(
-            db=db,
-            user_id=current_user.id,
-            username=current_user.username,
-            action="CHECKOUT",
-            resource="ORDER",
-            resource_id=db_order.id,
-            details=f"Order total: R$ {total_amount:.2f}, Payment: {order.payment_method.value}, Delivery: {order.delivery_type.value}"
-        )
-        
-        return schemas.OrderResponse(
-            order_id=db_order.id,
-            message="Pedido realizado com sucesso (pagamento mockado).",
-            total_amount=total_amount,
-        )
-    except HTTPException:
-        db.rollback()
-        raise
-    except Exception as e:
+
+def _insufficient(product: models.Product, qty: int, available: int) -> HTTPException:
+    return HTTPException(
+        status_code=400,
+        detail=f"Estoque insuficiente para '{product.title}'. Pedido: {qty}, Disponível: {available}",
+    )
+
+
+def _place_order(
+    db: Session,
+    order: schemas.OrderCreate,
+    lines: List[Tuple[int, int]],
+    current_user: models.User,
+) -> models.Order:
+    """Executa uma tentativa de checkout em uma única transação."""
+    requested = dict(lines)
+
+    # um único SELECT ... WHERE id IN (...) ORDER BY id FOR UPDATE para todo o carrinho
+    products = (
+        db.query(models.Product)
+        .filter(models.Product.id.in_(requested))
+        .order_by(models.Product.id)
+        .with_for_update()
+        .all()
+    )
+    products_by_id = {product.id: product for product in products}
+    # produtos com estoque em shards: o disponível é a soma dos shards
+    striped = reservations.shard_counts(db, requested)
+    stock = reservations.available(db, striped) if striped else {}
+    for product_id, qty in lines:
+        product = products_by_id.get(product_id)
+        if not product:
+            raise HTTPException(status_code=404, detail=f"Produto {product_id} não encontrado")
+        available = stock.get(product_id, product.stock_quantity)
+        if available < qty:
+            raise _insufficient(product, qty, available)
+
+    db_order = _create_order(db, order, lines, products_by_id, current_user)
+    if lines:
+        # baixa de estoque em um único UPDATE condicional (e nos shards dos produtos listrados)
+        try:
+            reservations.take_stock(db, requested, striped)
+        except reservations.InsufficientStock:
+            raise HTTPException(
+                status_code=409,
+                detail="O estoque mudou durante o checkout. Tente novamente.",
+            )
+
+    db.commit()
+    catalog_cache.invalidate("products")  # stock_quantity changed
+    db.refresh(db_order)
+    return db_order
+
+
+def _place_reserved_order(db: Session, order: schemas.OrderCreate, current_user: models.User) -> models.Order:
+    """Converte uma reserva em pedido: bloqueia só as linhas da reserva, o estoque já foi baixado."""
+    try:
+        lines = reservations.claim(db, order.reservation_id, current_user.id)
+    except reservations.ReservationNotFound:
+        raise HTTPException(status_code=404, detail="Reserva não encontrada ou expirada")
+    products_by_id = {
+        product.id: product
+        for product in db.query(models.Product).filter(models.Product.id.in_([pid for pid, _ in lines]))
+    }
+    db_order = _create_order(db, order, lines, products_by_id, current_user)
+    reservations.convert(db, order.reservation_id, db_order.id)
+    db.commit()
+    db.refresh(db_order)
+    return db_order
+
+
+def _hold(db: Session, lines: List[Tuple[int, int]], current_user: models.User):
+    """Uma tentativa de reserva: baixa o estoque do carrinho e registra a reserva."""
+    products_by_id = {
+        product.id: product
+        for product in db.query(models.Product).filter(models.Product.id.in_([pid for pid, _ in lines]))
+    }
+    for product_id, _ in lines:
+        if product_id not in products_by_id:
+            raise HTTPException(status_code=404, detail=f"Produto {product_id} não encontrado")
+    try:
+        hold_id, expires_at = reservations.hold(db, current_user.id, lines)
+    except reservations.InsufficientStock as e:
         db.rollback()
-        raise HTTPException(status_code=500, detail=str(e))
+        qty = dict(lines)[e.product_id]
+        available = reservations.available(db, [e.product_id]).get(e.product_id, 0)
+        raise _insufficient(products_by_id[e.product_id], qty, available)
+    db.commit()
+    catalog_cache.invalidate("products")  # stock_quantity changed
+    return hold_id, expires_at
+
+
+def _create_order(
+    db: Session,
+    order: schemas.OrderCreate,
+    lines: List[Tuple[int, int]],
+    products_by_id: Dict[int, models.Product],
+    current_user: models.User,
+) -> models.Order:
+    """Cria o Order e seus itens (preço e título do momento da compra)."""
+    total_amount = sum(products_by_id[product_id].price * qty for product_id, qty in lines)
+
+    shipping_address_json: Optional[str] = None
+    if order.shipping_address:
+        shipping_address_json = order.shipping_address.model_dump_json()
+
+    db_order = models.Order(
+        user_id=current_user.id,
+        status=models.OrderStatus.PAID,
+        total_amount=total_amount,
+        payment_method=models.PaymentMethod(order.payment_method.value),
+        delivery_type=models.DeliveryType(order.delivery_type.value),
+        shipping_address=shipping_address_json,
+    )
+    db.add(db_order)
+    db.flush()
+
+    order_items = []
+    for product_id, qty in lines:
+        product = products_by_id[product_id]
+        item_download_url = None
+        if product.product_type == models.ProductType.DIGITAL and getattr(product, "download_url", None):
+            item_download_url = product.download_url
+        order_items.append({
+            "order_id": db_order.id,
+            "product_id": product.id,
+            "quantity": qty,
+            "unit_price": product.price,
+            "product_title": product.title,
+            "download_url": item_download_url,
+        })
+    if order_items:
+        db.execute(insert(models.OrderItem), order_items)
+    return db_order
+
+
+def _is_retryable(error: DBAPIError) -> bool:
+    """Deadlock/falha de serialização no Postgres, ou banco bloqueado no SQLite."""
+    orig = error.orig
+    code = getattr(orig, "pgcode", None) or getattr(orig, "sqlstate", None)
+    if code in RETRYABLE_SQLSTATES:
+        return True
+    return isinstance(orig, sqlite3.OperationalError) and "locked" in str(orig)
+
+
+def _retry_delay(attempt: int) -> float:
+    """Backoff exponencial com jitter, limitado a CHECKOUT_RETRY_MAX_DELAY."""
+    delay = min(CHECKOUT_RETRY_BASE_DELAY * (2 ** (attempt - 1)), CHECKOUT_RETRY_MAX_DELAY)
+    return random.uniform(delay / 2, delay)
 
 
 @router.get("/", response_model=List[schemas.OrderDetail])
 def list_my_orders(
+    response: Response,
+    limit: Optional[int] = None,
+    cursor: Optional[str] = None,
     db: Session = Depends(get_db),
     current_user: models.User = Depends(auth.get_current_active_user),
 ):
-    """Lista pedidos do usuário logado."""
-    orders = (
+    """Lista pedidos do usuário logado (mais recentes primeiro; limit/cursor opcionais)."""
+    if fast_json.FAST_JSON_RESPONSES:
+        query = select(*_ORDER_COLUMNS).where(models.Order.user_id == current_user.id)
+        query = after_key(
+            query, [models.Order.created_at, models.Order.id], cursor, [datetime, int], descending=True
+        )
+        query = query.order_by(models.Order.created_at.desc(), models.Order.id.desc())
+        if limit:
+            query = query.limit(limit)
+        rows = db.execute(query).all()
+        return json_response(
+            fast_json.dumps(_order_rows_to_details(db, rows)),
+            next_cursor_headers(rows, limit, lambda o: (o.created_at, o.id)),
+        )
+
+    query = (
         db.query(models.Order)
+        .options(selectinload(models.Order.items))
         .filter(models.Order.user_id == current_user.id)
-        .order_by(models.Order.created_at.desc())
-        .all()
     )
+    query = after_key(
+        query, [models.Order.created_at, models.Order.id], cursor, [datetime, int], descending=True
+    )
+    query = query.order_by(models.Order.created_at.desc(), models.Order.id.desc())
+    if limit:
+        query = query.limit(limit)
+    orders = query.all()
+    set_next_cursor(response, orders, limit, lambda o: (o.created_at, o.id))
     return [_order_to_detail(o) for o in orders]
 
 
@@ -125,7 +351,20 @@ def get_order(
     current_user: models.User = Depends(auth.get_current_active_user),
 ):
     """Detalhe de um pedido (apenas dono)."""
-    order = db.query(models.Order).filter(models.Order.id == order_id).first()
+    if fast_json.FAST_JSON_RESPONSES:
+        row = db.execute(select(*_ORDER_COLUMNS).where(models.Order.id == order_id)).first()
+        if not row:
+            raise HTTPException(status_code=404, detail="Pedido não encontrado")
+        if row.user_id != current_user.id:
+            raise HTTPException(status_code=403, detail="Acesso negado")
+        return json_response(fast_json.dumps(_order_rows_to_details(db, [row])[0]))
+
+    order = (
+        db.query(models.Order)
+        .options(selectinload(models.Order.items))
+        .filter(models.Order.id == order_id)
+        .first()
+    )
     if not order:
         raise HTTPException(status_code=404, detail="Pedido não encontrado")
     if order.user_id != current_user.id:
@@ -133,13 +372,17 @@ def get_order(
     return _order_to_detail(order)
 
 
-def _order_to_detail(order: models.Order) -> schemas.OrderDetail:
-    shipping_address = None
-    if order.shipping_address:
+def _parse_shipping_address(value: Optional[str]) -> Optional[dict]:
+    if value:
         try:
-            shipping_address = json.loads(order.shipping_address)
+            return json.loads(value)
         except Exception:
             pass
+    return None
+
+
+def _order_to_detail(order: models.Order) -> schemas.OrderDetail:
+    shipping_address = _parse_shipping_address(order.shipping_address)
     return schemas.OrderDetail(
         id=order.id,
         total_amount=order.total_amount,
@@ -158,3 +401,42 @@ def _order_to_detail(order: models.Order) -> schemas.OrderDetail:
             for item in order.items
         ],
     )
+
+
+# caminho rápido (FAST_JSON_RESPONSES): colunas em vez de objetos ORM, mesmo JSON que OrderDetail
+_ORDER_COLUMNS = [
+    models.Order.id,
+    models.Order.user_id,
+    models.Order.total_amount,
+    models.Order.payment_method,
+    models.Order.delivery_type,
+    models.Order.shipping_address,
+    models.Order.created_at,
+]
+_ITEM_FIELDS = list(schemas.OrderItemResponse.model_fields)
+_ITEM_COLUMNS = [getattr(models.OrderItem, field) for field in _ITEM_FIELDS]
+
+
+def _order_rows_to_details(db: Session, rows) -> List[dict]:
+    """Linhas de _ORDER_COLUMNS como objetos OrderDetail, com os itens em uma única consulta."""
+    items: Dict[int, List[dict]] = {row.id: [] for row in rows}
+    if items:
+        item_rows = db.execute(
+            select(models.OrderItem.order_id, *_ITEM_COLUMNS)
+            .where(models.OrderItem.order_id.in_(list(items)))
+            .order_by(models.OrderItem.id)
+        )
+        for item in item_rows:
+            items[item[0]].append(dict(zip(_ITEM_FIELDS, item[1:])))
+    return [
+        {
+            "id": row.id,
+            "total_amount": row.total_amount,
+            "payment_method": row.payment_method.value,
+            "delivery_type": row.delivery_type.value if row.delivery_type else "SHIPPING",
+            "shipping_address": _parse_shipping_address(row.shipping_address),
+            "created_at": row.created_at,
+            "items": items[row.id],
+        }
+        for row in rows
+    ]
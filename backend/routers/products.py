@@ -1,19 +1,30 @@
-from fastapi import APIRouter, Depends, HTTPException
+from fastapi import APIRouter, Depends, File, HTTPException, Query, Request, UploadFile
+from pydantic import ValidationError
+from sqlalchemy import func, insert, select, text
+from sqlalchemy.exc import SQLAlchemyError
 from sqlalchemy.orm import Session
-from typing import List
-import database
+from typing import List, Optional
+import json
+import os
+from cache import catalog_cache, json_response
+from database import get_db
+from http_cache import is_not_modified, not_modified, validators
+from pagination import after_key, next_cursor_headers
 import models
 import schemas
 import auth
+import catalog_projection
+import reservations
+import search
+import streaming
 
 router = APIRouter(prefix="/products", tags=["products"])
 
-def get_db():
-    db = database.SessionLocal()
-    try:
-        yield db
-    finally:
-        db.close()
+PRODUCT_IMPORT_CHUNK_SIZE = int(os.getenv("PRODUCT_IMPORT_CHUNK_SIZE", "1000"))
+PRODUCT_IMPORT_MAX_ERRORS = int(os.getenv("PRODUCT_IMPORT_MAX_ERRORS", "100"))
+
+_IMPORT_FIELDS = list(schemas.ProductCreate.model_fields)
+_EXPORT_FIELDS = ["id", *_IMPORT_FIELDS, "created_at", "updated_at"]
 
 @router.post("/", response_model=schemas.Product)
 def create_product(
@@ -25,6 +36,7 @@ def create_product(
     db.add(db_product)
     db.commit()
     db.refresh(db_product)
+    catalog_cache.invalidate("products")
     
     # creation log
     auth.log_activity(
@@ -41,22 +53,266 @@ def create_product(
 
 @router.get("/", response_model=List[schemas.Product])
 def read_products(
+    request: Request,
     skip: int = 0, 
     limit: int = 100, 
     category_id: int = None, 
+    cursor: Optional[str] = None,
     db: Session = Depends(get_db)
 ):
-    query = db.query(models.Product)
+    """
+    Lists products ordered by id; see pagination.py for cursor paging.
+    Supports conditional requests (If-None-Match; no Last-Modified on listings).
+    """
+    params = {"skip": skip, "limit": limit, "category_id": category_id, "cursor": cursor}
+    cache_key = catalog_cache.key("products", **params)  # before the read: see ResponseCache.key
+    cached = catalog_cache.get(cache_key)
+    if cached is not None:
+        return _conditional_response(request, *cached)
+
+    # precomputed rows (catalog_projection.py): no join, no ORM objects
+    query = db.query(models.CatalogEntry.product_id, models.CatalogEntry.version, models.CatalogEntry.payload)
     if category_id:
-        query = query.filter(models.Product.category_id == category_id)
-    return query.offset(skip).limit(limit).all()
+        query = query.filter(models.CatalogEntry.category_id == category_id)
+    query = after_key(query, [models.CatalogEntry.product_id], cursor, [int])
+    entries = query.order_by(models.CatalogEntry.product_id).offset(skip).limit(limit).all()
+
+    headers = validators(
+        ((e.product_id, e.version) for e in entries), sorted(params.items()), last_modified=False
+    )
+    headers.update(next_cursor_headers(entries, limit, lambda e: (e.product_id,)))
+    if is_not_modified(request, headers):
+        return not_modified(headers)
+
+    body = _join_payloads(e.payload for e in entries)
+    catalog_cache.set(cache_key, body, headers)
+    return json_response(body, headers)
+
+@router.get("/search", response_model=List[schemas.Product])
+def search_products(
+    q: str = Query(..., min_length=1, description="Termos de busca (título e descrição)"),
+    skip: int = Query(0, ge=0),
+    limit: int = Query(20, ge=1, le=100),
+    db: Session = Depends(get_db)
+):
+    """Ranked, accent-insensitive full-text search over title and description"""
+    ids = search.search_product_ids(db, q, limit=limit, skip=skip)
+    if not ids:
+        return []
+    payloads = dict(
+        db.query(models.CatalogEntry.product_id, models.CatalogEntry.payload)
+        .filter(models.CatalogEntry.product_id.in_(ids))
+    )
+    return json_response(_join_payloads(payloads[product_id] for product_id in ids if product_id in payloads))
+
+@router.post("/import", response_model=schemas.ProductImportResult)
+def import_products(
+    file: UploadFile = File(..., description="CSV (com cabeçalho) ou NDJSON"),
+    format: Optional[str] = Query(None, description="csv ou ndjson (padrão: extensão do arquivo)"),
+    db: Session = Depends(get_db),
+    current_user: models.User = Depends(auth.require_vendedor_or_admin)
+):
+    """
+    Bulk create/update of products. The upload is read record by record and
+    validated against ProductCreate in chunks of PRODUCT_IMPORT_CHUNK_SIZE;
+    each chunk is written with one multi-row INSERT (rows with an ``id`` are
+    upserted with ON CONFLICT) and committed. Invalid rows are skipped and
+    reported. A single activity log entry summarizes the import.
+    """
+    fmt = streaming.detect_format(format, file.filename)
+    result = schemas.ProductImportResult()
+    explicit_ids = False
+    records = streaming.read_records(file.file, fmt)
+    for chunk in streaming.chunked(records, PRODUCT_IMPORT_CHUNK_SIZE):
+        rows = _validate_import_chunk(db, chunk, result)
+        if rows:
+            explicit_ids = _write_import_chunk(db, rows, result) or explicit_ids
+
+    if explicit_ids:
+        _sync_id_sequence(db)
+    if result.created or result.updated:
+        # Core INSERTs bypass the ORM events that keep these in sync
+        # (the catalog projection is refreshed per chunk, see _write_import_chunk)
+        catalog_cache.invalidate("products")
+        search.local_index.reset()
+
+    auth.log_activity(
+        db=db,
+        user_id=current_user.id,
+        username=current_user.username,
+        action="IMPORT",
+        resource="PRODUCT",
+        details=json.dumps({
+            "file": file.filename,
+            "created": result.created,
+            "updated": result.updated,
+            "failed": result.failed,
+        }),
+    )
+    return result
+
+@router.get("/export", responses=streaming.STREAM_RESPONSES)
+def export_products(
+    format: str = Query("ndjson", description="ndjson ou csv"),
+    category_id: Optional[int] = None,
+    current_user: models.User = Depends(auth.require_vendedor_or_admin)
+):
+    """
+    Streams the catalog as NDJSON or CSV, ordered by id, in the flat shape the
+    import accepts (plus id and timestamps). Rows come from a server-side
+    cursor, so the catalog is never held in memory.
+    """
+    fmt = streaming.detect_format(format)
+    return streaming.stream_rows(_export_rows(category_id), fmt, _EXPORT_FIELDS, "products")
 
 @router.get("/{product_id}", response_model=schemas.Product)
-def read_product(product_id: int, db: Session = Depends(get_db)):
-    product = db.query(models.Product).filter(models.Product.id == product_id).first()
-    if product is None:
+def read_product(product_id: int, request: Request, db: Session = Depends(get_db)):
+    cache_key = catalog_cache.key("products", product_id=product_id)
+    cached = catalog_cache.get(cache_key)
+    if cached is not None:
+        return _conditional_response(request, *cached)
+
+    entry = (
+        db.query(models.CatalogEntry.version, models.CatalogEntry.payload)
+        .filter(models.CatalogEntry.product_id == product_id)
+        .first()
+    )
+    if entry is None:
         raise HTTPException(status_code=404, detail="Product not found")
-    return product
+
+    headers = validators([(product_id, entry.version)])
+    if is_not_modified(request, headers):
+        return not_modified(headers)
+
+    body = entry.payload.encode("utf-8")
+    catalog_cache.set(cache_key, body, headers)
+    return json_response(body, headers)
+
+
+def _join_payloads(payloads) -> bytes:
+    """JSON array of already serialized schemas.Product objects"""
+    return ("[" + ",".join(payloads) + "]").encode("utf-8")
+
+
+def _conditional_response(request: Request, body: bytes, headers: dict):
+    if is_not_modified(request, headers):
+        return not_modified(headers)
+    return json_response(body, headers)
+
+
+def _import_error(result: schemas.ProductImportResult, line: int, error: str) -> None:
+    result.failed += 1
+    if len(result.errors) < PRODUCT_IMPORT_MAX_ERRORS:
+        result.errors.append(schemas.ImportRowError(line=line, error=error))
+
+
+def _validate_import_chunk(db: Session, chunk, result: schemas.ProductImportResult) -> list:
+    """(line, row) pairs ready for INSERT; failures are recorded on ``result``"""
+    valid = []
+    for line, record in chunk:
+        if isinstance(record, ValueError):
+            _import_error(result, line, str(record))
+            continue
+        if not isinstance(record, dict):
+            _import_error(result, line, "Expected an object")
+            continue
+        try:
+            product = schemas.ProductCreate.model_validate({k: v for k, v in record.items() if v is not None})
+            product_id = int(record["id"]) if record.get("id") is not None else None
+        except ValidationError as e:
+            _import_error(result, line, "; ".join(
+                f"{'.'.join(str(part) for part in error['loc'])}: {error['msg']}" for error in e.errors()
+            ))
+            continue
+        except (TypeError, ValueError):
+            _import_error(result, line, "id: must be an integer")
+            continue
+        row = product.model_dump()
+        if product_id is not None:
+            row["id"] = product_id
+        valid.append((line, row))
+
+    category_ids = {row["category_id"] for _, row in valid}
+    known = {
+        category_id for (category_id,) in
+        db.query(models.Category.id).filter(models.Category.id.in_(category_ids))
+    }
+    rows = []
+    for line, row in valid:
+        if row["category_id"] in known:
+            rows.append((line, row))
+        else:
+            _import_error(result, line, f"category_id: category {row['category_id']} not found")
+    return rows
+
+
+def _upsert_statement(dialect_name: str):
+    if dialect_name == "postgresql":
+        from sqlalchemy.dialects.postgresql import insert as dialect_insert
+    elif dialect_name == "sqlite":
+        from sqlalchemy.dialects.sqlite import insert as dialect_insert
+    else:
+        raise HTTPException(status_code=501, detail=f"Upsert not supported on {dialect_name}")
+    statement = dialect_insert(models.Product)
+    changes = {field: statement.excluded[field] for field in _IMPORT_FIELDS}
+    changes["updated_at"] = func.now()
+    return statement.on_conflict_do_update(index_elements=[models.Product.id], set_=changes)
+
+
+def _write_import_chunk(db: Session, rows: list, result: schemas.ProductImportResult) -> bool:
+    """Writes one chunk in its own transaction; returns True if it upserted explicit ids"""
+    by_id = {}
+    new = []
+    for _, row in rows:
+        if "id" in row:
+            by_id[row["id"]] = row  # a repeated id within the chunk: last row wins
+        else:
+            new.append(row)
+    try:
+        displayed = {}  # existing id -> stock_quantity before the upsert
+        if by_id:
+            displayed = dict(
+                db.query(models.Product.id, models.Product.stock_quantity).filter(models.Product.id.in_(list(by_id)))
+            )
+            db.execute(_upsert_statement(db.get_bind().dialect.name), list(by_id.values()))
+        created_ids = []
+        if new:
+            created_ids = db.scalars(insert(models.Product).returning(models.Product.id), new).all()
+        # striped products: only the change against the (possibly stale) displayed stock reaches the shards
+        reservations.apply_stock_changes(db, {
+            product_id: (by_id[product_id]["stock_quantity"] or 0) - (stock or 0)
+            for product_id, stock in displayed.items()
+        })
+        catalog_projection.mark(db, product_ids=[*by_id, *created_ids])
+        db.commit()
+    except SQLAlchemyError as e:
+        db.rollback()
+        reason = str(getattr(e, "orig", None) or e).splitlines()[0]
+        for line, _ in rows:
+            _import_error(result, line, f"Database error: {reason}")
+        return False
+
+    # counted per distinct id: rows repeating an id were folded into one write
+    result.updated += len(displayed)
+    result.created += len(new) + len(by_id) - len(displayed)
+    return bool(by_id)
+
+
+def _sync_id_sequence(db: Session) -> None:
+    """After inserting explicit ids, move the Postgres sequence past them"""
+    if db.get_bind().dialect.name == "postgresql":
+        db.execute(text(
+            "SELECT setval(pg_get_serial_sequence('products', 'id'), "
+            "coalesce((SELECT max(id) FROM products), 1))"
+        ))
+        db.commit()
+
+
+def _export_rows(category_id: Optional[int]):
+    query = select(*(getattr(models.Product, field) for field in _EXPORT_FIELDS)).order_by(models.Product.id)
+    if category_id:
+        query = query.where(models.Product.category_id == category_id)
+    return streaming.iter_rows(query)
 
 @router.put("/{product_id}", response_model=schemas.Product)
 def update_product(
@@ -69,11 +325,16 @@ def update_product(
     if db_product is None:
         raise HTTPException(status_code=404, detail="Product not found")
     
+    displayed_stock = db_product.stock_quantity or 0
     for key, value in product.dict().items():
         setattr(db_product, key, value)
+    db.flush()
+    # striped stock gets the change the admin made to the (possibly stale) displayed value
+    reservations.apply_stock_changes(db, {product_id: (db_product.stock_quantity or 0) - displayed_stock})
     
     db.commit()
     db.refresh(db_product)
+    catalog_cache.invalidate("products")
     
     # update log
     auth.log_activity(
@@ -101,6 +362,7 @@ def delete_product(
     product_title = db_product.title
     db.delete(db_product)
     db.commit()
+    catalog_cache.invalidate("products")
     
     # deletion log
     auth.log_activity(
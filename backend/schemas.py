@@ -37,6 +37,10 @@ class User(UserBase):
 class Token(BaseModel):
     access_token: str
     token_type: str
+    refresh_token: Optional[str] = None  # only with AUTH_STATELESS_TOKENS
+
+class RefreshRequest(BaseModel):
+    refresh_token: str
 
 class TokenData(BaseModel):
     username: Optional[str] = None
@@ -94,6 +98,16 @@ class Product(ProductBase):
     class Config:
         from_attributes = True
 
+class ImportRowError(BaseModel):
+    line: int
+    error: str
+
+class ProductImportResult(BaseModel):
+    created: int = 0
+    updated: int = 0
+    failed: int = 0
+    errors: List[ImportRowError] = []  # first PRODUCT_IMPORT_MAX_ERRORS failures
+
 # Order Schemas (mock payment + entrega)
 class OrderItemInput(BaseModel):
     product_id: int
@@ -122,12 +136,23 @@ class ShippingAddressInput(BaseModel):
 
 
 class OrderCreate(BaseModel):
-    items: List[OrderItemInput]
+    items: List[OrderItemInput] = []  # ignorado quando reservation_id é informado
+    reservation_id: Optional[str] = None  # paga uma reserva de POST /orders/reservations
     payment_method: PaymentMethod = PaymentMethod.CARD
     delivery_type: DeliveryType = DeliveryType.SHIPPING
     shipping_address: Optional[ShippingAddressInput] = None
 
 
+class ReservationCreate(BaseModel):
+    items: List[OrderItemInput]
+
+
+class ReservationResponse(BaseModel):
+    reservation_id: str
+    expires_at: datetime
+    items: List[OrderItemInput]
+
+
 class OrderResponse(BaseModel):
     order_id: int
     message: str
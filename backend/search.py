@@ -0,0 +1,172 @@
+"""
+Full-text product search over title and description.
+
+PostgreSQL: ranked search with a GIN index over a weighted tsvector built with
+the ``pt_unaccent`` text search configuration (Portuguese stemming +
+``unaccent``), so "inteligencia" finds "Inteligência". The index and the text
+search configuration are created by migration 0002; Postgres keeps the
+expression index in sync on every INSERT/UPDATE/DELETE.
+
+Other databases (SQLite in tests/dev): an in-process inverted index with the
+same accent-insensitive tokenization, built lazily on first search and then
+updated incrementally when product writes are committed.
+"""
+
+import re
+import threading
+import unicodedata
+from collections import defaultdict
+from typing import Dict, List, Optional, Set
+
+from sqlalchemy import event, text
+from sqlalchemy.orm import Session
+
+import models
+
+SEARCH_CONFIG = "pt_unaccent"
+
+# Must match the expression indexed by migration 0002 exactly, or the planner
+# will not use the GIN index.
+SEARCH_DOCUMENT_SQL = (
+    f"setweight(to_tsvector('{SEARCH_CONFIG}'::regconfig, coalesce(products.title, '')), 'A') || "
+    f"setweight(to_tsvector('{SEARCH_CONFIG}'::regconfig, coalesce(products.description, '')), 'B')"
+)
+
+TITLE_WEIGHT = 3
+DESCRIPTION_WEIGHT = 1
+
+
+def normalize(value: str) -> str:
+    """Lowercases and strips accents ("Inteligência" -> "inteligencia")"""
+    decomposed = unicodedata.normalize("NFKD", value)
+    return "".join(ch for ch in decomposed if not unicodedata.combining(ch)).lower()
+
+
+def tokenize(value: Optional[str]) -> List[str]:
+    return re.findall(r"\w+", normalize(value or ""))
+
+
+class InMemorySearchIndex:
+    """Inverted index token -> {product_id: weight}, used when Postgres is not available"""
+
+    def __init__(self):
+        self._postings: Dict[str, Dict[int, int]] = defaultdict(dict)
+        self._tokens: Dict[int, Set[str]] = {}
+        self._lock = threading.Lock()
+        self.built = False
+
+    def build(self, db: Session) -> None:
+        rows = db.query(models.Product.id, models.Product.title, models.Product.description).all()
+        with self._lock:
+            self._postings.clear()
+            self._tokens.clear()
+            for row in rows:
+                self._add(row.id, row.title, row.description)
+            self.built = True
+
+    def reset(self) -> None:
+        """Forces a full rebuild on the next search (e.g. after bulk writes)"""
+        with self._lock:
+            self._postings.clear()
+            self._tokens.clear()
+            self.built = False
+
+    def index(self, product_id: int, title: Optional[str], description: Optional[str]) -> None:
+        with self._lock:
+            if self.built:
+                self._remove(product_id)
+                self._add(product_id, title, description)
+
+    def remove(self, product_id: int) -> None:
+        with self._lock:
+            if self.built:
+                self._remove(product_id)
+
+    def search(self, query: str) -> List[int]:
+        """Product ids containing every query term, best score first"""
+        terms = tokenize(query)
+        if not terms:
+            return []
+        with self._lock:
+            scores: Optional[Dict[int, int]] = None
+            for term in terms:
+                postings = self._postings.get(term, {})
+                if scores is None:
+                    scores = dict(postings)
+                else:
+                    scores = {pid: score + postings[pid] for pid, score in scores.items() if pid in postings}
+                if not scores:
+                    return []
+        return sorted(scores, key=lambda pid: (-scores[pid], pid))
+
+    def _add(self, product_id: int, title: Optional[str], description: Optional[str]) -> None:
+        weights: Dict[str, int] = defaultdict(int)
+        for token in tokenize(title):
+            weights[token] += TITLE_WEIGHT
+        for token in tokenize(description):
+            weights[token] += DESCRIPTION_WEIGHT
+        for token, weight in weights.items():
+            self._postings[token][product_id] = weight
+        self._tokens[product_id] = set(weights)
+
+    def _remove(self, product_id: int) -> None:
+        for token in self._tokens.pop(product_id, ()):
+            postings = self._postings.get(token)
+            if postings is not None:
+                postings.pop(product_id, None)
+                if not postings:
+                    del self._postings[token]
+
+
+local_index = InMemorySearchIndex()
+
+
+def search_product_ids(db: Session, query: str, limit: int, skip: int = 0) -> List[int]:
+    """Ranked ids of products matching ``query``"""
+    if db.get_bind().dialect.name == "postgresql":
+        rows = db.execute(
+            text(
+                f"SELECT products.id FROM products, websearch_to_tsquery('{SEARCH_CONFIG}'::regconfig, :q) AS query "
+                f"WHERE ({SEARCH_DOCUMENT_SQL}) @@ query "
+                f"ORDER BY ts_rank_cd({SEARCH_DOCUMENT_SQL}, query) DESC, products.id "
+                "LIMIT :limit OFFSET :skip"
+            ),
+            {"q": query, "limit": limit, "skip": skip},
+        )
+        return [row.id for row in rows]
+
+    if not local_index.built:
+        local_index.build(db)
+    return local_index.search(query)[skip:skip + limit]
+
+
+# Keep the in-process index in sync with committed product writes.
+
+@event.listens_for(models.Product, "after_insert")
+@event.listens_for(models.Product, "after_update")
+def _queue_index(mapper, connection, target):
+    session = Session.object_session(target)
+    if session is not None:
+        session.info.setdefault("search_pending", {})[target.id] = (target.title, target.description)
+
+
+@event.listens_for(models.Product, "after_delete")
+def _queue_remove(mapper, connection, target):
+    session = Session.object_session(target)
+    if session is not None:
+        session.info.setdefault("search_pending", {})[target.id] = None
+
+
+@event.listens_for(Session, "after_commit")
+def _apply_pending(session):
+    pending = session.info.pop("search_pending", None)
+    for product_id, document in (pending or {}).items():
+        if document is None:
+            local_index.remove(product_id)
+        else:
+            local_index.index(product_id, *document)
+
+
+@event.listens_for(Session, "after_rollback")
+def _discard_pending(session):
+    session.info.pop("search_pending", None)
@@ -0,0 +1,88 @@
+"""
+Startup timing report.
+
+main.py records how long its imports and router registration take; the
+lifespan hook then runs the warm-up (OpenAPI schema build, first database
+connection and, with DB_PREWARM_CONNECTIONS > 0, opening that many pooled
+connections up front) and records each phase. The report is logged once
+warm-up finishes and served at /health/startup.
+
+For a per-module import breakdown run ``python -X importtime -c "import main"``.
+"""
+
+import logging
+import os
+import time
+from contextlib import contextmanager
+from typing import Dict, Optional
+
+from sqlalchemy import text
+from sqlalchemy.engine import Engine
+
+DB_PREWARM_CONNECTIONS = int(os.getenv("DB_PREWARM_CONNECTIONS", "0"))
+
+logger = logging.getLogger(__name__)
+
+
+class StartupReport:
+    def __init__(self):
+        self.started = time.perf_counter()
+        self.phases: Dict[str, float] = {}
+        self.errors: Dict[str, str] = {}
+        self.total: Optional[float] = None
+
+    def record(self, name: str, seconds: float) -> None:
+        self.phases[name] = round(seconds, 4)
+
+    @contextmanager
+    def phase(self, name: str):
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.record(name, time.perf_counter() - start)
+
+    def finish(self) -> None:
+        """Marks the worker as warmed up and logs the report"""
+        self.total = round(time.perf_counter() - self.started, 4)
+        logger.info("startup finished in %.3fs: %s", self.total, self.phases)
+
+    def as_dict(self) -> dict:
+        return {"phases": dict(self.phases), "errors": dict(self.errors), "total_seconds": self.total}
+
+
+report = StartupReport()
+
+
+def prewarm_pool(engine: Engine, count: int) -> int:
+    """Opens up to ``count`` connections at once and returns them to the pool; returns how many"""
+    pool_size = getattr(engine.pool, "size", None)
+    if callable(pool_size):
+        count = min(count, pool_size())  # overflow connections are closed on checkin
+    connections = []
+    try:
+        for _ in range(count):
+            connections.append(engine.connect())
+    finally:
+        for connection in connections:
+            connection.close()
+    return len(connections)
+
+
+def warm_up(app, engine: Engine, prewarm_connections: int = DB_PREWARM_CONNECTIONS) -> None:
+    """Runs once per worker from the lifespan hook, before requests are served"""
+    with report.phase("schema_build"):
+        app.openapi()
+    try:
+        with report.phase("db_connect"):
+            with engine.connect() as connection:
+                connection.execute(text("SELECT 1"))
+        if prewarm_connections > 0:
+            with report.phase("pool_prewarm"):
+                prewarm_pool(engine, prewarm_connections)
+    except Exception as e:
+        # keep starting; requests that need the database fail until it is reachable.
+        # /health/startup is public, so the details (host, driver message) stay in the log
+        report.errors["db_connect"] = "unavailable"
+        logger.warning("database not reachable during warm-up: %s", e)
+    report.finish()
@@ -0,0 +1,138 @@
+"""
+Streaming helpers for bulk import/export and streamed admin listings.
+
+Uploads are read record by record from the spooled upload file, and exports
+are produced row by row from a server-side cursor, so neither side holds the
+whole data set in memory.
+
+Export generators run after the request's dependencies have been torn down
+(the get_db session is already closed while the body is streamed), so they
+open their own session with stream_session().
+"""
+
+import csv
+import io
+import json
+from contextlib import contextmanager
+from datetime import date, datetime
+from enum import Enum
+from itertools import islice
+from typing import Any, Dict, Iterable, Iterator, List, Optional, Sequence, Tuple
+
+from fastapi import HTTPException
+from fastapi.responses import StreamingResponse
+
+from database import SessionLocal
+
+FORMATS = ("ndjson", "csv")
+MEDIA_TYPES = {"ndjson": "application/x-ndjson", "csv": "text/csv; charset=utf-8"}
+
+STREAM_BATCH_SIZE = 1000  # rows fetched per round trip and written per chunk
+
+# OpenAPI: extra response content types of endpoints that can stream
+STREAM_RESPONSES = {200: {"content": {"application/x-ndjson": {}, "text/csv": {}}}}
+
+
+def detect_format(requested: Optional[str], filename: Optional[str] = None) -> str:
+    """Explicit ``format`` parameter, else the upload's file extension"""
+    fmt = (requested or "").lower()
+    if not fmt and filename:
+        fmt = {".csv": "csv", ".ndjson": "ndjson", ".jsonl": "ndjson"}.get(
+            filename[filename.rfind("."):].lower() if "." in filename else "", ""
+        )
+    if fmt not in FORMATS:
+        raise HTTPException(status_code=400, detail=f"Unsupported format; use one of: {', '.join(FORMATS)}")
+    return fmt
+
+
+def read_records(binary_file, fmt: str) -> Iterator[Tuple[int, Any]]:
+    """
+    Yields (line number, record) from a CSV (with header) or NDJSON file.
+    CSV empty cells become None. Unparseable NDJSON lines yield a ValueError
+    as the record so the caller can report them alongside validation errors.
+    """
+    text = io.TextIOWrapper(binary_file, encoding="utf-8-sig", newline="")
+    try:
+        if fmt == "csv":
+            reader = csv.DictReader(text)
+            for row in reader:
+                yield reader.line_num, {key: (value if value != "" else None) for key, value in row.items()}
+        else:
+            for line_number, line in enumerate(text, start=1):
+                if not line.strip():
+                    continue
+                try:
+                    yield line_number, json.loads(line)
+                except ValueError as e:
+                    yield line_number, ValueError(f"Invalid JSON: {e}")
+    finally:
+        text.detach()  # leave the upload file open for its owner
+
+
+def chunked(iterable: Iterable, size: int) -> Iterator[List]:
+    iterator = iter(iterable)
+    while True:
+        chunk = list(islice(iterator, size))
+        if not chunk:
+            return
+        yield chunk
+
+
+@contextmanager
+def stream_session():
+    db = SessionLocal()
+    try:
+        yield db
+    finally:
+        db.close()
+
+
+def iter_rows(statement) -> Iterator[Dict[str, Any]]:
+    """
+    Rows of a Core select() as dicts, fetched STREAM_BATCH_SIZE at a time
+    through a server-side cursor (stream_results) in a session of its own.
+    """
+    with stream_session() as db:
+        result = db.execute(statement.execution_options(yield_per=STREAM_BATCH_SIZE))
+        for row in result:
+            yield row._asdict()
+
+
+def _plain(value):
+    if isinstance(value, Enum):
+        return value.value
+    if isinstance(value, (datetime, date)):
+        return value.isoformat()
+    return value
+
+
+def _ndjson_chunks(rows: Iterable[Dict[str, Any]]) -> Iterator[bytes]:
+    for batch in chunked(rows, STREAM_BATCH_SIZE):
+        yield "".join(
+            json.dumps({key: _plain(value) for key, value in row.items()}, ensure_ascii=False) + "\n"
+            for row in batch
+        ).encode("utf-8")
+
+
+def _csv_chunks(rows: Iterable[Dict[str, Any]], fieldnames: Sequence[str]) -> Iterator[bytes]:
+    buffer = io.StringIO()
+    writer = csv.DictWriter(buffer, fieldnames=fieldnames, extrasaction="ignore")
+    writer.writeheader()
+    for batch in chunked(rows, STREAM_BATCH_SIZE):
+        for row in batch:
+            writer.writerow({key: _plain(value) for key, value in row.items()})
+        yield buffer.getvalue().encode("utf-8")
+        buffer.seek(0)
+        buffer.truncate()
+    if buffer.tell():
+        yield buffer.getvalue().encode("utf-8")
+
+
+def stream_rows(rows: Iterable[Dict[str, Any]], fmt: str, fieldnames: Sequence[str], filename: str) -> StreamingResponse:
+    """StreamingResponse writing ``rows`` (dicts, consumed lazily) as NDJSON or CSV"""
+    body = _csv_chunks(rows, fieldnames) if fmt == "csv" else _ndjson_chunks(rows)
+    return StreamingResponse(
+        body,
+        media_type=MEDIA_TYPES[fmt],
+        headers={"Content-Disposition": f'attachment; filename="{filename}.{fmt}"'},
+    )
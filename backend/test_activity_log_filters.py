@@ -0,0 +1,40 @@
+from datetime import datetime, timedelta, timezone
+
+import models
+from conftest import auth_headers, create_user
+
+
+def _seed_logs(db):
+    base = datetime(2026, 1, 1, tzinfo=timezone.utc)
+    db.add_all([
+        models.ActivityLog(action="LOGIN", username="maria", timestamp=base),
+        models.ActivityLog(action="UPDATE", username="mario", resource="product", resource_id=7,
+                           details="Preço alterado para 100%", timestamp=base + timedelta(days=1)),
+        models.ActivityLog(action="UPDATE", username="ana", resource="product", resource_id=8,
+                           details="Estoque ajustado", timestamp=base + timedelta(days=2)),
+    ])
+    db.commit()
+
+
+def _usernames(client, admin, query):
+    response = client.get(f"/auth/logs?{query}", headers=auth_headers(admin))
+    assert response.status_code == 200, response.text
+    return [log["username"] for log in response.json()]
+
+
+def test_activity_log_filters(client, db):
+    admin = create_user(db, "admin", role=models.UserRole.ADMIN)
+    _seed_logs(db)
+
+    assert _usernames(client, admin, "since=2026-01-02T00:00:00Z") == ["ana", "mario"]
+    assert _usernames(client, admin, "since=2026-01-01T00:00:00Z&until=2026-01-02T00:00:00Z") == ["maria"]
+    assert _usernames(client, admin, "resource=product&resource_id=7") == ["mario"]
+    assert _usernames(client, admin, "details=estoque") == ["ana"]
+    # LIKE wildcards in the term are matched literally
+    assert _usernames(client, admin, "details=100%25") == ["mario"]
+    assert _usernames(client, admin, "details=_") == []
+    # usernames match as a substring whatever the term length
+    assert _usernames(client, admin, "username=ma") == ["mario", "maria"]
+    assert _usernames(client, admin, "username=na") == ["ana"]
+    assert _usernames(client, admin, "username=o") == ["mario"]
+    assert _usernames(client, admin, "username=ARI") == ["mario", "maria"]
@@ -0,0 +1,119 @@
+import threading
+import time
+
+import activity_log
+import auth
+import models
+from database import SessionLocal
+
+
+def _writer(session_factory=SessionLocal, **options) -> activity_log.ActivityLogWriter:
+    settings = dict(batch_size=100, flush_interval=60, max_queue_size=100, enqueue_timeout=0.05, retry_delay=0)
+    settings.update(options)
+    return activity_log.ActivityLogWriter(session_factory=session_factory, **settings)
+
+
+def _entry(action: str = "TEST") -> dict:
+    return {"action": action, "username": "maria"}
+
+
+def _count(db, action: str = "TEST") -> int:
+    db.expire_all()
+    return db.query(models.ActivityLog).filter(models.ActivityLog.action == action).count()
+
+
+def _wait_for(condition, timeout: float = 2.0) -> bool:
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        if condition():
+            return True
+        time.sleep(0.01)
+    return condition()
+
+
+def test_flushes_when_batch_is_full(db):
+    writer = _writer(batch_size=3)
+    try:
+        for _ in range(3):
+            assert writer.enqueue(_entry())
+        assert _wait_for(lambda: _count(db) == 3)
+
+        writer.enqueue(_entry())
+        time.sleep(0.2)
+        assert _count(db) == 3  # partial batch waits for the interval
+    finally:
+        writer.stop()
+    assert _count(db) == 4
+
+
+def test_flushes_partial_batch_after_interval(db):
+    writer = _writer(flush_interval=0.1)
+    try:
+        writer.enqueue(_entry())
+        assert _wait_for(lambda: _count(db) == 1)
+    finally:
+        writer.stop()
+
+
+def test_stop_flushes_and_later_entries_are_refused(db):
+    writer = _writer()
+    for _ in range(5):
+        writer.enqueue(_entry())
+    writer.stop()
+    assert _count(db) == 5
+
+    assert writer.enqueue(_entry()) is False  # caller writes it synchronously
+    assert writer._thread is None
+
+
+def test_full_queue_falls_back_to_synchronous_write(db, monkeypatch):
+    release = threading.Event()
+
+    def slow_session():
+        release.wait(5)
+        return SessionLocal()
+
+    writer = _writer(session_factory=slow_session, batch_size=1, max_queue_size=1, enqueue_timeout=0.5)
+    monkeypatch.setattr(activity_log, "writer", writer)
+    try:
+        for action in ("FIRST", "SECOND", "THIRD"):  # FIRST blocks the thread, SECOND fills the queue
+            auth.log_activity(db, user_id=None, username="maria", action=action)
+        assert _count(db, "THIRD") == 1  # written on the request's session
+        assert _count(db, "FIRST") == 0
+    finally:
+        release.set()
+        writer.stop()
+    assert _count(db, "FIRST") == _count(db, "SECOND") == 1
+
+
+def _failing_session(failures: dict):
+    """Session factory whose INSERTs fail while failures["left"] > 0 (None: always)"""
+    def factory():
+        db = SessionLocal()
+        execute = db.execute
+
+        def flaky_execute(*args, **kwargs):
+            if failures["left"] is None or failures["left"] > 0:
+                if failures["left"] is not None:
+                    failures["left"] -= 1
+                raise RuntimeError("database unavailable")
+            return execute(*args, **kwargs)
+
+        db.execute = flaky_execute
+        return db
+    return factory
+
+
+def test_failed_batches_are_retried_then_counted_as_dropped(db):
+    writer = _writer(session_factory=_failing_session({"left": 2}), retries=3)
+    writer.enqueue(_entry())
+    writer.stop()
+    assert _count(db) == 1
+    assert writer.dropped == 0
+
+    writer = _writer(session_factory=_failing_session({"left": None}), retries=1)
+    writer.enqueue(_entry())
+    writer.enqueue(_entry())
+    writer.stop()
+    assert writer.dropped == 2
+    assert _count(db) == 1
@@ -0,0 +1,97 @@
+import pytest
+
+import cache
+import models
+from conftest import auth_headers, create_category, create_product, create_user, max_queries
+
+
+class FakeRedis:
+    """Local stand-in for redis.Redis covering the commands ResponseCache uses"""
+
+    def __init__(self):
+        self.data = {}
+
+    def get(self, name):
+        return self.data.get(name)
+
+    def set(self, name, value, ex=None):
+        self.data[name] = value if isinstance(value, bytes) else str(value).encode()
+        return True
+
+    def delete(self, *names):
+        return sum(self.data.pop(name, None) is not None for name in names)
+
+    def incr(self, name, amount=1):
+        value = int(self.data.get(name, b"0")) + amount
+        self.data[name] = str(value).encode()
+        return value
+
+
+@pytest.fixture(params=["memory", "redis"])
+def catalog_cache(request, monkeypatch):
+    backend = FakeRedis() if request.param == "redis" else cache.create_backend("memory")
+    monkeypatch.setattr(cache.catalog_cache, "backend", backend)
+    return cache.catalog_cache
+
+
+def _seed(db):
+    category = create_category(db)
+    return category, create_product(db, category, "Deep Learning", price=50.0, stock_quantity=5)
+
+
+def test_catalog_reads_are_served_from_cache(client, db, catalog_cache):
+    _, product = _seed(db)
+    listing = client.get("/products/?limit=10")
+    detail = client.get(f"/products/{product.id}")
+    categories = client.get("/categories/")
+
+    with max_queries(0):
+        assert client.get("/products/?limit=10").json() == listing.json()
+        assert client.get(f"/products/{product.id}").json() == detail.json()
+        assert client.get("/categories/").json() == categories.json()
+
+    # different query params are cached separately
+    assert client.get("/products/?limit=10&category_id=999").json() == []
+
+
+def test_writes_and_checkout_invalidate_catalog(client, db, catalog_cache):
+    category, product = _seed(db)
+    admin = create_user(db, "admin", role=models.UserRole.ADMIN)
+    headers = auth_headers(admin)
+    assert client.get("/products/").json()[0]["stock_quantity"] == 5
+    assert client.get("/categories/").json()[0]["name"] == "IA"
+
+    client.post(
+        "/orders/checkout",
+        json={"items": [{"product_id": product.id, "quantity": 2}], "delivery_type": "PICKUP"},
+        headers=headers,
+    )
+    assert client.get("/products/").json()[0]["stock_quantity"] == 3
+
+    client.put(f"/categories/{category.id}", json={"name": "Machine Learning"}, headers=headers)
+    assert client.get("/categories/").json()[0]["name"] == "Machine Learning"
+    assert client.get("/products/").json()[0]["category"]["name"] == "Machine Learning"
+
+    client.delete(f"/products/{product.id}", headers=headers)
+    assert client.get("/products/").json() == []
+
+
+def test_response_computed_during_invalidation_is_not_served(catalog_cache):
+    # a slow request misses under the current version...
+    key = catalog_cache.key("products", limit=10)
+    assert catalog_cache.get(key) is None
+    # ...a write invalidates the namespace while it reads the database...
+    catalog_cache.invalidate("products")
+    # ...and its stale body lands under the old version, which is never looked up again
+    catalog_cache.set(key, b"[]", {})
+    assert catalog_cache.get(catalog_cache.key("products", limit=10)) is None
+
+    fresh = catalog_cache.key("products", limit=10)
+    catalog_cache.set(fresh, b"[1]", {})
+    assert catalog_cache.get(catalog_cache.key("products", limit=10)) == (b"[1]", {})
+
+
+def test_memory_backend_ttl_is_capped_with_several_workers():
+    assert cache.effective_ttl("memory", 60, workers=1) == 60
+    assert cache.effective_ttl("memory", 60, workers=4) == cache.MEMORY_CACHE_MULTI_WORKER_MAX_TTL
+    assert cache.effective_ttl("redis", 60, workers=4) == 60
@@ -0,0 +1,80 @@
+from sqlalchemy import event
+
+import catalog_projection
+import models
+from conftest import auth_headers, create_category, create_user, max_queries
+
+
+def _product(client, admin, category, title, stock=5):
+    response = client.post(
+        "/products/",
+        json={"title": title, "description": "-", "price": 10.0, "stock_quantity": stock, "category_id": category.id},
+        headers=auth_headers(admin),
+    )
+    assert response.status_code == 200, response.text
+    return response.json()
+
+
+def test_projection_follows_product_category_and_stock_writes(client, db):
+    category = create_category(db)
+    admin = create_user(db, "admin", role=models.UserRole.ADMIN)
+    first = _product(client, admin, category, "Redes Neurais")
+    second = _product(client, admin, category, "Visão Computacional")
+    assert client.get("/products/").json() == [first, second]
+
+    response = client.put(
+        f"/products/{first['id']}",
+        json={"title": "Redes Neurais 2", "description": "-", "price": 12.0, "category_id": category.id},
+        headers=auth_headers(admin),
+    )
+    assert client.get(f"/products/{first['id']}").json() == response.json()
+
+    client.put(f"/categories/{category.id}", json={"name": "Inteligência Artificial"}, headers=auth_headers(admin))
+    assert {p["category"]["name"] for p in client.get("/products/").json()} == {"Inteligência Artificial"}
+
+    buyer = create_user(db, "cliente")
+    response = client.post(
+        "/orders/checkout",
+        json={"items": [{"product_id": second["id"], "quantity": 2}], "delivery_type": "PICKUP"},
+        headers=auth_headers(buyer),
+    )
+    assert response.status_code == 200, response.text
+    assert client.get(f"/products/{second['id']}").json()["stock_quantity"] == 3
+
+    client.delete(f"/products/{first['id']}", headers=auth_headers(admin))
+    assert [p["id"] for p in client.get("/products/").json()] == [second["id"]]
+    assert client.get(f"/products/{first['id']}").status_code == 404
+
+
+def test_failed_write_leaves_projection_untouched(db):
+    category = create_category(db)
+    db.add(models.Product(title="A", description="-", price=1.0, category_id=category.id))
+    db.flush()
+    db.rollback()
+    db.commit()
+    assert db.query(models.CatalogEntry).count() == 0
+
+
+def test_listing_reads_the_projection_without_loading_products(client, db):
+    category = create_category(db)
+    admin = create_user(db, "admin", role=models.UserRole.ADMIN)
+    for index in range(5):
+        _product(client, admin, category, f"Produto {index}")
+    db.query(models.CatalogEntry).delete()
+    db.commit()
+    assert catalog_projection.is_empty(db)  # as migration 0005 leaves it
+    assert catalog_projection.rebuild(db) == 5
+    db.commit()
+    assert not catalog_projection.is_empty(db)
+
+    loaded = []
+    listener = lambda target, context: loaded.append(target)  # noqa: E731
+    event.listen(models.Product, "load", listener)
+    try:
+        with max_queries(1):
+            response = client.get("/products/?limit=100")
+    finally:
+        event.remove(models.Product, "load", listener)
+
+    assert [p["title"] for p in response.json()] == [f"Produto {index}" for index in range(5)]
+    assert loaded == []
@@ -0,0 +1,86 @@
+"""
+Concurrency stress test for checkout.
+
+Many buyers hit the same hot SKUs at once, with carts listing the products in
+different orders and with repeated lines. Checkout must never deadlock, oversell
+or fail with a 500; every unit sold must be accounted for in order_items.
+Run against PostgreSQL (TEST_DATABASE_URL) to exercise real row locks.
+"""
+
+import random
+from concurrent.futures import ThreadPoolExecutor
+
+from sqlalchemy import func
+
+import models
+from conftest import auth_headers, create_category, create_product, create_user
+
+BUYERS = 40
+INITIAL_STOCK = 25
+
+
+def _seed_products(db, count: int = 3):
+    category = create_category(db)
+    return [
+        create_product(db, category, f"Livro {i}", price=10.0 + i, description="Hot SKU", stock_quantity=INITIAL_STOCK).id
+        for i in range(count)
+    ]
+
+
+def test_parallel_checkouts_on_hot_skus(client, db):
+    product_ids = _seed_products(db)
+    buyers = [create_user(db, f"buyer{i}") for i in range(BUYERS)]
+    rng = random.Random(42)
+    carts = []
+    for user in buyers:
+        items = [{"product_id": pid, "quantity": 1} for pid in product_ids]
+        items.append({"product_id": rng.choice(product_ids), "quantity": 1})  # duplicated line
+        rng.shuffle(items)
+        carts.append((user, items))
+
+    def buy(cart):
+        user, items = cart
+        return client.post(
+            "/orders/checkout",
+            json={"items": items, "delivery_type": "PICKUP"},
+            headers=auth_headers(user),
+        )
+
+    with ThreadPoolExecutor(max_workers=8) as pool:
+        responses = list(pool.map(buy, carts))
+
+    statuses = [r.status_code for r in responses]
+    assert all(code in (200, 400, 409) for code in statuses), statuses
+    assert statuses.count(200) > 0
+
+    db.expire_all()
+    for pid in product_ids:
+        product = db.get(models.Product, pid)
+        sold = (
+            db.query(func.coalesce(func.sum(models.OrderItem.quantity), 0))
+            .filter(models.OrderItem.product_id == pid)
+            .scalar()
+        )
+        assert product.stock_quantity >= 0
+        assert product.stock_quantity + sold == INITIAL_STOCK
+
+    # repeated lines are merged into a single order item per product
+    for response in responses:
+        if response.status_code == 200:
+            order_id = response.json()["order_id"]
+            lines = db.query(models.OrderItem).filter(models.OrderItem.order_id == order_id).all()
+            assert len(lines) == len({line.product_id for line in lines}) == len(product_ids)
+
+
+def test_checkout_rejects_non_positive_quantity(client, db):
+    product_ids = _seed_products(db, count=1)
+    user = create_user(db, "buyer")
+
+    response = client.post(
+        "/orders/checkout",
+        json={"items": [{"product_id": product_ids[0], "quantity": 0}], "delivery_type": "PICKUP"},
+        headers=auth_headers(user),
+    )
+
+    assert response.status_code == 400
+    assert db.get(models.Product, product_ids[0]).stock_quantity == INITIAL_STOCK
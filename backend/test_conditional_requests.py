@@ -0,0 +1,94 @@
+from datetime import datetime, timezone
+
+import pytest
+
+import cache
+import models
+from conftest import auth_headers, create_user
+
+
+@pytest.fixture(params=["cached", "uncached"])
+def catalog(request, db, monkeypatch):
+    if request.param == "uncached":
+        monkeypatch.setattr(cache.catalog_cache, "backend", None)
+    category = models.Category(name="IA")
+    db.add(category)
+    db.flush()
+    product = models.Product(
+        title="Deep Learning",
+        description="-",
+        price=50.0,
+        category_id=category.id,
+        created_at=datetime(2026, 1, 1, tzinfo=timezone.utc),
+    )
+    db.add(product)
+    db.commit()
+    return category, product
+
+
+def test_product_not_modified(client, catalog):
+    _, product = catalog
+    first = client.get(f"/products/{product.id}")
+    assert first.status_code == 200
+    assert first.headers["ETag"].startswith('W/"')
+    assert first.headers["Last-Modified"] == "Thu, 01 Jan 2026 00:00:00 GMT"
+
+    by_etag = client.get(f"/products/{product.id}", headers={"If-None-Match": first.headers["ETag"]})
+    assert by_etag.status_code == 304
+    assert by_etag.content == b""
+    assert by_etag.headers["ETag"] == first.headers["ETag"]
+
+    by_date = client.get(f"/products/{product.id}", headers={"If-Modified-Since": first.headers["Last-Modified"]})
+    assert by_date.status_code == 304
+
+    older = client.get(f"/products/{product.id}", headers={"If-Modified-Since": "Wed, 31 Dec 2025 00:00:00 GMT"})
+    assert older.status_code == 200
+
+
+def test_listing_etag_changes_with_rows(client, db, catalog):
+    category, product = catalog
+    first = client.get("/products/")
+    etag = first.headers["ETag"]
+    assert client.get("/products/", headers={"If-None-Match": etag}).status_code == 304
+    # each page has its own validator
+    assert client.get("/products/?limit=1", headers={"If-None-Match": etag}).status_code == 200
+
+    admin = create_user(db, "admin", role=models.UserRole.ADMIN)
+    client.put(
+        f"/products/{product.id}",
+        json={"title": "Deep Learning 2ed", "description": "-", "price": 60.0, "category_id": category.id},
+        headers=auth_headers(admin),
+    )
+
+    changed = client.get("/products/", headers={"If-None-Match": etag})
+    assert changed.status_code == 200
+    assert changed.headers["ETag"] != etag
+    assert changed.json()[0]["title"] == "Deep Learning 2ed"
+
+
+def test_listing_revalidates_after_a_deletion(client, db, catalog):
+    category, product = catalog
+    db.add(
+        models.Product(
+            title="Older",
+            description="-",
+            price=10.0,
+            category_id=category.id,
+            created_at=datetime(2025, 6, 1, tzinfo=timezone.utc),
+        )
+    )
+    db.commit()
+    first = client.get("/products/")
+    assert len(first.json()) == 2
+    # the newest row survives the deletion, so a date validator would wrongly match
+    assert "Last-Modified" not in first.headers
+
+    admin = create_user(db, "admin", role=models.UserRole.ADMIN)
+    older_id = next(p["id"] for p in first.json() if p["title"] == "Older")
+    assert client.delete(f"/products/{older_id}", headers=auth_headers(admin)).status_code == 204
+
+    by_date = client.get("/products/", headers={"If-Modified-Since": "Thu, 01 Jan 2026 00:00:00 GMT"})
+    assert by_date.status_code == 200
+    assert [p["id"] for p in by_date.json()] == [product.id]
+    by_etag = client.get("/products/", headers={"If-None-Match": first.headers["ETag"]})
+    assert by_etag.status_code == 200
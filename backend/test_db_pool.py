@@ -0,0 +1,76 @@
+import json
+import os
+import subprocess
+import sys
+
+import pytest
+from sqlalchemy import create_engine, exc
+
+import database
+
+BACKEND_DIR = os.path.dirname(os.path.abspath(__file__))
+
+_REPORT_ENGINE = """
+import json, database
+pool = database.engine.pool
+options = database._engine_options("postgresql+psycopg2://user:password@db:5432/compia")
+print(json.dumps({
+    "pool": type(pool).__name__,
+    "size": pool.size(),
+    "max_overflow": pool._max_overflow,
+    "timeout": pool._timeout,
+    "recycle": pool._recycle,
+    "pre_ping": pool._pre_ping,
+    "connect_args": options["connect_args"],
+}))
+"""
+
+
+def test_pool_settings_reach_the_engine(tmp_path):
+    env = dict(
+        os.environ,
+        DATABASE_URL=f"sqlite:///{tmp_path / 'pool.db'}",
+        DB_POOL_SIZE="3",
+        DB_MAX_OVERFLOW="2",
+        DB_POOL_TIMEOUT="1.5",
+        DB_POOL_RECYCLE="60",
+        DB_POOL_PRE_PING="false",
+        DB_STATEMENT_TIMEOUT_MS="500",
+        DB_CONNECT_TIMEOUT="7",
+    )
+    result = subprocess.run(
+        [sys.executable, "-c", _REPORT_ENGINE], cwd=BACKEND_DIR, env=env, capture_output=True, text=True, timeout=60
+    )
+    assert result.returncode == 0, result.stderr
+
+    report = json.loads(result.stdout.strip().splitlines()[-1])
+    assert report == {
+        "pool": "InstrumentedQueuePool",
+        "size": 3,
+        "max_overflow": 2,
+        "timeout": 1.5,
+        "recycle": 60,
+        "pre_ping": False,
+        "connect_args": {"options": "-c statement_timeout=500", "connect_timeout": 7},
+    }
+
+
+def test_checkout_timeout_is_counted_and_reported(client):
+    small = create_engine(
+        database.engine.url,
+        poolclass=database.InstrumentedQueuePool,
+        pool_size=1,
+        max_overflow=0,
+        pool_timeout=0.1,
+    )
+    before = client.get("/health/pool").json()["checkout_timeouts"]
+    try:
+        with small.connect():
+            with pytest.raises(exc.TimeoutError):
+                small.connect()
+    finally:
+        small.dispose()
+
+    stats = client.get("/health/pool").json()
+    assert stats["checkout_timeouts"] == before + 1
+    assert stats["checkout_wait_seconds_max"] >= 0.1
@@ -0,0 +1,77 @@
+from datetime import datetime, timedelta, timezone
+
+import fast_json
+import models
+from conftest import auth_headers, create_user
+
+
+def _get_both(client, monkeypatch, url, headers):
+    """The same request through the Pydantic path and the fast path"""
+    monkeypatch.setattr(fast_json, "FAST_JSON_RESPONSES", False)
+    default = client.get(url, headers=headers)
+    monkeypatch.setattr(fast_json, "FAST_JSON_RESPONSES", True)
+    fast = client.get(url, headers=headers)
+    assert default.status_code == fast.status_code == 200, fast.text
+    return default, fast
+
+
+def test_fast_path_returns_the_same_listings(client, db, monkeypatch):
+    admin = create_user(db, "admin", role=models.UserRole.ADMIN)
+    for i in range(3):
+        create_user(db, f"user{i}")
+    base = datetime(2026, 1, 1, 12, 30, 15, 123456, tzinfo=timezone.utc)
+    db.add_all(
+        models.ActivityLog(action="LOGIN", username="joão", details='{"ip": "10.0.0.1"}', timestamp=base + timedelta(minutes=i))
+        for i in range(5)
+    )
+    db.commit()
+    headers = auth_headers(admin)
+
+    for url in ("/auth/users?limit=2", "/auth/logs?limit=3", "/auth/logs?action=LOGIN"):
+        default, fast = _get_both(client, monkeypatch, url, headers)
+        assert fast.content == default.content
+        assert fast.headers.get("X-Next-Cursor") == default.headers.get("X-Next-Cursor")
+
+
+def test_fast_path_returns_the_same_orders(client, db, monkeypatch):
+    category = models.Category(name="IA")
+    db.add(category)
+    db.commit()
+    products = [
+        models.Product(title=f"Livro {i}", description="-", price=10.5 + i, stock_quantity=10, category_id=category.id)
+        for i in range(2)
+    ]
+    db.add_all(products)
+    db.commit()
+    user = create_user(db, "cliente")
+    headers = auth_headers(user)
+    address = {"street": "Rua A", "number": "1", "neighborhood": "Centro", "city": "Maceió", "state": "AL", "zip": "57000-000"}
+    for delivery in ("PICKUP", "SHIPPING"):
+        response = client.post(
+            "/orders/checkout",
+            json={
+                "items": [{"product_id": p.id, "quantity": 2} for p in products],
+                "delivery_type": delivery,
+                "shipping_address": address if delivery == "SHIPPING" else None,
+            },
+            headers=headers,
+        )
+        assert response.status_code == 200, response.text
+    order_id = response.json()["order_id"]
+
+    for url in ("/orders/", "/orders/?limit=1", f"/orders/{order_id}"):
+        default, fast = _get_both(client, monkeypatch, url, headers)
+        assert fast.json() == default.json()
+        assert fast.headers.get("X-Next-Cursor") == default.headers.get("X-Next-Cursor")
+
+    other = create_user(db, "outro")
+    assert client.get(f"/orders/{order_id}", headers=auth_headers(other)).status_code == 403
+
+
+def test_encoders_match_pydantic_without_orjson(monkeypatch):
+    row = ("ADMIN", datetime(2026, 1, 1, tzinfo=timezone.utc), datetime(2026, 1, 1, 8), "ação", 1.0)
+    fields = ("role", "utc", "naive", "text", "price")
+    encoded = fast_json.encode_rows([row], fields)
+    monkeypatch.setattr(fast_json, "orjson", None)
+    assert fast_json.encode_rows([row], fields) == encoded
+    assert encoded == '[{"role":"ADMIN","utc":"2026-01-01T00:00:00Z","naive":"2026-01-01T08:00:00","text":"ação","price":1.0}]'.encode("utf-8")
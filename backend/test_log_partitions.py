@@ -0,0 +1,80 @@
+import importlib.util
+import os
+from datetime import date, datetime, timezone
+
+import pytest
+from alembic.migration import MigrationContext
+from alembic.operations import Operations
+from sqlalchemy import text
+
+import log_partitions
+import models
+from database import engine
+from log_partitions import add_months, create_partition_sql, expired_months, partition_month, partition_name
+
+
+def test_month_arithmetic_and_names():
+    assert add_months(date(2026, 11, 1), 2) == date(2027, 1, 1)
+    assert add_months(date(2026, 1, 1), -1) == date(2025, 12, 1)
+    assert partition_name(date(2026, 3, 1)) == "activity_logs_y2026m03"
+    assert partition_month("activity_logs_y2026m03") == date(2026, 3, 1)
+    assert partition_month("activity_logs_default") is None
+
+
+def test_partition_bounds_cover_one_month():
+    statements = create_partition_sql(date(2026, 12, 1))
+    assert "FROM ('2026-12-01 00:00:00+00') TO ('2027-01-01 00:00:00+00')" in statements[-1]
+    # rows parked in the DEFAULT partition are moved before ATTACH
+    assert statements[1].startswith("WITH moved AS (DELETE FROM activity_logs_default")
+
+
+def test_expired_months_respects_retention_window():
+    months = [date(2026, m, 1) for m in range(1, 11)]
+    today = date(2026, 10, 17)
+    assert expired_months(months, today, 0) == []
+    assert expired_months(months, today, 6) == [date(2026, m, 1) for m in range(1, 4)]
+
+
+def test_maintenance_is_noop_without_partitioning(db):
+    assert log_partitions.run_maintenance(retention_months=1) == {"created": [], "dropped": [], "purged": 0}
+
+
+def _migration(filename: str):
+    path = os.path.join(os.path.dirname(os.path.abspath(__file__)), "migrations", "versions", filename)
+    spec = importlib.util.spec_from_file_location(filename[:-3], path)
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+    return module
+
+
+@pytest.mark.skipif(engine.dialect.name != "postgresql", reason="partitioning needs TEST_DATABASE_URL on PostgreSQL")
+def test_partition_migration_and_retention_on_postgres(db):
+    old, recent = datetime(2024, 1, 15, tzinfo=timezone.utc), datetime.now(timezone.utc)
+    db.add_all([models.ActivityLog(action="OLD", timestamp=old), models.ActivityLog(action="NEW", timestamp=recent)])
+    db.commit()
+    migration = _migration("0004_partition_activity_logs.py")
+
+    def run(step):
+        with engine.begin() as conn:
+            conn.execute(text("CREATE EXTENSION IF NOT EXISTS pg_trgm"))
+            with Operations.context(MigrationContext.configure(conn)):
+                step()
+
+    run(migration.upgrade)
+    try:
+        with engine.connect() as conn:
+            assert log_partitions.is_partitioned(conn)
+            assert "activity_logs_y2024m01" in log_partitions.existing_partitions(conn)  # back to the oldest row
+            assert conn.execute(text("SELECT count(*) FROM activity_logs")).scalar() == 2
+            assert conn.execute(text("SELECT count(*) FROM activity_logs_default")).scalar() == 0
+            # a late row older than every partition lands in DEFAULT
+            conn.execute(text("INSERT INTO activity_logs (action, timestamp) VALUES ('LATE', '2023-05-01 00:00:00+00')"))
+            conn.commit()
+
+        summary = log_partitions.run_maintenance(retention_months=12)
+        assert "activity_logs_y2024m01" in summary["dropped"]
+        assert summary["purged"] == 1
+        with engine.connect() as conn:
+            assert [row[0] for row in conn.execute(text("SELECT action FROM activity_logs"))] == ["NEW"]
+    finally:
+        run(migration.downgrade)
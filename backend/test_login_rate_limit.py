@@ -0,0 +1,85 @@
+import pytest
+from fastapi.testclient import TestClient
+
+import auth
+import rate_limit
+from conftest import create_user
+from rate_limit import InMemorySlidingWindow, LoginRateLimiter
+
+
+@pytest.fixture()
+def limiter(monkeypatch):
+    limiter = LoginRateLimiter(InMemorySlidingWindow(), per_username=3, per_ip=5, window=60)
+    monkeypatch.setattr("routers.auth.login_limiter", limiter)
+    return limiter
+
+
+def _login(client, username, password="wrong"):
+    return client.post("/auth/login", data={"username": username, "password": password})
+
+
+def test_username_is_throttled_before_password_check(client, db, limiter, monkeypatch):
+    create_user(db, "maria")
+    assert [_login(client, "maria").status_code for _ in range(3)] == [401, 401, 401]
+
+    def fail(*args):
+        raise AssertionError("no lookup or hashing once throttled")
+
+    monkeypatch.setattr(auth, "authenticate_user", fail)
+    rejected = _login(client, "Maria", password="secret")
+    assert rejected.status_code == 429
+    assert 0 < int(rejected.headers["Retry-After"]) <= 60
+
+
+def test_ip_limit_spans_usernames(client, db, limiter):
+    statuses = [_login(client, f"user{i}").status_code for i in range(6)]
+    assert statuses == [401] * 5 + [429]
+
+
+def test_clients_behind_a_trusted_proxy_are_counted_separately(db, limiter, monkeypatch):
+    from main import app
+
+    monkeypatch.setattr(rate_limit, "trusted_proxies", rate_limit.parse_networks("172.16.0.0/12"))
+    with TestClient(app, client=("172.18.0.5", 40000)) as proxy:  # nginx container
+        def login(forwarded_for, username):
+            return proxy.post(
+                "/auth/login",
+                data={"username": username, "password": "wrong"},
+                headers={"X-Forwarded-For": forwarded_for},
+            ).status_code
+
+        # an attacker exhausting its own IP budget does not lock out other clients
+        assert [login("203.0.113.7", f"user{i}") for i in range(6)] == [401] * 5 + [429]
+        assert login("198.51.100.20", "maria") == 401
+        # a spoofed left-most hop is ignored: nginx appends the real peer
+        assert login("198.51.100.20, 203.0.113.7", "maria") == 429
+
+    with TestClient(app, client=("203.0.113.7", 40000)) as direct:  # not a proxy: header ignored
+        response = direct.post(
+            "/auth/login", data={"username": "ana", "password": "wrong"}, headers={"X-Forwarded-For": "192.0.2.1"}
+        )
+        assert response.status_code == 429
+
+
+def test_sliding_window_expires_old_attempts(monkeypatch):
+    clock = [1000.0]
+    monkeypatch.setattr(rate_limit.time, "monotonic", lambda: clock[0])
+    window = InMemorySlidingWindow()
+
+    assert [window.hit("k", 2, 10) for _ in range(2)] == [0, 0]
+    assert window.hit("k", 2, 10) == pytest.approx(10)
+    clock[0] += 4
+    assert window.hit("k", 2, 10) == pytest.approx(6)
+    clock[0] += 6
+    assert window.hit("k", 2, 10) == 0
+
+
+def test_memory_window_stays_bounded_under_distinct_keys():
+    window = InMemorySlidingWindow(max_keys=100)
+    for i in range(1000):  # credential stuffing: every key is still inside its window
+        assert window.hit(f"login:user:victim{i}", limit=1, window=60) == 0
+    assert len(window) == 100
+
+    # the most recently attempted keys are kept and still throttled
+    assert window.hit("login:user:victim999", limit=1, window=60) > 0
+    assert window.hit("login:user:victim0", limit=1, window=60) == 0  # evicted long ago
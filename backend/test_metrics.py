@@ -0,0 +1,61 @@
+import re
+
+from sqlalchemy import exc
+
+import main
+import models
+
+
+def _sample(body: str, name: str, **labels) -> float:
+    """Value of one series in a /metrics body (0 if absent)"""
+    wanted = ",".join(f'{key}="{value}"' for key, value in labels.items())
+    series = f"{name}{{{wanted}}}" if labels else name
+    match = re.search(rf"^{re.escape(series)} (\S+)$", body, re.MULTILINE)
+    return float(match.group(1)) if match else 0.0
+
+
+def test_metrics_per_route_template(client, db):
+    category = models.Category(name="IA")
+    db.add(category)
+    db.flush()
+    product = models.Product(title="Deep Learning", description="-", price=50.0, category_id=category.id)
+    db.add(product)
+    db.commit()
+    route = {"method": "GET", "route": "/products/{product_id}"}
+    before = client.get("/metrics").text
+    for _ in range(3):
+        assert client.get(f"/products/{product.id}").status_code == 200
+    client.get("/does-not-exist")
+
+    body = client.get("/metrics")
+    assert body.headers["content-type"].startswith("text/plain; version=0.0.4")
+    text = body.text
+
+    def delta(name, **labels):
+        return _sample(text, name, **labels) - _sample(before, name, **labels)
+
+    assert delta("http_request_duration_seconds_count", **route) == 3
+    assert delta("http_requests_total", **route, status="200") == 3
+    assert delta("http_requests_total", method="GET", route="unmatched", status="404") == 1
+    assert delta("http_request_db_queries_count", **route) == 3
+    assert _sample(text, "db_query_duration_seconds_count") > 0
+    # queries outside requests are timed by the same hook (once each)
+    db.query(models.Category).count()
+    after = client.get("/metrics").text
+    assert _sample(after, "db_query_duration_seconds_count") - _sample(text, "db_query_duration_seconds_count") == 1
+    assert _sample(text, "http_requests_in_flight") == 1  # the /metrics request itself
+    assert "db_pool_checked_out" in text
+
+
+def test_readiness_checks_the_pool(client, monkeypatch):
+    assert client.get("/health/ready").json()["status"] == "ok"
+
+    class BrokenEngine:
+        def connect(self):
+            raise exc.OperationalError("SELECT 1", {}, Exception("connection refused"))
+
+    monkeypatch.setattr(main, "engine", BrokenEngine())
+    response = client.get("/health/ready")
+    assert response.status_code == 503
+    assert response.json() == {"status": "unavailable", "detail": "database unavailable"}
+    assert "connection refused" not in response.text
@@ -0,0 +1,60 @@
+from datetime import datetime, timedelta, timezone
+
+import models
+from conftest import auth_headers, create_user
+from pagination import NEXT_CURSOR_HEADER
+
+
+def _collect_pages(client, url, headers=None):
+    pages = []
+    response = client.get(url, headers=headers)
+    while True:
+        assert response.status_code == 200, response.text
+        pages.append(response.json())
+        cursor = response.headers.get(NEXT_CURSOR_HEADER)
+        if not cursor:
+            return pages
+        separator = "&" if "?" in url else "?"
+        response = client.get(f"{url}{separator}cursor={cursor}", headers=headers)
+
+
+def test_products_cursor_pagination_is_stable(client, db):
+    category = models.Category(name="IA")
+    db.add(category)
+    db.flush()
+    db.add_all(
+        models.Product(title=f"Livro {i}", description="-", price=1.0, category_id=category.id)
+        for i in range(23)
+    )
+    db.commit()
+
+    pages = _collect_pages(client, "/products/?limit=10")
+
+    assert [len(page) for page in pages] == [10, 10, 3]
+    ids = [product["id"] for page in pages for product in page]
+    assert ids == sorted(ids) and len(set(ids)) == 23
+
+
+def test_activity_logs_cursor_pagination_with_equal_timestamps(client, db):
+    admin = create_user(db, "admin", role=models.UserRole.ADMIN)
+    base = datetime(2026, 1, 1, tzinfo=timezone.utc)
+    # pairs of rows share a timestamp, so the id tie-breaker matters
+    db.add_all(
+        models.ActivityLog(action="LOGIN", username="admin", timestamp=base + timedelta(seconds=i // 2))
+        for i in range(25)
+    )
+    db.commit()
+
+    pages = _collect_pages(client, "/auth/logs?limit=7", headers=auth_headers(admin))
+
+    logs = [log for page in pages for log in page]
+    assert len(logs) == 25
+    assert len({log["id"] for log in logs}) == 25
+    keys = [(log["timestamp"], log["id"]) for log in logs]
+    assert keys == sorted(keys, reverse=True)
+
+
+def test_invalid_cursor_is_rejected(client, db):
+    response = client.get("/products/?cursor=not-a-cursor")
+
+    assert response.status_code == 400
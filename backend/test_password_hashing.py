@@ -0,0 +1,57 @@
+import threading
+import time
+
+import bcrypt
+import models
+import password_hashing
+from conftest import create_user
+from password_hashing import PasswordHasher
+
+
+def test_process_pool_hashes_and_verifies():
+    hasher = PasswordHasher(rounds=4, workers=1, max_concurrency=2)
+    try:
+        hashed = hasher.hash("segredo")
+        assert password_hashing.hash_rounds(hashed) == 4
+        assert hasher.verify("segredo", hashed)
+        assert not hasher.verify("errado", hashed)
+        assert hasher.stats()["completed"] == 3
+    finally:
+        hasher.shutdown()
+
+
+def test_saturated_hasher_sheds_load(client, db, monkeypatch):
+    create_user(db, "maria")
+    release = threading.Event()
+    hasher = PasswordHasher(rounds=4, workers=0, max_concurrency=1)
+    monkeypatch.setattr(password_hashing, "hasher", hasher)
+
+    started = threading.Event()
+    blocker = threading.Thread(target=hasher._run, args=(lambda: started.set() or release.wait(),))
+    blocker.start()
+    started.wait()
+    try:
+        started_at = time.perf_counter()
+        response = client.post("/auth/login", data={"username": "maria", "password": "secret"})
+        elapsed = time.perf_counter() - started_at
+    finally:
+        release.set()
+        blocker.join()
+
+    assert response.status_code == 503
+    assert elapsed < 1  # rejected without waiting for the busy slot
+    assert response.headers["Retry-After"] == "1"
+    assert hasher.stats()["rejected"] == 1
+
+
+def test_login_rehashes_when_cost_changes(client, db, monkeypatch):
+    user = create_user(db, "maria")
+    monkeypatch.setattr(password_hashing.hasher, "rounds", 5)
+
+    response = client.post("/auth/login", data={"username": "maria", "password": "secret"})
+
+    assert response.status_code == 200
+    db.expire_all()
+    stored = db.get(models.User, user.id).hashed_password
+    assert password_hashing.hash_rounds(stored) == 5
+    assert bcrypt.checkpw(b"secret", stored.encode())
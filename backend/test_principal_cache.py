@@ -0,0 +1,63 @@
+"""Principal cache in auth.get_current_user: what it stores and when it is evicted."""
+
+import auth
+import models
+from conftest import auth_headers, create_user, max_queries
+
+
+def _token(user: models.User) -> str:
+    return auth_headers(user)["Authorization"].split()[1]
+
+
+def _prime(client, user: models.User) -> None:
+    assert client.get("/auth/me", headers=auth_headers(user)).status_code == 200
+    assert auth.principal_cache.get(user.username) is not None
+
+
+def test_cached_principal_needs_no_query_and_has_no_password_hash(client, db):
+    user = create_user(db, "cliente")
+    _prime(client, user)
+
+    assert set(auth.principal_cache.get(user.username)) == {"id", "username", "role", "is_active"}
+    with max_queries(0):
+        principal = auth.get_current_user(token=_token(user), db=db)
+    assert (principal.id, principal.username, principal.role) == (user.id, "cliente", models.UserRole.CLIENTE)
+    assert principal.hashed_password is None
+
+    # /me still returns the full user, loading the row the cache no longer carries
+    assert client.get("/auth/me", headers=auth_headers(user)).json()["email"] == "cliente@compia.com.br"
+
+
+def test_deactivation_evicts_the_principal(client, db):
+    admin = create_user(db, "admin", role=models.UserRole.ADMIN)
+    user = create_user(db, "cliente")
+    _prime(client, user)
+
+    assert client.put(f"/auth/users/{user.id}/deactivate", headers=auth_headers(admin)).status_code == 200
+    assert auth.principal_cache.get(user.username) is None
+    assert client.get("/auth/me", headers=auth_headers(user)).status_code == 400
+
+
+def test_role_change_evicts_the_principal(client, db):
+    admin = create_user(db, "admin", role=models.UserRole.ADMIN)
+    user = create_user(db, "cliente")
+    _prime(client, user)
+
+    response = client.put(f"/auth/users/{user.id}/role?role=VENDEDOR", headers=auth_headers(admin))
+    assert response.status_code == 200
+    assert auth.principal_cache.get(user.username) is None
+    db.expire_all()
+    assert auth.get_current_user(token=_token(user), db=db).role == models.UserRole.VENDEDOR
+
+
+def test_password_change_evicts_the_principal(client, db):
+    user = create_user(db, "cliente")
+    _prime(client, user)
+
+    response = client.put(
+        "/auth/me/password",
+        json={"current_password": "secret", "new_password": "outra-senha"},
+        headers=auth_headers(user),
+    )
+    assert response.status_code == 200
+    assert auth.principal_cache.get(user.username) is None
@@ -0,0 +1,106 @@
+import csv
+import io
+import json
+
+import activity_log
+import models
+from conftest import auth_headers, create_category, create_product, create_user, max_queries
+from routers import products as products_router
+
+
+def _upload(client, admin, name, content):
+    return client.post(
+        "/products/import",
+        files={"file": (name, content.encode("utf-8"))},
+        headers=auth_headers(admin),
+    )
+
+
+def test_csv_import_validates_and_upserts_in_chunks(client, db, monkeypatch):
+    category = create_category(db)
+    admin = create_user(db, "admin", role=models.UserRole.ADMIN)
+    existing = create_product(db, category, "Antigo", price=1.0)
+    monkeypatch.setattr(products_router, "PRODUCT_IMPORT_CHUNK_SIZE", 2)
+
+    content = (
+        "id,title,description,price,stock_quantity,category_id,product_type\n"
+        f"{existing.id},Atualizado,-,9.5,3,{category.id},PHYSICAL\n"
+        f",Redes Neurais,-,50,10,{category.id},\n"
+        f",Sem preço,-,,1,{category.id},\n"
+        f",Categoria errada,-,10,1,999,\n"
+        f",Visão Computacional,-,70,,{category.id},DIGITAL\n"
+    )
+    response = _upload(client, admin, "catalogo.csv", content)
+
+    assert response.status_code == 200, response.text
+    result = response.json()
+    assert (result["created"], result["updated"], result["failed"]) == (2, 1, 2)
+    assert [error["line"] for error in result["errors"]] == [4, 5]
+    assert "price" in result["errors"][0]["error"]
+
+    titles = client.get("/products/").json()
+    assert [p["title"] for p in titles] == ["Atualizado", "Redes Neurais", "Visão Computacional"]
+    assert titles[0]["updated_at"] is not None
+    assert [p["id"] for p in client.get("/products/search?q=neurais").json()] == [titles[1]["id"]]
+
+    activity_log.writer.flush()
+    logs = client.get("/auth/logs?action=IMPORT", headers=auth_headers(admin)).json()
+    assert len(logs) == 1
+    assert json.loads(logs[0]["details"])["created"] == 2
+
+
+def test_repeated_ids_in_a_chunk_are_counted_once(client, db):
+    category = create_category(db)
+    admin = create_user(db, "admin", role=models.UserRole.ADMIN)
+    existing = create_product(db, category, "Antigo", price=1.0)
+
+    content = (
+        "id,title,description,price,stock_quantity,category_id,product_type\n"
+        f"{existing.id},Primeira,-,9.5,3,{category.id},PHYSICAL\n"
+        f"{existing.id},Segunda,-,9.5,3,{category.id},PHYSICAL\n"
+        f"900,Novo,-,20,1,{category.id},PHYSICAL\n"
+        f"900,Novo 2ed,-,25,1,{category.id},PHYSICAL\n"
+    )
+    result = _upload(client, admin, "catalogo.csv", content).json()
+
+    assert (result["created"], result["updated"], result["failed"]) == (1, 1, 0)
+    assert [p["title"] for p in client.get("/products/").json()] == ["Segunda", "Novo 2ed"]  # last row wins
+
+
+def test_ndjson_import_reports_bad_lines(client, db):
+    category = create_category(db)
+    admin = create_user(db, "admin", role=models.UserRole.ADMIN)
+    content = "\n".join([
+        json.dumps({"title": "Livro", "description": "-", "price": 10, "category_id": category.id}),
+        "{not json",
+        "",
+        json.dumps(["not", "an", "object"]),
+    ])
+    result = _upload(client, admin, "catalogo.ndjson", content).json()
+
+    assert (result["created"], result["failed"]) == (1, 2)
+    assert [error["line"] for error in result["errors"]] == [2, 4]
+
+
+def test_export_round_trips_through_import(client, db):
+    category = create_category(db)
+    admin = create_user(db, "admin", role=models.UserRole.ADMIN)
+    for i in range(5):
+        create_product(db, category, f"Livro {i}", price=float(i))
+
+    ndjson = client.get("/products/export", headers=auth_headers(admin))
+    assert ndjson.headers["content-type"] == "application/x-ndjson"
+    rows = [json.loads(line) for line in ndjson.text.splitlines()]
+    assert [row["title"] for row in rows] == [f"Livro {i}" for i in range(5)]
+
+    exported = client.get("/products/export?format=csv", headers=auth_headers(admin)).text
+    assert len(list(csv.DictReader(io.StringIO(exported)))) == 5
+
+    with max_queries(12):
+        result = _upload(client, admin, "export.csv", exported).json()
+    assert (result["created"], result["updated"], result["failed"]) == (0, 5, 0)
+
+
+def test_export_requires_staff(client, db):
+    cliente = create_user(db, "maria")
+    assert client.get("/products/export", headers=auth_headers(cliente)).status_code == 403
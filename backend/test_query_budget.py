@@ -0,0 +1,55 @@
+"""Query budgets for the listing endpoints, so N+1 regressions fail loudly."""
+
+import models
+from conftest import auth_headers, create_user, max_queries
+
+
+def _seed_catalog(db, categories: int = 10, per_category: int = 3):
+    for c in range(categories):
+        category = models.Category(name=f"Categoria {c}")
+        db.add(category)
+        db.flush()
+        db.add_all(
+            models.Product(
+                title=f"Livro {c}-{i}",
+                description="-",
+                price=10.0,
+                stock_quantity=100,
+                category_id=category.id,
+            )
+            for i in range(per_category)
+        )
+    db.commit()
+
+
+def test_read_products_loads_categories_in_one_query(client, db):
+    _seed_catalog(db)
+
+    with max_queries(1):
+        response = client.get("/products/?limit=100")
+
+    assert response.status_code == 200
+    assert len(response.json()) == 30
+    assert all(product["category"] is not None for product in response.json())
+
+
+def test_list_my_orders_does_not_load_items_per_order(client, db):
+    _seed_catalog(db, categories=1)
+    user = create_user(db, "cliente")
+    headers = auth_headers(user)
+    product_ids = [p.id for p in db.query(models.Product).all()]
+    for _ in range(10):
+        response = client.post(
+            "/orders/checkout",
+            json={"items": [{"product_id": pid, "quantity": 1} for pid in product_ids], "delivery_type": "PICKUP"},
+            headers=headers,
+        )
+        assert response.status_code == 200
+
+    # user lookup (cached after the first request) + orders + items
+    with max_queries(3):
+        response = client.get("/orders/", headers=headers)
+
+    assert response.status_code == 200
+    assert len(response.json()) == 10
+    assert all(len(order["items"]) == 3 for order in response.json())
@@ -0,0 +1,47 @@
+from fastapi import Depends, FastAPI, Request
+from fastapi.testclient import TestClient
+from sqlalchemy import text
+from sqlalchemy.orm import Session
+
+from database import get_db
+
+
+def _probe_app(captured: dict) -> FastAPI:
+    """Throwaway app whose single route runs two queries through get_db"""
+    app = FastAPI()
+
+    def session_of_another_dependency(db: Session = Depends(get_db)) -> Session:
+        return db
+
+    @app.get("/probe")
+    def probe(request: Request, db: Session = Depends(get_db), other: Session = Depends(session_of_another_dependency)):
+        db.execute(text("SELECT 1"))
+        other.execute(text("SELECT 2"))
+        captured["shared"] = db is other
+        captured["stats"] = request.state.db_stats
+        return {}
+
+    return app
+
+
+def test_request_stats_cover_the_whole_request(db):
+    captured = {}
+    with TestClient(_probe_app(captured)) as client:
+        assert client.get("/probe").status_code == 200
+
+    stats = captured["stats"]
+    assert captured["shared"]  # one session (and connection) per request
+    assert stats.query_count == 2
+    assert stats.db_time > 0
+    held = stats.connection_hold_time
+    assert held >= stats.db_time
+    assert stats.connection_hold_time == held  # released when get_db closed the session
+
+
+def test_sessions_outside_requests_are_not_counted(db):
+    captured = {}
+    with TestClient(_probe_app(captured)) as client:
+        client.get("/probe")
+    db.execute(text("SELECT 3"))
+    db.commit()
+    assert captured["stats"].query_count == 2
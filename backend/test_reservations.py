@@ -0,0 +1,211 @@
+from concurrent.futures import ThreadPoolExecutor
+from datetime import timedelta
+
+from sqlalchemy import func
+
+import models
+import reservations
+from conftest import auth_headers, create_category, create_product, create_user
+
+INITIAL_STOCK = 10
+
+
+def _seed(db, count: int = 2):
+    category = create_category(db)
+    return [create_product(db, category, f"Livro {i}", price=20.0, stock_quantity=INITIAL_STOCK).id for i in range(count)]
+
+
+def _reserve(client, user, items):
+    return client.post("/orders/reservations", json={"items": items}, headers=auth_headers(user))
+
+
+def _stock(client, product_id):
+    return client.get(f"/products/{product_id}").json()["stock_quantity"]
+
+
+def _statuses(db):
+    db.expire_all()
+    return {r.status for r in db.query(models.StockReservation)}
+
+
+def test_hold_then_checkout_converts_the_reservation(client, db):
+    first, second = _seed(db)
+    buyer = create_user(db, "buyer")
+
+    response = _reserve(client, buyer, [{"product_id": first, "quantity": 2}, {"product_id": second, "quantity": 1}])
+    assert response.status_code == 201, response.text
+    reservation_id = response.json()["reservation_id"]
+    assert (_stock(client, first), _stock(client, second)) == (8, 9)
+
+    checkout = {"reservation_id": reservation_id, "delivery_type": "PICKUP"}
+    response = client.post("/orders/checkout", json=checkout, headers=auth_headers(buyer))
+    assert response.status_code == 200, response.text
+    assert response.json()["total_amount"] == 60.0
+    order = client.get(f"/orders/{response.json()['order_id']}", headers=auth_headers(buyer)).json()
+    assert {(i["product_id"], i["quantity"]) for i in order["items"]} == {(first, 2), (second, 1)}
+    assert (_stock(client, first), _stock(client, second)) == (8, 9)  # taken once, at hold time
+    assert _statuses(db) == {models.ReservationStatus.CONVERTED}
+
+    assert client.post("/orders/checkout", json=checkout, headers=auth_headers(buyer)).status_code == 404
+
+
+def test_hold_rejects_missing_stock_and_can_be_cancelled(client, db):
+    first, second = _seed(db)
+    buyer = create_user(db, "buyer")
+    other = create_user(db, "other")
+
+    response = _reserve(client, buyer, [{"product_id": first, "quantity": 1}, {"product_id": second, "quantity": 11}])
+    assert response.status_code == 400
+    assert _stock(client, first) == INITIAL_STOCK
+
+    reservation_id = _reserve(client, buyer, [{"product_id": first, "quantity": 4}]).json()["reservation_id"]
+    checkout = {"reservation_id": reservation_id, "delivery_type": "PICKUP"}
+    assert client.post("/orders/checkout", json=checkout, headers=auth_headers(other)).status_code == 404
+    assert client.delete(f"/orders/reservations/{reservation_id}", headers=auth_headers(other)).status_code == 404
+
+    assert client.delete(f"/orders/reservations/{reservation_id}", headers=auth_headers(buyer)).status_code == 204
+    assert _stock(client, first) == INITIAL_STOCK
+    assert _statuses(db) == {models.ReservationStatus.RELEASED}
+    assert client.delete(f"/orders/reservations/{reservation_id}", headers=auth_headers(buyer)).status_code == 404
+
+
+def test_sweeper_releases_expired_holds(client, db):
+    first, _ = _seed(db)
+    buyer = create_user(db, "buyer")
+    reservation_id = _reserve(client, buyer, [{"product_id": first, "quantity": 3}]).json()["reservation_id"]
+    db.query(models.StockReservation).update({models.StockReservation.expires_at: reservations.utcnow() - timedelta(seconds=1)})
+    db.commit()
+
+    response = client.post(
+        "/orders/checkout", json={"reservation_id": reservation_id, "delivery_type": "PICKUP"}, headers=auth_headers(buyer)
+    )
+    assert response.status_code == 404
+    assert reservations.run_sweep(batch=1)["expired"] == 1
+    assert _stock(client, first) == INITIAL_STOCK
+    assert _statuses(db) == {models.ReservationStatus.EXPIRED}
+
+
+def test_striped_stock_is_never_oversold(client, db):
+    product_id, _ = _seed(db)
+    reservations.stripe(db, product_id, shards=4)
+    db.commit()
+    assert [s.quantity for s in db.query(models.StockShard).order_by(models.StockShard.shard)] == [3, 3, 2, 2]
+    buyers = [create_user(db, f"buyer{i}") for i in range(16)]
+
+    with ThreadPoolExecutor(max_workers=8) as pool:
+        responses = list(pool.map(lambda user: _reserve(client, user, [{"product_id": product_id, "quantity": 1}]), buyers))
+
+    statuses = [r.status_code for r in responses]
+    assert all(code in (201, 400, 409, 503) for code in statuses), statuses
+    held = db.query(func.coalesce(func.sum(models.StockReservation.quantity), 0)).scalar()
+    shards = db.query(func.sum(models.StockShard.quantity)).scalar()
+    assert held == statuses.count(201) > 0
+    assert shards >= 0 and shards + held == INITIAL_STOCK
+
+    # legacy checkout takes from the shards too; the sweeper refreshes the displayed stock
+    response = client.post(
+        "/orders/checkout",
+        json={"items": [{"product_id": product_id, "quantity": shards + 1}], "delivery_type": "PICKUP"},
+        headers=auth_headers(buyers[0]),
+    )
+    assert response.status_code == 400
+    assert reservations.run_sweep()["synced"] == 1
+    assert _stock(client, product_id) == shards
+
+    admin = create_user(db, "admin", role=models.UserRole.ADMIN)
+    category_id = db.get(models.Product, product_id).category_id
+    client.put(
+        f"/products/{product_id}",
+        json={"title": "Livro 0", "description": "-", "price": 20.0, "stock_quantity": 7, "category_id": category_id},
+        headers=auth_headers(admin),
+    )
+    db.expire_all()
+    assert db.query(func.sum(models.StockShard.quantity)).scalar() == 7
+
+
+def test_hold_spanning_shards_survives_concurrent_holds(client, db):
+    product_id, _ = _seed(db)
+    db.query(models.Product).filter(models.Product.id == product_id).update({"stock_quantity": 12})
+    reservations.stripe(db, product_id, shards=4)
+    db.commit()
+    buyers = [create_user(db, f"buyer{i}") for i in range(3)]
+
+    # 3 x 4 units: enough in total, but no shard (3 each) covers a hold alone
+    with ThreadPoolExecutor(max_workers=3) as pool:
+        responses = list(pool.map(lambda user: _reserve(client, user, [{"product_id": product_id, "quantity": 4}]), buyers))
+
+    assert [r.status_code for r in responses] == [201] * 3, [r.text for r in responses]
+    db.expire_all()
+    assert db.query(func.sum(models.StockShard.quantity)).scalar() == 0
+
+
+def test_take_rereads_shards_drained_after_the_read(db, monkeypatch):
+    product_id, _ = _seed(db)
+    reservations.stripe(db, product_id, shards=4)
+    db.commit()
+    shuffle = reservations.random.shuffle
+
+    def concurrent_hold(shards):
+        # another hold moves the stock right after this one read it: [3, 3, 2, 2] -> [0, 0, 5, 5]
+        monkeypatch.setattr(reservations.random, "shuffle", shuffle)
+        other = reservations.SessionLocal()
+        for shard, quantity in enumerate([0, 0, 5, 5]):
+            other.query(models.StockShard).filter_by(product_id=product_id, shard=shard).update({"quantity": quantity})
+        other.commit()
+        other.close()
+        shuffle(shards)
+
+    monkeypatch.setattr(reservations.random, "shuffle", concurrent_hold)
+    reservations.take_stock(db, {product_id: 5})  # first pass only gets 4 from the stale shards
+    db.commit()
+    assert sorted(s.quantity for s in db.query(models.StockShard)) == [0, 0, 2, 3]
+
+
+def test_give_back_targets_existing_shards(db):
+    product_id, _ = _seed(db)
+    reservations.stripe(db, product_id, shards=2)
+    # shards renumbered by hand: give_back must not assume 0..count-1
+    db.query(models.StockShard).filter_by(product_id=product_id, shard=0).update({"shard": 7})
+    db.commit()
+
+    reservations.give_back(db, {product_id: 3})
+    db.commit()
+    assert db.query(func.sum(models.StockShard.quantity)).scalar() == INITIAL_STOCK + 3
+
+    reservations.apply_stock_changes(db, {product_id: -1})  # re-spread over shards 1 and 7
+    db.commit()
+    db.expire_all()
+    assert [(s.shard, s.quantity) for s in db.query(models.StockShard).order_by(models.StockShard.shard)] == [(1, 6), (7, 6)]
+
+
+def _shard_total(db):
+    db.expire_all()
+    return db.query(func.sum(models.StockShard.quantity)).scalar()
+
+
+def test_admin_writes_do_not_restore_sold_striped_stock(client, db):
+    product_id, _ = _seed(db)
+    reservations.stripe(db, product_id, shards=4)
+    db.commit()
+    buyer = create_user(db, "buyer")
+    admin = create_user(db, "admin", role=models.UserRole.ADMIN)
+    assert _reserve(client, buyer, [{"product_id": product_id, "quantity": 3}]).status_code == 201
+    assert _stock(client, product_id) == INITIAL_STOCK  # displayed stock is stale until the sweep
+
+    # export -> import round trip carries the stale 10 back: nothing changed, nothing restored
+    exported = client.get("/products/export?format=csv", headers=auth_headers(admin)).text
+    response = client.post(
+        "/products/import", files={"file": ("export.csv", exported.encode("utf-8"))}, headers=auth_headers(admin)
+    )
+    assert response.json()["updated"] == 2
+    assert _shard_total(db) == INITIAL_STOCK - 3
+    assert _stock(client, product_id) == INITIAL_STOCK - 3  # and the display caught up
+
+    # an edit applies what the admin changed (+5 over the value shown), not the absolute number
+    reservations.take_stock(db, {product_id: 2})  # sold after the admin opened the form
+    db.commit()
+    category_id = db.get(models.Product, product_id).category_id
+    body = {"title": "Livro 0", "description": "-", "price": 20.0, "stock_quantity": 12, "category_id": category_id}
+    assert client.put(f"/products/{product_id}", json=body, headers=auth_headers(admin)).status_code == 200
+    assert _shard_total(db) == INITIAL_STOCK - 3 - 2 + 5
+    assert _stock(client, product_id) == 10
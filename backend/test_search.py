@@ -0,0 +1,55 @@
+import models
+from conftest import auth_headers, create_user
+
+
+def _create(client, headers, category_id, title, description):
+    response = client.post(
+        "/products/",
+        json={"title": title, "description": description, "price": 10.0, "category_id": category_id},
+        headers=headers,
+    )
+    assert response.status_code == 200
+    return response.json()["id"]
+
+
+def _titles(client, q):
+    response = client.get("/products/search", params={"q": q})
+    assert response.status_code == 200
+    return [product["title"] for product in response.json()]
+
+
+def test_search_is_ranked_accent_insensitive_and_kept_in_sync(client, db):
+    admin = create_user(db, "admin", role=models.UserRole.ADMIN)
+    headers = auth_headers(admin)
+    category = models.Category(name="IA")
+    db.add(category)
+    db.commit()
+
+    mentions = _create(client, headers, category.id, "Redes Neurais", "Um capítulo sobre inteligência artificial")
+    _create(client, headers, category.id, "Inteligência Artificial", "Fundamentos e aplicações")
+    _create(client, headers, category.id, "Cálculo", "Matemática básica")
+
+    assert _titles(client, "inteligencia") == ["Inteligência Artificial", "Redes Neurais"]
+    assert _titles(client, "INTELIGÊNCIA artificial") == ["Inteligência Artificial", "Redes Neurais"]
+    assert _titles(client, "calculo") == ["Cálculo"]
+
+    client.put(
+        f"/products/{mentions}",
+        json={"title": "Redes Neurais", "description": "Aprendizado profundo", "price": 10.0, "category_id": category.id},
+        headers=headers,
+    )
+    assert _titles(client, "inteligencia") == ["Inteligência Artificial"]
+    assert _titles(client, "profundo") == ["Redes Neurais"]
+
+    client.delete(f"/products/{mentions}", headers=headers)
+    assert _titles(client, "profundo") == []
+
+
+def test_search_requires_terms(client, db):
+    assert client.get("/products/search", params={"q": ""}).status_code == 422
+
+
+def test_search_pages_are_bounded(client, db):
+    for params in ({"limit": 0}, {"limit": 101}, {"skip": -1}):
+        assert client.get("/products/search", params={"q": "livro", **params}).status_code == 422
+    assert client.get("/products/search", params={"q": "livro", "skip": 5, "limit": 100}).json() == []
@@ -0,0 +1,76 @@
+import pytest
+
+import auth
+import models
+from conftest import create_user, max_queries
+
+
+@pytest.fixture(autouse=True)
+def stateless(monkeypatch):
+    monkeypatch.setattr(auth, "AUTH_STATELESS_TOKENS", True)
+
+
+def _login(client, username):
+    response = client.post("/auth/login", data={"username": username, "password": "secret"})
+    assert response.status_code == 200, response.text
+    return response.json()
+
+
+def _bearer(tokens):
+    return {"Authorization": f"Bearer {tokens['access_token']}"}
+
+
+def test_role_checks_need_no_user_lookup(client, db):
+    create_user(db, "admin", role=models.UserRole.ADMIN)
+    tokens = _login(client, "admin")
+    assert tokens["refresh_token"]
+
+    auth.principal_cache.clear()
+    with max_queries(1):  # only the listing itself
+        assert client.get("/auth/users", headers=_bearer(tokens)).status_code == 200
+
+    me = client.get("/auth/me", headers=_bearer(tokens)).json()
+    assert me["email"] == "admin@compia.com.br"
+
+
+def test_refresh_token_is_not_an_access_token(client, db):
+    create_user(db, "maria")
+    tokens = _login(client, "maria")
+
+    headers = {"Authorization": f"Bearer {tokens['refresh_token']}"}
+    assert client.get("/auth/me", headers=headers).status_code == 401
+
+    refreshed = client.post("/auth/refresh", json={"refresh_token": tokens["refresh_token"]})
+    assert refreshed.status_code == 200
+    assert client.get("/auth/me", headers=_bearer(refreshed.json())).status_code == 200
+
+
+def test_deactivation_revokes_issued_tokens(client, db):
+    create_user(db, "admin", role=models.UserRole.ADMIN)
+    maria = create_user(db, "maria")
+    admin_tokens = _login(client, "admin")
+    tokens = _login(client, "maria")
+
+    response = client.put(f"/auth/users/{maria.id}/deactivate", headers=_bearer(admin_tokens))
+    assert response.status_code == 200
+
+    assert client.get("/auth/me", headers=_bearer(tokens)).status_code == 401
+    assert client.post("/auth/refresh", json={"refresh_token": tokens["refresh_token"]}).status_code == 401
+
+
+def test_password_change_revokes_refresh_tokens_on_every_worker(client, db):
+    create_user(db, "maria")
+    tokens = _login(client, "maria")
+
+    response = client.put(
+        "/auth/me/password",
+        json={"current_password": "secret", "new_password": "outra-senha"},
+        headers=_bearer(tokens),
+    )
+    assert response.status_code == 200
+    auth.revocations.clear()  # a worker that did not handle the change
+
+    assert client.post("/auth/refresh", json={"refresh_token": tokens["refresh_token"]}).status_code == 401
+
+    fresh = client.post("/auth/login", data={"username": "maria", "password": "outra-senha"}).json()
+    assert client.post("/auth/refresh", json={"refresh_token": fresh["refresh_token"]}).status_code == 200
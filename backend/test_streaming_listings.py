@@ -0,0 +1,45 @@
+import csv
+import io
+import json
+from datetime import datetime, timedelta, timezone
+
+import models
+from conftest import auth_headers, create_user, max_queries
+
+
+def test_users_stream_as_ndjson_and_csv(client, db):
+    admin = create_user(db, "admin", role=models.UserRole.ADMIN)
+    for i in range(4):
+        create_user(db, f"user{i}")
+
+    response = client.get("/auth/users?format=ndjson", headers=auth_headers(admin))
+    assert response.headers["content-type"] == "application/x-ndjson"
+    users = [json.loads(line) for line in response.text.splitlines()]
+    assert [u["username"] for u in users] == ["admin", "user0", "user1", "user2", "user3"]
+    assert "hashed_password" not in users[0]
+    assert users[0]["role"] == "ADMIN"
+
+    response = client.get("/auth/users?format=csv&limit=2", headers=auth_headers(admin))
+    rows = list(csv.DictReader(io.StringIO(response.text)))
+    assert [row["username"] for row in rows] == ["admin", "user0"]
+
+
+def test_activity_logs_stream_every_matching_row(client, db):
+    admin = create_user(db, "admin", role=models.UserRole.ADMIN)
+    base = datetime(2026, 1, 1, tzinfo=timezone.utc)
+    db.add_all(
+        models.ActivityLog(action="LOGIN" if i % 2 else "UPDATE", username="maria", timestamp=base + timedelta(minutes=i))
+        for i in range(250)
+    )
+    db.commit()
+    headers = auth_headers(admin)
+
+    with max_queries(2):  # principal lookup + the streamed SELECT
+        response = client.get("/auth/logs?format=ndjson&action=LOGIN", headers=headers)
+    logs = [json.loads(line) for line in response.text.splitlines()]
+    assert len(logs) == 125  # not capped at the JSON default of 100
+    assert logs[0]["timestamp"] > logs[-1]["timestamp"]
+    assert {log["action"] for log in logs} == {"LOGIN"}
+
+    assert len(client.get("/auth/logs", headers=headers).json()) == 100
+    assert client.get("/auth/logs?format=xml", headers=headers).status_code == 400